@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""音频下载：Range续传、完整文件的416响应、磁盘配额按最近使用时间清理"""
+import importlib
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+getter = importlib.import_module("播客数据获得")
+benchmark = importlib.import_module("播客抓取基准测试")
+
+ALBUM_ID = "123"
+AUDIO_SIZE = 100 * 1024
+
+
+class AudioReplayServer:
+    """在本地端口提供音频文件：/audio/<单集id>.mp3，支持 Range 请求，记录收到的请求头"""
+
+    def __init__(self, files):
+        self.files = files  # {单集id: 内容}
+        self.requests = []  # [(路径, Range, Accept-Encoding), ...]
+        self._lock = threading.Lock()
+        self.httpd = benchmark.QuietHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.url_template = f"http://127.0.0.1:{self.httpd.server_port}/audio/{{episode_id}}.mp3"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="audio-replay", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append((self.path, self.headers.get("Range"),
+                                            self.headers.get("Accept-Encoding")))
+                match = re.fullmatch(r"/audio/(\d+)\.mp3", self.path)
+                body = server.files.get(int(match.group(1))) if match else None
+                if body is None:
+                    self._send(404, b"")
+                    return
+
+                range_match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range") or "")
+                if not range_match:
+                    self._send(200, body)
+                    return
+                start = int(range_match.group(1))
+                if start >= len(body):
+                    self._send(416, b"", {"Content-Range": f"bytes */{len(body)}"})
+                    return
+                self._send(206, body[start:], {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+
+            def _send(self, status, body, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.send_header("Accept-Ranges", "bytes")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class AudioDownloaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.files = {episode_id: os.urandom(AUDIO_SIZE) for episode_id in (1, 2, 3)}
+        self.server = AudioReplayServer(self.files).start()
+        self.fetcher = getter.AlbumFetcher(self.tmp.name, min_request_interval=0, echo_log=False)
+
+        album_folder = os.path.join(self.fetcher.albums_dir, f"album_{ALBUM_ID}")
+        os.makedirs(album_folder)
+        self.db_path = os.path.join(album_folder, f"album_{ALBUM_ID}.db")
+        conn = self.fetcher.init_album_database(self.db_path)
+        conn.executemany("INSERT INTO episodes (id, guid, title, url) VALUES (?, ?, ?, ?)",
+                         [(episode_id, f"ep-{episode_id}", f"第{episode_id}集",
+                           self.server.url_template.format(episode_id=episode_id)) for episode_id in self.files])
+        conn.commit()
+        conn.close()
+        self.audio_dir = os.path.join(album_folder, getter.AUDIO_DIR_NAME)
+        os.makedirs(self.audio_dir)
+
+    def tearDown(self):
+        self.fetcher.http.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def downloader(self, quota_bytes=0):
+        downloader = getter.AudioDownloader(self.fetcher, quota_bytes=quota_bytes)
+        self.addCleanup(downloader.close)
+        return downloader
+
+    def audio_path(self, episode_id):
+        return os.path.join(self.audio_dir, f"episode_{episode_id}.mp3")
+
+    def download(self, downloader, episode_id):
+        return downloader.download_episode(ALBUM_ID, episode_id, self.server.url_template.format(episode_id=episode_id))
+
+    def local_paths(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return dict(conn.execute("SELECT id, local_path FROM episodes"))
+        finally:
+            conn.close()
+
+    def test_resume_partial_file(self):
+        offset = AUDIO_SIZE // 3
+        with open(self.audio_path(1) + ".part", "wb") as f:
+            f.write(self.files[1][:offset])
+
+        result = self.download(self.downloader(), 1)
+        self.assertTrue(result["success"], result["message"])
+        self.assertTrue(result["resumed"])
+        self.assertEqual(result["bytes"], AUDIO_SIZE - offset)
+        with open(self.audio_path(1), "rb") as f:
+            self.assertEqual(f.read(), self.files[1])
+        self.assertFalse(os.path.exists(self.audio_path(1) + ".part"))
+        self.assertEqual(self.server.requests, [("/audio/1.mp3", f"bytes={offset}-", "identity")])
+        self.assertEqual(self.local_paths()[1], f"{getter.AUDIO_DIR_NAME}/episode_1.mp3")
+
+    def test_complete_partial_file_gets_416(self):
+        with open(self.audio_path(1) + ".part", "wb") as f:
+            f.write(self.files[1])
+
+        result = self.download(self.downloader(), 1)
+        self.assertTrue(result["success"], result["message"])
+        self.assertEqual(result["bytes"], 0)
+        with open(self.audio_path(1), "rb") as f:
+            self.assertEqual(f.read(), self.files[1])
+        self.assertEqual(self.server.requests, [("/audio/1.mp3", f"bytes={AUDIO_SIZE}-", "identity")])
+
+    def test_quota_evicts_least_recently_used(self):
+        downloader = self.downloader(quota_bytes=int(AUDIO_SIZE * 2.5))
+        for episode_id, mtime in ((1, 1000), (2, 2000)):
+            self.assertTrue(self.download(downloader, episode_id)["success"])
+            os.utime(self.audio_path(episode_id), (mtime, mtime))
+        # 第1集最近播放过，应保留，删除最久未用的第2集
+        os.utime(self.audio_path(1), (3000, 3000))
+
+        self.assertTrue(self.download(downloader, 3)["success"])
+        self.assertTrue(os.path.exists(self.audio_path(1)))
+        self.assertFalse(os.path.exists(self.audio_path(2)))
+        self.assertTrue(os.path.exists(self.audio_path(3)))
+        local_paths = self.local_paths()
+        self.assertIsNone(local_paths[2])
+        self.assertIsNotNone(local_paths[3])
+
+    def test_quota_keeps_newest_file(self):
+        downloader = self.downloader(quota_bytes=AUDIO_SIZE // 2)
+        self.assertTrue(self.download(downloader, 1)["success"])
+        os.utime(self.audio_path(1), (1000, 1000))
+
+        self.assertTrue(self.download(downloader, 2)["success"])
+        # 刚下载的文件单独就超过配额，也要保留
+        self.assertFalse(os.path.exists(self.audio_path(1)))
+        self.assertTrue(os.path.exists(self.audio_path(2)))
+        self.assertEqual(self.local_paths()[2], f"{getter.AUDIO_DIR_NAME}/episode_2.mp3")
+
+
+if __name__ == "__main__":
+    unittest.main()
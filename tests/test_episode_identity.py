@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""旧版专辑数据库迁移后重新导入同一个feed，不应重复插入单集"""
+import importlib
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+getter = importlib.import_module("播客数据获得")
+
+ALBUM_ID = "123"
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">
+<channel>
+<title>测试专辑</title>
+{items}
+</channel>
+</rss>
+"""
+
+ITEM = """<item>
+<title>{title}</title>
+<guid>https://aod.cos.tx.xmcdn.com/storages/{track_id}.m4a</guid>
+<pubDate>Mon, 0{day} Jan 2024 08:00:00 +0800</pubDate>
+<itunes:duration>00:10:0{day}</itunes:duration>
+<enclosure url="https://jt.ximalaya.com/{track_id}.m4a?track_id={track_id}" type="audio/x-m4a"/>
+</item>"""
+
+EPISODES = [("第一集", 1001, 1), ("第二集", 1002, 2), ("第三集", 1003, 3)]
+
+# 迁移前的单集表：以标题为唯一键，没有guid列
+OLD_EPISODES_SQL = """
+CREATE TABLE episodes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT,
+    duration TEXT,
+    title TEXT UNIQUE,
+    annotation TEXT,
+    url TEXT,
+    created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class EpisodeIdentityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.program_dir = self.tmp.name
+        album_dir = os.path.join(self.program_dir, "albums", f"album_{ALBUM_ID}")
+        os.makedirs(album_dir)
+        self.feed_path = os.path.join(album_dir, f"original_{ALBUM_ID}.xml")
+        with open(self.feed_path, "w", encoding="utf-8") as f:
+            f.write(FEED.format(items="\n".join(
+                ITEM.format(title=title, track_id=track_id, day=day) for title, track_id, day in EPISODES)))
+
+        self.db_path = os.path.join(album_dir, f"album_{ALBUM_ID}.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(OLD_EPISODES_SQL)
+        conn.executemany(
+            "INSERT INTO episodes (filename, duration, title, annotation, url) VALUES (?, ?, ?, ?, ?)",
+            [(f"{title}.mp3", f"00:10:0{day}", title, f"{title}的标注",
+              f"https://jt.ximalaya.com/{track_id}.m4a?track_id={track_id}")
+             for title, track_id, day in EPISODES])
+        conn.commit()
+        conn.close()
+
+        self.fetcher = getter.AlbumFetcher(self.program_dir)
+
+    def tearDown(self):
+        self.fetcher.http.close()
+        self.tmp.cleanup()
+
+    def ingest(self):
+        conn = self.fetcher.init_album_database(self.db_path)
+        _, rows = getter.parse_feed_file(self.feed_path)
+        writer = getter.EpisodeBatchWriter(conn)
+        for row in rows:
+            writer.add(dict(zip(getter.EPISODE_ROW_FIELDS, row)))
+        writer.commit()
+        return conn, writer
+
+    def test_reingest_after_migration_inserts_nothing(self):
+        conn, writer = self.ingest()
+        self.assertEqual(writer.inserted, 0)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0], len(EPISODES))
+        # 旧记录改用feed中的guid，标注保持不变
+        rows = conn.execute("SELECT guid, annotation FROM episodes ORDER BY id").fetchall()
+        self.assertEqual(rows, [(f"https://aod.cos.tx.xmcdn.com/storages/{track_id}.m4a", f"{title}的标注")
+                                for title, track_id, _ in EPISODES])
+        conn.close()
+
+        conn, writer = self.ingest()
+        self.assertEqual((writer.inserted, writer.updated, writer.unchanged), (0, 0, len(EPISODES)))
+        self.assertEqual(writer.missing, 0)
+        conn.close()
+
+    def test_synthesised_guid_still_matches(self):
+        # 早期迁移按track_id推测的guid与feed中的guid不同，仍应按track_id匹配
+        conn = self.fetcher.init_album_database(self.db_path)
+        conn.execute("UPDATE episodes SET guid = 'xmly_track_' || substr(url, instr(url, 'track_id=') + 9)")
+        conn.commit()
+        conn.close()
+
+        conn, writer = self.ingest()
+        self.assertEqual(writer.inserted, 0)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0], len(EPISODES))
+        conn.close()
+
+    def test_backfill_pub_times_after_migration(self):
+        # 改过标题的旧记录只能按track_id匹配
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE episodes SET title = '第二集（修订）' WHERE title = '第二集'")
+        conn.commit()
+        conn.close()
+
+        conn = self.fetcher.init_album_database(self.db_path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM episodes WHERE pub_time IS NULL").fetchone()[0], 0)
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
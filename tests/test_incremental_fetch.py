@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""增量获取提前停止后，下一次检查未变化的feed应得到304"""
+import hashlib
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+getter = importlib.import_module("播客数据获得")
+benchmark = importlib.import_module("播客抓取基准测试")
+
+ALBUM_ID = "123"
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+<channel>
+<title>测试专辑</title>
+{items}
+</channel>
+</rss>
+"""
+
+ITEM = """<item>
+<title>第{n}集</title>
+<guid>https://aod.cos.tx.xmcdn.com/storages/{n}.m4a</guid>
+<pubDate>Mon, 01 Jan 2024 {n:02d}:00:00 +0800</pubDate>
+<enclosure url="https://jt.ximalaya.com/{n}.m4a?track_id={n}" type="audio/x-m4a"/>
+</item>"""
+
+
+def feed_body(count):
+    """count 个单集的feed，最新的在前"""
+    items = "\n".join(ITEM.format(n=n) for n in range(count, 0, -1))
+    return FEED.format(items=items).encode("utf-8")
+
+
+class IncrementalFetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        feed_path = os.path.join(self.tmp.name, "feed.xml")
+        with open(feed_path, "wb") as f:
+            f.write(feed_body(8))
+        self.server = benchmark.FeedReplayServer({ALBUM_ID: feed_path}).start()
+        self.fetcher = getter.AlbumFetcher(os.path.join(self.tmp.name, "program"), min_request_interval=0,
+                                           incremental=True, known_run_threshold=3, echo_log=False,
+                                           rss_url_template=self.server.url_template)
+
+    def tearDown(self):
+        self.fetcher.http.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def publish(self, body):
+        """服务器上的feed换成新内容（新的ETag）"""
+        self.server.feeds[ALBUM_ID].update(body=body, etag='"%s"' % hashlib.sha256(body).hexdigest()[:32])
+
+    def test_unchanged_feed_after_early_stop_is_not_modified(self):
+        result = self.fetcher.fetch_album(ALBUM_ID)
+        self.assertTrue(result["success"])
+        self.assertEqual(result["new"], 8)
+        self.assertFalse(result["stopped_early"])
+
+        # 新发布两集：读到3个已有单集后停止
+        self.publish(feed_body(10))
+        result = self.fetcher.fetch_album(ALBUM_ID)
+        self.assertTrue(result["success"])
+        self.assertEqual(result["new"], 2)
+        self.assertTrue(result["stopped_early"])
+
+        # feed没有再变化，条件请求应得到304
+        result = self.fetcher.fetch_album(ALBUM_ID)
+        self.assertTrue(result["success"])
+        self.assertTrue(result.get("not_modified"))
+        self.assertEqual(result["metrics"]["status_code"], 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""关键词提取（Aho-Corasick）和关键词搜索（n-gram索引）与原来逐个判断子串的结果、顺序一致"""
+import importlib
+import os
+import random
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+annotator = importlib.import_module("播客标注管理")
+
+
+def baseline_extract_keywords(nodes, text):
+    """原来的实现：按关键词表顺序逐个判断小写后是否包含"""
+    if not text or not nodes:
+        return []
+    text_lower = text.lower()
+    return [node_name for node_name in nodes if node_name.lower() in text_lower]
+
+
+def extract_keywords(nodes, text):
+    manager = SimpleNamespace(nodes=nodes, keyword_matcher=annotator.KeywordMatcher(nodes))
+    return annotator.PodcastAnnotationManager.extract_keywords(manager, text)
+
+
+def make_nodes(names):
+    return {name: {"name": name, "description": ""} for name in names}
+
+
+class ExtractKeywordsTest(unittest.TestCase):
+
+    def assertSameAsBaseline(self, names, text):
+        nodes = make_nodes(names)
+        self.assertEqual(extract_keywords(nodes, text), baseline_extract_keywords(nodes, text), text)
+
+    def test_overlapping_keywords(self):
+        names = ["AIGC", "GC", "AI", "ai绘画", "绘画"]
+        for text in ("聊聊AIGC和ai绘画", "AI", "aigc", "没有关键词", "GCAI", ""):
+            self.assertSameAsBaseline(names, text)
+        self.assertEqual(extract_keywords(make_nodes(names), "聊聊AIGC和ai绘画"),
+                         ["AIGC", "GC", "AI", "ai绘画", "绘画"])
+
+    def test_shared_suffix(self):
+        names = ["人工智能", "智能", "能", "智能手机", "手机"]
+        for text in ("人工智能与智能手机", "能源", "手机智能", "人工"):
+            self.assertSameAsBaseline(names, text)
+
+    def test_case_variants_are_all_returned(self):
+        # 只有大小写不同的关键词都算匹配，按关键词表顺序返回
+        names = ["Python", "python", "PYTHON", "py"]
+        self.assertEqual(extract_keywords(make_nodes(names), "学PyThon"), names)
+
+    def test_random_texts_match_baseline(self):
+        rng = random.Random(19)
+        alphabet = "aAbBc人工智能"
+        for case in range(2000):
+            names = list(dict.fromkeys(
+                "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 8))))
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+            self.assertSameAsBaseline(names, text)
+
+
+
+def baseline_search(nodes, term):
+    """原来的搜索：名称与搜索词相同的第一个关键词，以及名称或描述包含搜索词的所有关键词"""
+    term = term.strip().lower()
+    if not term:
+        return None, list(nodes)
+    exact = next((name for name in nodes if name.lower() == term), None)
+    matches = [name for name, data in nodes.items()
+               if term in name.lower() or term in data["description"].lower()]
+    return exact, matches
+
+
+class KeywordSearchIndexTest(unittest.TestCase):
+
+    NODES = {
+        "AI": "人工智能",
+        "AIGC": "AI生成内容",
+        "ai绘画": "用AI画图",
+        "Python": "编程语言",
+        "人工智能": "Artificial Intelligence",
+        "机器学习": "ML，人工智能的分支",
+        "GPT": "生成式预训练模型",
+    }
+
+    def setUp(self):
+        self.nodes = {name: {"name": name, "description": description} for name, description in self.NODES.items()}
+        self.index = annotator.KeywordSearchIndex(self.nodes)
+
+    def assertSameAsBaseline(self, term):
+        self.assertEqual(self.index.search(term), baseline_search(self.nodes, term), term)
+
+    def test_single_character_queries(self):
+        for term in ("a", "A", "智", "p", "生", "z", "，"):
+            self.assertSameAsBaseline(term)
+
+    def test_mixed_case_queries(self):
+        for term in ("ai", "Ai", "aI", "AIGC", "aigc", "python", "PYTHON", "gPt", "ml"):
+            self.assertSameAsBaseline(term)
+
+    def test_queries_longer_than_gram_size(self):
+        # 三个字以上的搜索词：二字组都在但整体不连续时，候选要被排除
+        for term in ("人工智能", "工智能的", "artificial", "intelligence", "ai生成", "用ai画", "预训练模型",
+                     "智能人工", "aigcai", "编程语言x", "用ai绘画"):
+            self.assertSameAsBaseline(term)
+
+    def test_empty_query_lists_all_in_order(self):
+        self.assertSameAsBaseline("")
+
+    def test_random_queries_after_edits(self):
+        rng = random.Random(23)
+        alphabet = "aAbBc人工智能"
+
+        def random_text(low, high):
+            return "".join(rng.choice(alphabet) for _ in range(rng.randint(low, high)))
+
+        for step in range(500):
+            name = random_text(1, 4)
+            if name in self.nodes and rng.random() < 0.4:
+                del self.nodes[name]
+                self.index.remove(name)
+            else:
+                # 已有的关键词只更新描述，保持原来的位置
+                description = random_text(0, 8)
+                self.nodes.setdefault(name, {"name": name})["description"] = description
+                self.index.add(name, description)
+            for query in range(5):
+                self.assertSameAsBaseline(random_text(1, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
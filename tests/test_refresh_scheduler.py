@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""自适应刷新调度：检查间隔、退避、抖动和每小时请求预算"""
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+getter = importlib.import_module("播客数据获得")
+benchmark = importlib.import_module("播客抓取基准测试")
+
+NOW = 1700000000
+HOUR = 3600
+DAY = 24 * HOUR
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+<channel>
+<title>测试专辑</title>
+<item><title>第二集</title><guid>ep-2</guid><enclosure url="https://example.com/2.m4a" type="audio/x-m4a"/></item>
+<item><title>第一集</title><guid>ep-1</guid><enclosure url="https://example.com/1.m4a" type="audio/x-m4a"/></item>
+</channel>
+</rss>
+"""
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fetcher = getter.AlbumFetcher(os.path.join(self.tmp.name, "program"), min_request_interval=0,
+                                           echo_log=False)
+
+    def tearDown(self):
+        self.fetcher.http.close()
+        self.tmp.cleanup()
+
+    def register(self, *album_ids):
+        """在系统数据库中登记专辑"""
+        for album_id in album_ids:
+            self.fetcher.save_feed_validators(album_id, None, None)
+
+    def schedule_row(self, scheduler, album_id):
+        return scheduler._execute(
+            "SELECT cadence_seconds, interval_seconds, next_check, last_new, unchanged_checks, failures "
+            "FROM album_schedule WHERE album_id = ?", (album_id,), fetch=True)[0]
+
+
+class ComputeIntervalTest(SchedulerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.scheduler = getter.RefreshScheduler(self.fetcher)
+
+    def test_active_album_checked_four_times_per_cadence(self):
+        self.assertEqual(self.scheduler.compute_interval(DAY, NOW - HOUR, 0, NOW), DAY // 4)
+        # 最近还在更新的专辑不因未变化次数退避
+        self.assertEqual(self.scheduler.compute_interval(DAY, NOW - DAY, 5, NOW), DAY // 4)
+
+    def test_dormant_album_backs_off(self):
+        # 超过3个周期没有新单集：每次未变化间隔加倍
+        self.assertEqual(self.scheduler.compute_interval(4 * HOUR, NOW - 13 * HOUR, 1, NOW), 2 * HOUR)
+        self.assertEqual(self.scheduler.compute_interval(4 * HOUR, NOW - 13 * HOUR, 3, NOW), 8 * HOUR)
+
+    def test_without_cadence_uses_default_interval(self):
+        self.assertEqual(self.scheduler.compute_interval(None, None, 0, NOW), getter.SCHEDULE_DEFAULT_INTERVAL)
+        self.assertEqual(self.scheduler.compute_interval(None, None, 2, NOW), 4 * getter.SCHEDULE_DEFAULT_INTERVAL)
+
+    def test_interval_is_clamped(self):
+        self.assertEqual(self.scheduler.compute_interval(60, NOW, 0, NOW), getter.SCHEDULE_MIN_INTERVAL)
+        self.assertEqual(self.scheduler.compute_interval(None, None, 30, NOW), getter.SCHEDULE_MAX_INTERVAL)
+
+
+class RecordResultTest(SchedulerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.register("1")
+        self.scheduler = getter.RefreshScheduler(self.fetcher)
+        self.scheduler.sync_albums(NOW)
+
+    def test_cadence_is_median_gap_of_recent_episodes(self):
+        pub_times = [NOW - HOUR, NOW - HOUR - DAY, NOW - HOUR - 2 * DAY, NOW - HOUR - 4 * DAY]
+        self.scheduler.record_result({"album_id": "1", "success": True, "new": 1,
+                                      "recent_pub_times": pub_times}, NOW)
+        cadence, interval, _, last_new, unchanged_checks, failures = self.schedule_row(self.scheduler, "1")
+        self.assertEqual(cadence, DAY)
+        self.assertEqual(interval, DAY // 4)
+        self.assertEqual((last_new, unchanged_checks, failures), (NOW - HOUR, 0, 0))
+
+    def test_unchanged_checks_back_off_dormant_album(self):
+        pub_times = [NOW - 10 * DAY, NOW - 11 * DAY, NOW - 12 * DAY]
+        intervals = []
+        for check in range(3):
+            self.scheduler.record_result({"album_id": "1", "success": True, "new": 0,
+                                          "recent_pub_times": pub_times}, NOW)
+            intervals.append(self.schedule_row(self.scheduler, "1")[1])
+        self.assertEqual(intervals, [DAY // 2, DAY, 2 * DAY])
+
+    def test_failures_double_interval(self):
+        intervals = []
+        for check in range(3):
+            self.scheduler.record_result({"album_id": "1", "success": False}, NOW)
+            intervals.append(self.schedule_row(self.scheduler, "1")[1])
+        minimum = getter.SCHEDULE_MIN_INTERVAL
+        self.assertEqual(intervals, [2 * minimum, 4 * minimum, 8 * minimum])
+        self.assertEqual(self.schedule_row(self.scheduler, "1")[5], 3)
+
+    def test_next_check_has_bounded_jitter(self):
+        delays = set()
+        for check in range(50):
+            self.scheduler.record_result({"album_id": "1", "success": False}, NOW)
+            _, interval, next_check, _, _, _ = self.schedule_row(self.scheduler, "1")
+            delay = next_check - NOW
+            self.assertGreaterEqual(delay, int(interval * (1 - getter.SCHEDULE_JITTER)))
+            self.assertLessEqual(delay, int(interval * (1 + getter.SCHEDULE_JITTER)))
+            delays.add(delay / interval)
+        self.assertGreater(len(delays), 1)
+
+
+class DueAlbumsTest(SchedulerTestCase):
+
+    def test_earliest_due_first_within_budget(self):
+        self.register("1", "2", "3", "4")
+        scheduler = getter.RefreshScheduler(self.fetcher, requests_per_hour=2)
+        scheduler.sync_albums(NOW)
+        for album_id, next_check in (("1", NOW - 10), ("2", NOW - 30), ("3", NOW - 20), ("4", NOW + 10)):
+            scheduler._execute("UPDATE album_schedule SET next_check = ? WHERE album_id = ?", (next_check, album_id))
+        self.assertEqual(scheduler.due_albums(NOW), ["2", "3"])
+
+        scheduler.record_result({"album_id": "2", "success": False, "metrics": {"attempts": 1}}, NOW)
+        self.assertEqual(scheduler.remaining_budget(NOW), 1)
+        self.assertEqual(scheduler.due_albums(NOW), ["3"])
+
+
+class RequestBudgetTest(SchedulerTestCase):
+    """对同一个专辑多次检查、失败重试都要计入每小时预算"""
+
+    def setUp(self):
+        super().setUp()
+        feed_path = os.path.join(self.tmp.name, "feed.xml")
+        with open(feed_path, "w", encoding="utf-8") as f:
+            f.write(FEED)
+        self.server = benchmark.FeedReplayServer({"123": feed_path}).start()
+        self.fetcher.rss_url_template = self.server.url_template
+        self.fetcher.http.backoff = 0
+        self.register("123")
+        # 间隔固定为1分钟，每次检查时专辑都已到期
+        self.scheduler = getter.RefreshScheduler(self.fetcher, requests_per_hour=6,
+                                                 min_interval=60, max_interval=60, jitter=0)
+
+    def tearDown(self):
+        self.server.stop()
+        super().tearDown()
+
+    def test_repeated_polls_and_retries_count_against_budget(self):
+        for poll in range(2):
+            results = self.scheduler.run_once(now=NOW + poll * 900)
+            self.assertEqual([result["success"] for result in results], [True])
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.scheduler.remaining_budget(NOW + 1800), 4)
+
+        # 服务器持续返回503：一次检查发出1次请求和3次重试
+        self.server.error_rate = 1.0
+        results = self.scheduler.run_once(now=NOW + 1800)
+        self.assertEqual([result["success"] for result in results], [False])
+        self.assertEqual(self.server.requests, 6)
+        self.assertEqual(self.scheduler.remaining_budget(NOW + 1800), 0)
+        self.assertEqual(self.scheduler.due_albums(NOW + 2700), [])
+
+        # 一小时后第一次检查的请求不再计入
+        self.assertEqual(self.scheduler.remaining_budget(NOW + HOUR), 1)
+        self.assertEqual(self.scheduler.remaining_budget(NOW + 1800 + HOUR), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
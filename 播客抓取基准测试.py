@@ -0,0 +1,268 @@
+"""播客抓取基准测试
+
+用本地HTTP服务器回放 albums/*/original_*.xml，不访问喜马拉雅，离线、可重复地测量
+AlbumFetcher 的端到端吞吐（专辑/秒、单集/秒）。服务器可以模拟网络延迟、带宽限制和
+随机的503错误。
+
+    python 播客抓取基准测试.py --jobs 8 --latency 0.2 --bandwidth 2000 --error-rate 0.05
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import 播客数据获得 as getter
+
+
+# 回放服务器每次写出的字节数，带宽限制按块计算
+SERVE_CHUNK_SIZE = 16 * 1024
+
+# 可以运行的测试模式，按顺序执行
+BENCHMARK_MODES = ("serial", "concurrent", "incremental", "not-modified")
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """客户端提前断开（增量模式停止读取、关闭连接池）是正常情况，不打印异常"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FeedReplayServer:
+    """在本地端口回放已下载的feed，路径与喜马拉雅相同：/album/<专辑ID>.xml
+
+    latency 为每个请求返回响应头之前的延迟（秒），bandwidth 为每个连接的带宽（KB/秒，0表示不限），
+    error_rate 为返回503（带 Retry-After: 0）的概率。
+    支持 ETag 条件请求和gzip压缩；use_validators 为False时忽略条件请求，总是返回完整内容。
+    """
+
+    def __init__(self, feeds, latency=0.0, bandwidth=0, error_rate=0.0, use_gzip=False, seed=None):
+        self.feeds = {}
+        for album_id, path in feeds.items():
+            with open(path, "rb") as f:
+                body = f.read()
+            self.feeds[album_id] = {
+                "body": body,
+                "gzip": gzip.compress(body, compresslevel=6, mtime=0) if use_gzip else None,
+                "etag": '"%s"' % hashlib.sha256(body).hexdigest()[:32],
+            }
+        self.latency = latency
+        self.bandwidth = bandwidth * 1024
+        self.error_rate = error_rate
+        self.use_validators = True
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+        self.httpd = QuietHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.url_template = f"http://127.0.0.1:{self.httpd.server_port}/album/{{album_id}}.xml"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="feed-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _should_fail(self):
+        with self._random_lock:
+            self.requests += 1
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.errors += 1
+                return True
+            return False
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 保持连接，和真实服务器一样可以复用连接池
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+
+                match = re.fullmatch(r"/album/(\d+)\.xml", self.path.split("?")[0])
+                feed = server.feeds.get(match.group(1)) if match else None
+                if feed is None:
+                    self._send_empty(404)
+                    return
+                if server._should_fail():
+                    self._send_empty(503, {"Retry-After": "0"})
+                    return
+                if server.use_validators and self.headers.get("If-None-Match") == feed["etag"]:
+                    self._send_empty(304, {"ETag": feed["etag"]})
+                    return
+
+                body = feed["body"]
+                headers = {"Content-Type": "application/xml; charset=utf-8"}
+                if server.use_validators:
+                    headers["ETag"] = feed["etag"]
+                if feed["gzip"] is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = feed["gzip"]
+                    headers["Content-Encoding"] = "gzip"
+                headers["Content-Length"] = str(len(body))
+
+                self.send_response(200)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self._write_throttled(body)
+
+            def _send_empty(self, status, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _write_throttled(self, body):
+                started = time.perf_counter()
+                for offset in range(0, len(body), SERVE_CHUNK_SIZE):
+                    self.wfile.write(body[offset:offset + SERVE_CHUNK_SIZE])
+                    if server.bandwidth:
+                        # 按已发送的字节数计算应到时间，超前就等待
+                        due = (offset + SERVE_CHUNK_SIZE) / server.bandwidth
+                        delay = due - (time.perf_counter() - started)
+                        if delay > 0:
+                            time.sleep(delay)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def find_feeds(albums_dir, copies=1):
+    """找出已下载原始XML的专辑，copies>1 时用不同的专辑ID重复使用同一份feed来扩大规模"""
+    feeds = {}
+    for folder in sorted(os.listdir(albums_dir)):
+        if not folder.startswith("album_"):
+            continue
+        album_id = folder[len("album_"):]
+        path = os.path.join(albums_dir, folder, f"original_{album_id}.xml")
+        if album_id.isdigit() and os.path.isfile(path):
+            for copy in range(copies):
+                feeds[album_id if copy == 0 else f"{album_id}{copy:03d}"] = path
+    return feeds
+
+
+def run_mode(mode, server, work_dir, album_ids, args):
+    """运行一种测试模式，返回吞吐统计"""
+    if mode in ("serial", "concurrent"):
+        # 冷启动：每次都从空的数据目录开始完整获取
+        shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir, exist_ok=True)
+
+    # 增量模式要读取feed内容，服务器不返回304；not-modified模式测试条件请求
+    server.use_validators = mode != "incremental"
+
+    fetcher = getter.AlbumFetcher(
+        work_dir,
+        max_workers=1 if mode == "serial" else args.jobs,
+        min_request_interval=args.interval,
+        incremental=mode == "incremental",
+        echo_log=False,
+        rss_url_template=server.url_template,
+    )
+    requests_before, errors_before = server.requests, server.errors
+    started = time.perf_counter()
+    try:
+        results = fetcher.fetch_albums(album_ids)
+    finally:
+        fetcher.http.close()
+    elapsed = time.perf_counter() - started
+
+    items = sum(result["total"] for result in results)
+    received = sum(result.get("metrics", {}).get("bytes", 0) for result in results)
+    totals = [result["metrics"]["timings"]["total"] for result in results if "metrics" in result]
+    return {
+        "mode": mode,
+        "albums": len(results),
+        "failed": sum(1 for result in results if not result["success"]),
+        "items": items,
+        "bytes": received,
+        "requests": server.requests - requests_before,
+        "injected_errors": server.errors - errors_before,
+        "seconds": round(elapsed, 3),
+        "albums_per_sec": round(len(results) / elapsed, 2) if elapsed else 0,
+        "items_per_sec": round(items / elapsed, 1) if elapsed else 0,
+        "mb_per_sec": round(received / 1024 / 1024 / elapsed, 2) if elapsed else 0,
+        "album_p50": round(statistics.median(totals), 3) if totals else 0,
+        "album_max": round(max(totals), 3) if totals else 0,
+    }
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="用本地回放服务器测量播客抓取的吞吐")
+    parser.add_argument("--albums-dir", default=os.path.join(getter.get_program_dir(), "albums"),
+                        help="已下载原始XML所在的albums目录")
+    parser.add_argument("--modes", nargs="+", choices=BENCHMARK_MODES, default=list(BENCHMARK_MODES),
+                        help="要运行的测试模式")
+    parser.add_argument("--jobs", "-j", type=int, default=getter.DEFAULT_MAX_WORKERS, help="并发模式的并发数")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="同一主机相邻两次请求的最小间隔（秒），默认不限速以测量抓取本身")
+    parser.add_argument("--copies", type=int, default=1, help="每份feed以不同专辑ID重复的次数，用于扩大规模")
+    parser.add_argument("--latency", type=float, default=0.0, help="服务器每个请求的延迟（秒）")
+    parser.add_argument("--bandwidth", type=int, default=0, help="每个连接的带宽（KB/秒），0表示不限")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回503的概率")
+    parser.add_argument("--gzip", action="store_true", help="服务器以gzip压缩传输")
+    parser.add_argument("--seed", type=int, default=0, help="错误注入的随机种子，保证结果可重复")
+    parser.add_argument("--work-dir", help="测试数据目录，默认使用临时目录并在结束后删除")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    feeds = find_feeds(args.albums_dir, max(1, args.copies))
+    if not feeds:
+        print(f"{args.albums_dir} 中没有找到 original_*.xml", file=sys.stderr)
+        return 2
+
+    server = FeedReplayServer(feeds, latency=args.latency, bandwidth=args.bandwidth,
+                              error_rate=args.error_rate, use_gzip=args.gzip, seed=args.seed).start()
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="podcast_bench_")
+    album_ids = list(feeds)
+    reports = []
+    try:
+        if not args.json:
+            print(f"回放 {len(album_ids)} 个专辑，数据目录: {work_dir}")
+        for mode in args.modes:
+            report = run_mode(mode, server, work_dir, album_ids, args)
+            reports.append(report)
+            if not args.json:
+                print(f"{mode:<14}{report['seconds']:>8.2f} 秒  {report['albums_per_sec']:>8.2f} 专辑/秒  "
+                      f"{report['items_per_sec']:>10.1f} 单集/秒  {report['mb_per_sec']:>7.2f} MB/秒  "
+                      f"单专辑 p50 {report['album_p50']:.3f} 秒  失败 {report['failed']}  "
+                      f"注入错误 {report['injected_errors']}")
+    finally:
+        server.stop()
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+    return 0 if all(report["failed"] == 0 for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""数据获得程序和标注管理程序共用的专辑数据库工具（只依赖标准库）"""
+import os
+
+
+def album_db_signature(db_path):
+    """专辑数据库的变化标记：数据库文件及其WAL文件的修改时间和大小，数据库不存在时返回None
+
+    两个程序的专辑扫描清单都用它判断数据库是否变化，格式必须一致。
+    """
+    try:
+        stat = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    parts = [stat.st_mtime_ns, stat.st_size]
+    try:
+        wal_stat = os.stat(db_path + "-wal")
+        parts += [wal_stat.st_mtime_ns, wal_stat.st_size]
+    except FileNotFoundError:
+        pass
+    return ":".join(map(str, parts))
@@ -1,19 +1,1609 @@
-import tkinter as tk
-from tkinter import messagebox, ttk, simpledialog
+try:
+    import tkinter as tk
+    from tkinter import messagebox, ttk, simpledialog
+except ImportError:  # 无图形界面的服务器上可能没有安装Tk，命令行模式不需要它
+    tk = None
 import requests
+from requests.adapters import HTTPAdapter
 import xml.etree.ElementTree as ET
 import json
 import os
 import sys
+import argparse
 import re
 import sqlite3
 from datetime import timedelta, datetime
-from urllib.parse import urlparse
+from urllib.parse import urlparse, parse_qs
 import time
+import threading
+import queue
+import hashlib
+import gzip
+import shutil
+import tempfile
+import random
+import statistics
+import math
+import heapq
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+
+from 播客数据库工具 import album_db_signature
+
+
+# 喜马拉雅专辑RSS地址
+RSS_URL_TEMPLATE = "https://www.ximalaya.com/album/{album_id}.xml"
+
+# 请求头
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Encoding": "gzip, deflate"
+}
+
+# HTTP请求超时（秒）、失败重试次数和指数退避的基准间隔（秒）
+HTTP_TIMEOUT = 15
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF = 1.0
+# 服务器要求的 Retry-After 最多等待多久（秒）
+HTTP_MAX_RETRY_AFTER = 60
+
+# 批量获取的默认并发数，以及同一主机相邻两次请求的最小间隔（秒）
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MIN_REQUEST_INTERVAL = 0.5
+
+# 增量模式下，连续遇到多少个已有单集后停止读取feed（feed按发布时间从新到旧排列）
+DEFAULT_KNOWN_RUN_THRESHOLD = 10
+
+# 每次获取时记录feed开头多少个单集的发布时间，用于估计专辑的更新周期
+RECENT_PUB_TIMES = 10
+
+# 自适应刷新调度：检查间隔的上下限、没有任何周期信息时的默认间隔（秒），以及随机抖动比例
+SCHEDULE_MIN_INTERVAL = 15 * 60
+SCHEDULE_MAX_INTERVAL = 7 * 24 * 3600
+SCHEDULE_DEFAULT_INTERVAL = 6 * 3600
+SCHEDULE_JITTER = 0.1
+# 全局请求预算：每小时最多发出的专辑请求数
+DEFAULT_REQUESTS_PER_HOUR = 120
+
+# 界面刷新获取进度的间隔（毫秒），即每秒10次
+UI_REFRESH_MS = 100
+
+# 单集表结构（guid为单集的稳定标识，迁移时也用它建临时表）
+EPISODES_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT,
+    filename TEXT,
+    duration TEXT,
+    duration_seconds INTEGER,
+    title TEXT,
+    annotation TEXT,
+    url TEXT,
+    pub_time INTEGER,
+    local_path TEXT,
+    created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+# 扫描albums目录时并行读取专辑数据库的线程数
+ALBUM_SCAN_WORKERS = 8
+
+# 音频下载：存放在专辑文件夹下的子目录、默认并发数和默认磁盘配额（MB）
+AUDIO_DIR_NAME = "audio"
+DEFAULT_DOWNLOAD_WORKERS = 3
+DEFAULT_AUDIO_QUOTA_MB = 5 * 1024
+
+# 每次获取的分阶段用时等指标，逐行以JSON追加到程序目录下的这个文件
+METRICS_LOG_NAME = "podcast_fetch_metrics.jsonl"
+# metrics 汇总时统计的各阶段
+METRICS_STAGES = ("wait", "request", "download", "parse", "db_write", "total")
+
+# 进程池解析结果中单集行元组的字段顺序
+EPISODE_ROW_FIELDS = ("guid", "filename", "duration", "duration_seconds", "title", "annotation", "url", "pub_time")
+
+# 流式下载和解析时每次读取的字节数
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def get_program_dir():
+    """程序数据所在目录 - 适配PyInstaller打包"""
+    if getattr(sys, 'frozen', False):
+        # 打包为可执行文件时，对于onefile模式，使用可执行文件所在目录
+        return os.path.dirname(os.path.abspath(sys.executable))
+    # 脚本模式
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def iter_feed_items(chunks, feed_info=None):
+    """增量解析RSS数据块，逐个产出<item>元素
+
+    chunks 是字节块的可迭代对象（网络响应或本地文件均可）。每个<item>在调用方
+    处理完后立即清空并从父节点移除，内存占用与feed大小无关。
+    频道信息写入 feed_info：has_channel 表示是否有<channel>，title 为频道标题。
+    """
+    if feed_info is None:
+        feed_info = {}
+    feed_info.setdefault("has_channel", False)
+    feed_info.setdefault("title", None)
+
+    parser = ET.XMLPullParser(events=("start", "end"))
+    open_elements = []  # 从根节点到当前位置的元素路径
+
+    def drain():
+        for event, elem in parser.read_events():
+            if event == "start":
+                open_elements.append(elem)
+                if elem.tag == "channel":
+                    feed_info["has_channel"] = True
+                continue
+
+            open_elements.pop()
+            parent = open_elements[-1] if open_elements else None
+            if elem.tag == "item":
+                yield elem
+                # 已处理的单集立即释放
+                elem.clear()
+                if parent is not None:
+                    parent.remove(elem)
+            elif (elem.tag == "title" and parent is not None and parent.tag == "channel"
+                  and feed_info["title"] is None):
+                feed_info["title"] = (elem.text or "").strip()
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from drain()
+    parser.close()
+    yield from drain()
+
+
+def parse_pub_date(text):
+    """把RSS的pubDate（RFC 822格式）转换为Unix时间戳，无法解析时返回None"""
+    if not text or not text.strip():
+        return None
+    try:
+        return int(parsedate_to_datetime(text.strip()).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def track_id_from_url(url):
+    """从喜马拉雅的音频地址中取出 track_id 参数，没有时返回None"""
+    if not url:
+        return None
+    values = parse_qs(urlparse(url).query).get("track_id")
+    if values and values[0].isdigit():
+        return values[0]
+    return None
+
+
+def episode_guid(item, audio_url):
+    """返回单集的稳定标识：优先使用RSS的guid，其次是音频地址中的track_id，再次是音频地址本身"""
+    guid = item.findtext("guid", "").strip()
+    if guid:
+        return guid
+    track_id = track_id_from_url(audio_url)
+    if track_id:
+        # 与喜马拉雅feed中guid的写法一致
+        return f"xmly_track_{track_id}"
+    return audio_url or None
+
+
+def is_legacy_guid(guid):
+    """没有guid、或guid是早期迁移按音频地址推测的 xmly_track_<track_id>（不一定与feed中的guid相同）"""
+    return not guid or guid.startswith("xmly_track_")
+
+
+def episode_filename(guid, fallback):
+    """由单集标识生成固定的文件名，同一单集每次运行得到相同的文件名"""
+    key = guid or fallback
+    return f"episode_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.mp3"
+
+
+def read_album_title(db_path):
+    """从专辑数据库的album_info表读取专辑标题，读取失败时返回None"""
+    try:
+        conn = sqlite3.connect(db_path, timeout=5)
+        try:
+            row = conn.execute("SELECT title FROM album_info LIMIT 1").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"读取专辑数据库 {db_path} 信息错误: {str(e)}")
+        return None
+    return row[0] if row and row[0] else None
+
+
+def iter_file_chunks(path, chunk_size=STREAM_CHUNK_SIZE):
+    """按块读取本地文件，供 iter_feed_items 解析已保存的XML（.gz快照自动解压）"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def extract_duration(item):
+    """从XML元素中提取时长信息"""
+    # 尝试1: 直接查找duration标签
+    duration = item.findtext("duration", "").strip()
+    if duration:
+        return format_duration(duration)
+
+    # 尝试2: 查找itunes:duration标签
+    itunes_duration = item.findtext("{http://www.itunes.com/dtds/podcast-1.0.dtd}duration", "").strip()
+    if itunes_duration:
+        return format_duration(itunes_duration)
+
+    # 尝试3: 从描述中提取时长
+    description = item.findtext("description", "").strip()
+    if description:
+        match = re.search(r'时长[:：]\s*(\d+[:：]\d+(:\d+)?|\d+)', description)
+        if match:
+            return format_duration(match.group(1))
+
+    # 尝试4: 从标题中提取时长
+    title = item.findtext("title", "").strip()
+    if title:
+        match = re.search(r'\[(\d+[:：]\d+(:\d+)?|\d+)\]', title)
+        if match:
+            return format_duration(match.group(1))
+
+    return ""
+
+
+def format_duration(duration_str):
+    """标准化时长格式"""
+    if not duration_str or duration_str.strip() == "":
+        return ""
+
+    duration_str = duration_str.strip()
+
+    if duration_str.isdigit():
+        seconds = int(duration_str)
+        return str(timedelta(seconds=seconds))
+
+    parts = duration_str.split(':')
+    try:
+        if len(parts) == 2:  # MM:SS
+            minutes, seconds = map(int, parts)
+            return f"00:{minutes:02d}:{seconds:02d}"
+        elif len(parts) == 3:  # HH:MM:SS
+            hours, minutes, seconds = map(int, parts)
+            return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    except ValueError:
+        pass
+
+    return duration_str
+
+
+def duration_to_seconds(duration_str):
+    """把时长文本（"HH:MM:SS"、"MM:SS"、秒数、"1 day, 2:03:04"）转换为整数秒，无法识别时返回None"""
+    if not duration_str:
+        return None
+    text = duration_str.strip().replace("：", ":")
+    if text.isdigit():
+        return int(text)
+    match = re.fullmatch(r"(?:(\d+) days?, )?(\d+):(\d{1,2})(?::(\d{1,2}))?", text)
+    if not match:
+        return None
+    days, first, second, third = match.groups()
+    if third is None:  # MM:SS
+        seconds = int(first) * 60 + int(second)
+    else:  # HH:MM:SS
+        seconds = int(first) * 3600 + int(second) * 60 + int(third)
+    return int(days or 0) * 86400 + seconds
+
+
+def extract_enclosure_url(item):
+    """专门提取<enclosure>标签中的URL"""
+    # 查找所有enclosure标签
+    enclosures = item.findall("enclosure")
+    for enclosure in enclosures:
+        # 检查是否包含url属性且type是音频类型
+        if ('url' in enclosure.attrib and
+                'type' in enclosure.attrib and
+                enclosure.attrib['type'].startswith('audio/')):
+
+            # 清理URL中的可能的双斜杠问题
+            url = enclosure.attrib['url']
+            parsed = urlparse(url)
+            if parsed.scheme and parsed.netloc:  # 确保是完整URL
+                # 修复可能的双斜杠问题
+                if url.startswith('//') and not url.startswith('http'):
+                    return f"https:{url}"
+                return url
+
+    return ""
+
+
+def parse_item(item, i):
+    """把一个单集元素解析为待写入的单集数据，i 为单集在feed中的序号（从0开始）"""
+    title = item.findtext("title", "").strip()
+    if not title:
+        title = f"未命名单集_{i + 1}"
+
+    # 提取时长
+    duration = extract_duration(item)
+
+    # 提取音频URL
+    audio_url = extract_enclosure_url(item)
+    if not audio_url:
+        audio_url = item.findtext("link", "").strip()
+
+    # 稳定标识和由它生成的文件名，单集改名后仍对应同一条记录
+    guid = episode_guid(item, audio_url)
+    filename = episode_filename(guid, title)
+
+    # 新增条目时标注初始值为标题
+    return {
+        "guid": guid,
+        "filename": filename,
+        "duration": duration,
+        "duration_seconds": duration_to_seconds(duration),
+        "title": title,
+        "annotation": title,  # 标注初始值等于标题
+        "url": audio_url,
+        "pub_time": parse_pub_date(item.findtext("pubDate", ""))
+    }
+
+
+def percentile(values, pct):
+    """最近秩法求百分位数，values 须已排序且非空"""
+    rank = math.ceil(pct / 100 * len(values))
+    return values[max(0, min(len(values), rank) - 1)]
+
+
+def load_metrics(path, since=None):
+    """读取JSONL运行日志，since 为 "%Y-%m-%d %H:%M:%S" 格式时只返回该时间之后的记录"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 写入中断留下的半行
+            if since is None or record.get("time", "") >= since:
+                records.append(record)
+    return records
+
+
+def summarize_metrics(records, slowest=10):
+    """按阶段汇总各专辑获取用时的 p50/p90/p99/最大值，并列出总用时最长的几次获取"""
+    def distribution(values):
+        values = sorted(values)
+        return {"count": len(values), "p50": percentile(values, 50), "p90": percentile(values, 90),
+                "p99": percentile(values, 99), "max": values[-1]}
+
+    stages = {}
+    for stage in METRICS_STAGES:
+        values = [record["timings"][stage] for record in records if stage in record.get("timings", {})]
+        if values:
+            stages[stage] = distribution(values)
+
+    sizes = [record["bytes"] for record in records if record.get("bytes")]
+    return {
+        "runs": len(records),
+        "failed": sum(1 for record in records if not record.get("success")),
+        "not_modified": sum(1 for record in records if record.get("not_modified")),
+        "stages": stages,
+        "bytes": distribution(sizes) if sizes else None,
+        "slowest": sorted(records, key=lambda record: record.get("timings", {}).get("total", 0),
+                          reverse=True)[:slowest],
+    }
+
+
+def parse_feed_file(path):
+    """解析已下载的feed文件（XML或.gz快照），供进程池调用
+
+    返回频道信息和紧凑的单集行元组（字段顺序见 EPISODE_ROW_FIELDS），
+    只有可以pickle的基本类型，传回主进程的开销小。
+    """
+    feed_info = {}
+    rows = []
+    for i, item in enumerate(iter_feed_items(iter_file_chunks(path), feed_info)):
+        episode = parse_item(item, i)
+        rows.append(tuple(episode[field] for field in EPISODE_ROW_FIELDS))
+    return feed_info, rows
+
+
+class FetchCancelled(Exception):
+    """获取任务被用户取消"""
+
+
+class HostRateLimiter:
+    """按主机限速：同一主机相邻两次请求的开始时间至少间隔 min_interval 秒（线程安全）"""
+
+    def __init__(self, min_interval=DEFAULT_MIN_REQUEST_INTERVAL):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}  # {host: 下一次允许发出请求的时间}
+
+    def wait(self, url):
+        """阻塞到该URL所在主机允许发出下一次请求为止"""
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class BandwidthLimiter:
+    """多个下载线程共享的带宽上限（令牌桶），rate 为每秒字节数，0 表示不限（线程安全）"""
+
+    def __init__(self, rate=0):
+        self.rate = rate
+        self.capacity = max(rate, STREAM_CHUNK_SIZE)  # 允许的突发量
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        """取走 amount 字节的额度，额度不足时阻塞到按速率补足为止"""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class HttpClient:
+    """共享的HTTP客户端：连接池复用（keep-alive）、压缩传输、按主机限速，5xx/429时指数退避重试
+
+    每次实际发出请求（包括重试）之前都经过限速器，保证对服务器的请求频率。
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, rate_limiter, pool_size=DEFAULT_MAX_WORKERS, timeout=HTTP_TIMEOUT,
+                 max_retries=HTTP_MAX_RETRIES, backoff=HTTP_BACKOFF):
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, headers=None, stream=False, stats=None):
+        """发送GET请求，连接错误、超时和可重试的状态码会退避后重试
+
+        stats 为字典时写入本次请求的统计：attempts 尝试次数（最终失败抛出异常时也会写入），
+        request 从发出请求（含DNS解析和建立连接）到收到响应头的总用时，wait 限速和退避的等待用时。
+        """
+        started = time.perf_counter()
+        request_seconds = 0.0
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(url)
+            if stats is not None:
+                stats["attempts"] = attempt + 1
+            sent = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                request_seconds += time.perf_counter() - sent
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff_delay(attempt))
+                continue
+            request_seconds += time.perf_counter() - sent
+
+            if response.status_code in self.RETRY_STATUS and attempt < self.max_retries:
+                delay = self._backoff_delay(attempt, response.headers.get("Retry-After"))
+                response.close()
+                time.sleep(delay)
+                continue
+
+            if stats is not None:
+                stats["request"] = request_seconds
+                stats["wait"] = time.perf_counter() - started - request_seconds
+            return response
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """第attempt次重试前的等待时间：优先遵守Retry-After，否则指数退避并加随机抖动"""
+        if retry_after and retry_after.strip().isdigit():
+            return min(HTTP_MAX_RETRY_AFTER, int(retry_after.strip()))
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def close(self):
+        self.session.close()
+
+
+class EpisodeBatchWriter:
+    """批量写入单集：先收集解析结果，再用 executemany 在同一个事务中写入
+
+    以guid为唯一键：新单集插入，已有单集仅在标题、时长、地址或发布时间变化时按id更新（不改动标注），
+    其余计为未变化。guid找不到时，再按音频地址中的track_id、最后按标题（仅限旧记录）匹配已有单集，
+    匹配上的记录改用feed中的guid，避免同一单集因guid写法不同被重复插入。
+    commit() 之前的所有写入都在一个事务里。
+    """
+
+    INSERT_SQL = '''
+    INSERT INTO episodes (guid, filename, duration, duration_seconds, title, annotation, url, pub_time)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    UPDATE_SQL = '''
+    UPDATE episodes SET guid = ?, title = ?, duration = ?, url = ?, pub_time = ?, duration_seconds = ?,
+        updated = CURRENT_TIMESTAMP
+    WHERE id = ?
+    '''
+
+    def __init__(self, conn, batch_size=500):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.write_seconds = 0.0  # 写入和提交数据库的累计用时
+        self._pending_inserts = []
+        self._pending_updates = []
+        self._seen_guids = set()  # 本次已处理的单集，feed中重复的单集以第一次出现为准
+        self._matched_ids = set()  # 本次已匹配到feed单集的已有记录
+
+        # 一次性读出已有单集，避免逐条SELECT；每条记录为 (id, guid, title, duration, url, pub_time)
+        self._existing = {}  # guid -> 记录
+        self._by_track = {}  # 音频地址中的track_id -> 记录
+        self._legacy = {}  # 旧记录（没有guid或guid为迁移时推测的）：title -> 记录
+        self._row_count = 0
+        for row in conn.execute("SELECT id, guid, title, duration, url, pub_time FROM episodes ORDER BY id"):
+            self._row_count += 1
+            if row[1]:
+                self._existing[row[1]] = row
+            track_id = track_id_from_url(row[4])
+            if track_id:
+                self._by_track.setdefault(track_id, row)
+            if is_legacy_guid(row[1]):
+                self._legacy.setdefault(row[2], row)
+
+    @property
+    def missing(self):
+        """数据库中有、但本次写入的feed中没有的单集数"""
+        return self._row_count - len(self._matched_ids)
+
+    def _match(self, guid, episode_data):
+        """按guid、track_id、标题的顺序找到对应的已有记录，没有时返回None"""
+        existing = self._existing.get(guid)
+        if existing is not None:
+            return existing
+        existing = self._by_track.get(track_id_from_url(episode_data["url"]))
+        if existing is not None and existing[0] not in self._matched_ids and (
+                is_legacy_guid(existing[1]) or existing[1] not in self._seen_guids):
+            return existing
+        existing = self._legacy.get(episode_data["title"])
+        if existing is not None and existing[0] not in self._matched_ids:
+            return existing
+        return None
+
+    def add(self, episode_data):
+        """加入一个解析好的单集，返回 "inserted" / "updated" / "unchanged" """
+        guid = episode_data["guid"] or episode_data["title"]
+        if guid in self._seen_guids:
+            self.unchanged += 1
+            return "unchanged"
+        self._seen_guids.add(guid)
+
+        values = (episode_data["title"], episode_data["duration"], episode_data["url"], episode_data["pub_time"])
+        existing = self._match(guid, episode_data)
+        if existing is not None and existing[0] in self._matched_ids:
+            # feed中guid不同、但与之前的单集是同一条记录
+            self.unchanged += 1
+            return "unchanged"
+
+        if existing is None:
+            status = "inserted"
+            self.inserted += 1
+            self._pending_inserts.append((
+                guid,
+                episode_data["filename"],
+                episode_data["duration"],
+                episode_data["duration_seconds"],
+                episode_data["title"],
+                episode_data["annotation"],
+                episode_data["url"],
+                episode_data["pub_time"]
+            ))
+        else:
+            self._matched_ids.add(existing[0])
+            adopt = existing[1] != guid
+            if existing[2:] != values:
+                status = "updated"
+                self.updated += 1
+            else:
+                status = "unchanged"
+                self.unchanged += 1
+                if not adopt:
+                    return status
+            # 按track_id或标题匹配上的记录即使内容未变也要改用feed中的guid
+            self._pending_updates.append((guid,) + values + (episode_data["duration_seconds"], existing[0]))
+
+        if len(self._pending_inserts) + len(self._pending_updates) >= self.batch_size:
+            self.flush()
+        return status
+
+    def flush(self):
+        """写入已收集的单集（不提交事务）"""
+        started = time.perf_counter()
+        if self._pending_updates:
+            self.conn.executemany(self.UPDATE_SQL, self._pending_updates)
+            self._pending_updates = []
+        if self._pending_inserts:
+            self.conn.executemany(self.INSERT_SQL, self._pending_inserts)
+            self._pending_inserts = []
+        self.write_seconds += time.perf_counter() - started
+
+    def commit(self):
+        """写入剩余单集并提交事务"""
+        self.flush()
+        started = time.perf_counter()
+        self.conn.commit()
+        self.write_seconds += time.perf_counter() - started
+
+
+class SnapshotWriter:
+    """流式写入一份feed快照：边接收边计算SHA-256并gzip压缩到临时文件"""
+
+    def __init__(self, store, album_id):
+        self.store = store
+        self.album_id = album_id
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(suffix=".xml.gz.tmp", dir=store.tmp_dir)
+        self._raw_file = os.fdopen(fd, "wb")
+        self._gzip_file = gzip.GzipFile(fileobj=self._raw_file, mode="wb", compresslevel=6, mtime=0)
+
+    def write(self, chunk):
+        self._hash.update(chunk)
+        self._gzip_file.write(chunk)
+        self.size += len(chunk)
+
+    def _close(self):
+        if not self._raw_file.closed:
+            self._gzip_file.close()
+            self._raw_file.close()
+
+    def commit(self, fetched_at=None):
+        """完成写入并登记索引，返回内容的SHA-256"""
+        self._close()
+        sha256 = self._hash.hexdigest()
+        self.store._add_object(self._tmp_path, sha256)
+        self.store._add_index(self.album_id, sha256, self.size, fetched_at)
+        return sha256
+
+    def abort(self):
+        """放弃这份快照（例如下载失败或增量模式提前停止）"""
+        self._close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class FeedSnapshotStore:
+    """按内容寻址的feed快照库
+
+    每份原始XML按SHA-256存为 objects/<前两位>/<哈希>.xml.gz，内容相同的feed
+    （不论属于哪个专辑、哪次获取）只存一份；系统数据库的 feed_snapshots 表记录
+    (专辑ID, 获取时间, 哈希)，可以在不联网的情况下重建或比较历史状态。
+    """
+
+    def __init__(self, snapshot_dir, system_db_path, db_lock=None):
+        self.snapshot_dir = snapshot_dir
+        self.objects_dir = os.path.join(snapshot_dir, "objects")
+        self.tmp_dir = os.path.join(snapshot_dir, "tmp")
+        self.system_db_path = system_db_path
+        self._db_lock = db_lock or threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        with self._db_lock:
+            conn = sqlite3.connect(self.system_db_path, timeout=30)
+            try:
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS feed_snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    album_id TEXT NOT NULL,
+                    fetched_at TIMESTAMP NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    size INTEGER
+                )
+                ''')
+                conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_feed_snapshots_album
+                ON feed_snapshots (album_id, fetched_at)
+                ''')
+                conn.commit()
+            finally:
+                conn.close()
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}.xml.gz")
+
+    def begin(self, album_id):
+        """开始写入一份快照，返回 SnapshotWriter"""
+        return SnapshotWriter(self, album_id)
+
+    def import_file(self, album_id, path):
+        """把已有的原始XML文件导入快照库（获取时间取文件修改时间）
+
+        该专辑已登记过相同内容时不重复登记，返回哈希和是否新登记。
+        """
+        fetched_at = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+        snapshots = self.list_snapshots(album_id)
+
+        # 最近一份快照大小相同、且不早于文件修改时间（获取时先写文件后存档）时，文件就是这份快照，无需再计算哈希
+        if snapshots:
+            latest_at, latest_sha256, latest_size = snapshots[-1]
+            if latest_size == os.path.getsize(path) and latest_at >= fetched_at:
+                return latest_sha256, False
+
+        content_hash = hashlib.sha256()
+        for chunk in iter_file_chunks(path):
+            content_hash.update(chunk)
+        sha256 = content_hash.hexdigest()
+        if any(row[1] == sha256 for row in snapshots):
+            return sha256, False
+
+        writer = self.begin(album_id)
+        try:
+            for chunk in iter_file_chunks(path):
+                writer.write(chunk)
+        except Exception:
+            writer.abort()
+            raise
+        return writer.commit(fetched_at), True
+
+    def list_snapshots(self, album_id):
+        """按获取时间顺序返回专辑的快照 [(fetched_at, sha256, size)]"""
+        with self._db_lock:
+            conn = sqlite3.connect(self.system_db_path, timeout=30)
+            try:
+                return conn.execute(
+                    "SELECT fetched_at, sha256, size FROM feed_snapshots WHERE album_id = ? ORDER BY fetched_at, id",
+                    (album_id,)
+                ).fetchall()
+            finally:
+                conn.close()
+
+    def latest(self, album_id):
+        """返回专辑最近一份快照的哈希，没有时返回None"""
+        snapshots = self.list_snapshots(album_id)
+        return snapshots[-1][1] if snapshots else None
+
+    def iter_chunks(self, sha256, chunk_size=STREAM_CHUNK_SIZE):
+        """按块读取解压后的快照内容，可直接交给 iter_feed_items"""
+        with gzip.open(self.object_path(sha256), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def restore(self, sha256, target_path):
+        """把快照解压还原为XML文件"""
+        with gzip.open(self.object_path(sha256), "rb") as src, open(target_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+
+    def diff(self, old_sha256, new_sha256):
+        """比较两份快照的单集标题，返回 {"added": [...], "removed": [...]}"""
+        def titles(sha256):
+            return [item.findtext("title", "").strip() for item in iter_feed_items(self.iter_chunks(sha256))]
+
+        old_titles = titles(old_sha256)
+        new_titles = titles(new_sha256)
+        old_set, new_set = set(old_titles), set(new_titles)
+        return {
+            "added": [title for title in new_titles if title not in old_set],
+            "removed": [title for title in old_titles if title not in new_set],
+        }
+
+    def _add_object(self, tmp_path, sha256):
+        object_path = self.object_path(sha256)
+        if os.path.exists(object_path):
+            # 相同内容已存在，直接丢弃临时文件
+            os.remove(tmp_path)
+            return
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        os.replace(tmp_path, object_path)
+
+    def _add_index(self, album_id, sha256, size, fetched_at=None):
+        fetched_at = fetched_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._db_lock:
+            conn = sqlite3.connect(self.system_db_path, timeout=30)
+            try:
+                conn.execute(
+                    "INSERT INTO feed_snapshots (album_id, fetched_at, sha256, size) VALUES (?, ?, ?, ?)",
+                    (album_id, fetched_at, sha256, size)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+
+class AlbumFetcher:
+    """专辑数据获取核心：下载、解析、入库，不依赖Tk，可在工作线程中并发调用"""
+
+    def __init__(self, program_dir, max_workers=DEFAULT_MAX_WORKERS,
+                 min_request_interval=DEFAULT_MIN_REQUEST_INTERVAL,
+                 incremental=False, known_run_threshold=DEFAULT_KNOWN_RUN_THRESHOLD,
+                 echo_log=True, rss_url_template=RSS_URL_TEMPLATE):
+        self.program_dir = program_dir
+        self.rss_url_template = rss_url_template  # 基准测试时指向本地回放服务器
+        self.albums_dir = os.path.join(self.program_dir, "albums")
+        self.system_db_path = os.path.join(self.program_dir, "podcast_system.db")
+        self.log_file_path = os.path.join(self.program_dir, "podcast_download_log.txt")
+        self.metrics_log_path = os.path.join(self.program_dir, METRICS_LOG_NAME)
+        self.echo_log = echo_log  # 是否把日志同时输出到控制台
+        os.makedirs(self.albums_dir, exist_ok=True)
+
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = HostRateLimiter(min_request_interval)
+        # 所有工作线程共用一个连接池
+        self.http = HttpClient(self.rate_limiter, pool_size=self.max_workers)
+
+        # 增量模式：连续 known_run_threshold 个已有单集后停止下载和解析
+        self.incremental = incremental
+        self.known_run_threshold = max(1, known_run_threshold)
+
+        # 多个工作线程共用日志文件和系统数据库，写入时需要加锁
+        self._log_lock = threading.Lock()
+        self._system_db_lock = threading.Lock()
+
+        # 原始feed快照库（压缩、按内容去重，保留历史）
+        self.snapshot_store = FeedSnapshotStore(os.path.join(self.program_dir, "snapshots"),
+                                                self.system_db_path, self._system_db_lock)
+
+    def log_result(self, album_id, success, message):
+        """记录专辑处理结果到日志文件"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        status = "成功" if success else "失败"
+        log_entry = f"[{timestamp}] 专辑ID: {album_id} - {status} - {message}\n"
+
+        with self._log_lock:
+            try:
+                with open(self.log_file_path, "a", encoding="utf-8") as log_file:
+                    log_file.write(log_entry)
+                # 同时输出到控制台
+                if self.echo_log:
+                    print(log_entry.strip())
+            except Exception as e:
+                print(f"写入日志失败: {str(e)}")
+
+    def record_metrics(self, result, timings, stats):
+        """把一次专辑获取的分阶段用时和计数追加到JSONL运行日志，同时放入 result["metrics"]"""
+        entry = {
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "album_id": result["album_id"],
+            "success": result["success"],
+            "not_modified": bool(result.get("not_modified")),
+            "cancelled": bool(result.get("cancelled")),
+            "stopped_early": bool(result.get("stopped_early")),
+            "status_code": stats.get("status_code"),
+            "attempts": stats.get("attempts", 0),
+            "bytes": stats.get("bytes", 0),
+            "items": stats.get("items", 0),
+            "new": result.get("new", 0),
+            "updated": result.get("updated", 0),
+            "unchanged": result.get("unchanged", 0),
+            "timings": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        }
+        if not result["success"]:
+            entry["message"] = result["message"]
+        result["metrics"] = entry
+
+        with self._log_lock:
+            try:
+                with open(self.metrics_log_path, "a", encoding="utf-8") as metrics_file:
+                    metrics_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"写入运行日志失败: {str(e)}")
+
+    def fetch_albums(self, album_ids, progress_callback=None, result_callback=None, cancel_event=None):
+        """并发获取多个专辑，返回与album_ids顺序一致的结果列表
+
+        并发数由max_workers限制，对同一主机的请求频率由http中的rate_limiter限制。
+        progress_callback(album_id, current, total, message) 会在工作线程中被调用；
+        result_callback(result) 在每个专辑完成时于调用线程中被调用。
+        cancel_event 被设置后，正在处理的专辑放弃本次写入，尚未开始的专辑直接返回已取消。
+        """
+        if not album_ids:
+            return []
+
+        # 重复输入的专辑ID只获取一次，避免两个线程同时写同一个专辑数据库
+        unique_ids = list(dict.fromkeys(album_ids))
+
+        results = {}
+        workers = min(self.max_workers, len(unique_ids))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="album-fetch") as executor:
+            futures = {executor.submit(self.fetch_album, album_id, progress_callback, cancel_event): album_id
+                       for album_id in unique_ids}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
+                    if result_callback:
+                        result_callback(results[futures[future]])
+
+        return [results[album_id] for album_id in album_ids]
+
+    def fetch_album(self, album_id, progress_callback=None, cancel_event=None):
+        """获取单个专辑的数据，返回该专辑的处理结果字典"""
+        result = {"album_id": album_id, "success": False, "message": "", "total": 0, "new": 0}
+
+        def report(current, total, message):
+            if cancel_event is not None and cancel_event.is_set():
+                raise FetchCancelled()
+            if progress_callback:
+                progress_callback(album_id, current, total, message)
+
+        # 检查专辑ID是否有效
+        if not album_id.isdigit():
+            result["message"] = "专辑ID不是有效的数字"
+            self.log_result(album_id, False, result["message"])
+            return result
+
+        # 创建专辑文件夹，准备数据路径
+        album_folder = os.path.join(self.albums_dir, f"album_{album_id}")
+        os.makedirs(album_folder, exist_ok=True)
+        db_path = os.path.join(album_folder, f"album_{album_id}.db")
+        original_xml_path = os.path.join(album_folder, f"original_{album_id}.xml")
+        result["original_xml_path"] = original_xml_path
+
+        album_conn = None
+        response = None
+        partial_xml_path = original_xml_path + ".part"
+        snapshot_writer = None
+        started = time.perf_counter()
+        timings = {}  # 各阶段用时（秒），写入运行日志
+        stats = {}  # 请求次数、状态码、字节数、单集数
+        try:
+            # 构建RSS URL
+            rss_url = self.rss_url_template.format(album_id=album_id)
+            report(0, 0, f"正在访问: {rss_url}")
+
+            # 发送请求获取XML；本地已有数据时带上校验头做条件请求
+            headers = {}
+            etag, last_modified = (None, None)
+            if os.path.exists(original_xml_path) and os.path.exists(db_path):
+                etag, last_modified = self.get_feed_validators(album_id)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+            response = self.http.get(rss_url, headers=headers, stream=True, stats=stats)
+            stats["status_code"] = response.status_code
+            timings["wait"] = stats["wait"]
+            timings["request"] = stats["request"]
+
+            # 304：专辑内容未变化，跳过下载、解析和入库
+            if response.status_code == 304:
+                result["success"] = True
+                result["not_modified"] = True
+                result["message"] = "专辑内容未变化，已跳过下载和解析"
+                self.log_result(album_id, True, result["message"])
+                return result
+
+            response.raise_for_status()
+
+            # 连接专辑数据库
+            album_conn = self.init_album_database(db_path)
+
+            # 边下载边解析：原始XML先写入临时文件，完整接收后再替换旧文件
+            feed_info = {}
+            download_stats = {"bytes": 0, "has_content": False, "seconds": 0.0}
+            items_count = 0
+            known_run = 0  # 连续遇到的已有单集数
+            recent_pub_times = []
+            stopped_early = False
+            writer = EpisodeBatchWriter(album_conn)
+            snapshot_writer = self.snapshot_store.begin(album_id)
+            loop_started = time.perf_counter()
+            with open(partial_xml_path, "wb") as xml_file:
+                chunks = self._save_chunks(response.iter_content(chunk_size=STREAM_CHUNK_SIZE),
+                                           (xml_file, snapshot_writer), download_stats)
+                try:
+                    for i, item in enumerate(iter_feed_items(chunks, feed_info)):
+                        items_count = i + 1
+                        episode = self._parse_item(item, i, report)
+                        status = writer.add(episode)
+                        if episode["pub_time"] and len(recent_pub_times) < RECENT_PUB_TIMES:
+                            recent_pub_times.append(episode["pub_time"])
+
+                        # 增量模式：新单集都在前面，连续遇到足够多的已有单集就不再读取剩余内容
+                        known_run = 0 if status == "inserted" else known_run + 1
+                        if self.incremental and known_run >= self.known_run_threshold:
+                            stopped_early = True
+                            break
+                except ET.ParseError as e:
+                    if not download_stats["has_content"]:
+                        raise ValueError("服务器返回空内容")
+                    error_line = e.position[0]
+                    error_col = e.position[1]
+                    raise ValueError(f"XML解析错误（行: {error_line}, 列: {error_col}）：{str(e)}")
+                finally:
+                    # 下载和解析交替进行：解析用时为总用时减去接收数据和写库的用时
+                    stats["bytes"] = download_stats["bytes"]
+                    stats["items"] = items_count
+                    timings["download"] = download_stats["seconds"]
+                    timings["parse"] = (time.perf_counter() - loop_started
+                                        - download_stats["seconds"] - writer.write_seconds)
+
+            # 所有单集在一个事务中提交
+            writer.commit()
+            timings["db_write"] = writer.write_seconds
+
+            # 保存原始XML并存档快照；提前停止时只收到了部分内容，保留上次的完整文件
+            if not stopped_early:
+                os.replace(partial_xml_path, original_xml_path)
+                result["snapshot"] = snapshot_writer.commit()
+                snapshot_writer = None
+
+            # 提取专辑标题
+            album_title = "未知专辑"
+            if feed_info["has_channel"]:
+                if feed_info["title"] is not None:
+                    album_title = feed_info["title"]
+
+                # 更新专辑信息到专辑数据库和系统数据库
+                self.update_album_info(album_conn, album_id, album_title)
+            result["title"] = album_title
+
+            if not items_count:
+                result["message"] = "未找到专辑中的单集信息"
+                self.log_result(album_id, False, result["message"])
+                return result
+
+            # 处理成功后才保存校验值，失败时下次仍会重新获取。增量模式提前停止时，新单集都已提交，
+            # 连续的已有单集说明其余部分没有变化，同样保存，否则之后每次都拿不到304
+            self.save_feed_validators(album_id, response.headers.get("ETag"),
+                                      response.headers.get("Last-Modified"))
+
+            result["success"] = True
+            result["total"] = items_count
+            result["new"] = writer.inserted
+            result["updated"] = writer.updated
+            result["unchanged"] = writer.unchanged
+            result["stopped_early"] = stopped_early
+            result["recent_pub_times"] = recent_pub_times
+            result["message"] = (f"共处理 {items_count} 个单集，新增 {writer.inserted} 个，"
+                                 f"更新 {writer.updated} 个，未变化 {writer.unchanged} 个")
+            if stopped_early:
+                result["message"] += f"（增量模式：连续 {known_run} 个已有单集，已停止读取）"
+
+        except FetchCancelled:
+            # 未提交的单集随连接关闭一起回滚
+            result["cancelled"] = True
+            result["message"] = "已取消"
+        except Exception as e:
+            result["message"] = f"获取或解析专辑数据时出错: {str(e)}"
+        finally:
+            if response is not None:
+                response.close()
+            if album_conn:
+                album_conn.close()
+            if os.path.exists(partial_xml_path):
+                os.remove(partial_xml_path)
+            if snapshot_writer is not None:
+                snapshot_writer.abort()
+            timings["total"] = time.perf_counter() - started
+            self.record_metrics(result, timings, stats)
+
+        self.log_result(album_id, result["success"], result["message"])
+        return result
+
+    def _save_chunks(self, chunks, sinks, stats):
+        """把下载的数据块原样写入各个输出（文件、快照），同时交给解析器
+
+        stats["seconds"] 累计等待网络数据和写入输出的用时。
+        """
+        chunks = iter(chunks)
+        while True:
+            received = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                stats["seconds"] += time.perf_counter() - received
+                break
+            for sink in sinks:
+                sink.write(chunk)
+            stats["bytes"] += len(chunk)
+            stats["seconds"] += time.perf_counter() - received
+            if not chunk:
+                continue
+            if not stats["has_content"] and chunk.strip():
+                stats["has_content"] = True
+            yield chunk
+
+    def _parse_item(self, item, i, report):
+        """把一个单集元素解析为待写入的单集数据"""
+        episode = parse_item(item, i)
+
+        # 更新进度（流式解析时总数未知）
+        report(i + 1, 0, f"正在处理: {episode['title'][:30]}... (第{i + 1}个)")
+        return episode
+
+    def rebuild_albums(self, album_ids, processes=None, progress_callback=None):
+        """用已下载的feed重新导入专辑数据库，不访问网络
+
+        与获取相同，按guid（以及track_id、标题）插入新单集、更新已有单集，标注保持不变；
+        数据库中有而feed中已经没有的单集不会删除，只在结果中记为 missing。
+        解析是CPU密集的，交给进程池并行完成；各进程只返回单集行元组，
+        由当前进程作为唯一的写入者依次写入各专辑数据库。processes 默认为CPU核数。
+        progress_callback(album_id, 已完成数, 专辑总数, message) 在当前进程中调用。
+        """
+        album_ids = list(dict.fromkeys(album_ids))
+        results = {}
+        sources = {}
+        for album_id in album_ids:
+            source = self.feed_source(album_id)
+            if source:
+                sources[album_id] = source
+            else:
+                results[album_id] = {"album_id": album_id, "success": False, "total": 0, "new": 0,
+                                     "message": "没有已下载的原始XML或快照"}
+                self.log_result(album_id, False, results[album_id]["message"])
+
+        if sources:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = {executor.submit(parse_feed_file, path): album_id
+                           for album_id, path in sources.items()}
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        album_id = futures[future]
+                        result = self._write_parsed_feed(album_id, future)
+                        results[album_id] = result
+                        if progress_callback:
+                            progress_callback(album_id, len(results), len(album_ids), result["message"])
+
+        return [results[album_id] for album_id in album_ids]
+
+    def feed_source(self, album_id):
+        """返回专辑已下载的feed文件：优先使用原始XML，其次是最近一份快照"""
+        xml_path = os.path.join(self.albums_dir, f"album_{album_id}", f"original_{album_id}.xml")
+        if os.path.isfile(xml_path):
+            return xml_path
+        sha256 = self.snapshot_store.latest(album_id)
+        if sha256:
+            return self.snapshot_store.object_path(sha256)
+        return None
+
+    def _write_parsed_feed(self, album_id, future):
+        """把进程池返回的解析结果写入专辑数据库，返回处理结果字典"""
+        result = {"album_id": album_id, "success": False, "message": "", "total": 0, "new": 0}
+        album_conn = None
+        try:
+            feed_info, rows = future.result()
+
+            album_folder = os.path.join(self.albums_dir, f"album_{album_id}")
+            os.makedirs(album_folder, exist_ok=True)
+            album_conn = self.init_album_database(os.path.join(album_folder, f"album_{album_id}.db"))
+            writer = EpisodeBatchWriter(album_conn)
+            for row in rows:
+                writer.add(dict(zip(EPISODE_ROW_FIELDS, row)))
+            writer.commit()
+
+            if feed_info["has_channel"]:
+                result["title"] = feed_info["title"] or "未知专辑"
+                self.update_album_info(album_conn, album_id, result["title"])
+
+            if not rows:
+                result["message"] = "未找到专辑中的单集信息"
+            else:
+                result["success"] = True
+                result["total"] = len(rows)
+                result["new"] = writer.inserted
+                result["updated"] = writer.updated
+                result["unchanged"] = writer.unchanged
+                result["missing"] = writer.missing
+                result["message"] = (f"共处理 {len(rows)} 个单集，新增 {writer.inserted} 个，"
+                                     f"更新 {writer.updated} 个，未变化 {writer.unchanged} 个")
+                if writer.missing:
+                    result["message"] += f"，另有 {writer.missing} 个单集已不在feed中（保留）"
+        except ET.ParseError as e:
+            result["message"] = f"XML解析错误（行: {e.position[0]}, 列: {e.position[1]}）：{str(e)}"
+        except Exception as e:
+            result["message"] = f"重新导入专辑数据时出错: {str(e)}"
+        finally:
+            if album_conn:
+                album_conn.close()
+
+        self.log_result(album_id, result["success"], result["message"])
+        return result
+
+    def import_existing_feeds(self):
+        """把albums目录下已有的 original_*.xml 导入快照库，返回新登记的份数"""
+        imported = 0
+        for folder in sorted(os.listdir(self.albums_dir)):
+            if not folder.startswith("album_"):
+                continue
+            album_id = folder[len("album_"):]
+            xml_path = os.path.join(self.albums_dir, folder, f"original_{album_id}.xml")
+            if os.path.isfile(xml_path):
+                _, added = self.snapshot_store.import_file(album_id, xml_path)
+                imported += 1 if added else 0
+        return imported
+
+    def list_album_ids(self):
+        """返回系统数据库中登记的所有专辑ID"""
+        with self._system_db_lock:
+            system_conn = self.connect_system_database()
+            try:
+                return [row[0] for row in system_conn.execute("SELECT id FROM albums ORDER BY update_time DESC")]
+            finally:
+                system_conn.close()
+
+    def album_databases(self, album_ids=None):
+        """逐个打开专辑数据库（必要时先迁移），产出 (album_id, conn)；album_ids 为空时遍历所有已下载的专辑"""
+        if album_ids is None:
+            album_ids = sorted(folder[len("album_"):] for folder in os.listdir(self.albums_dir)
+                               if folder.startswith("album_"))
+        for album_id in dict.fromkeys(album_ids):
+            db_path = os.path.join(self.albums_dir, f"album_{album_id}", f"album_{album_id}.db")
+            if not os.path.isfile(db_path):
+                continue
+            conn = self.init_album_database(db_path)
+            try:
+                yield album_id, conn
+            finally:
+                conn.close()
+
+    def duration_totals(self, album_ids=None):
+        """统计各专辑的单集数、总时长和最长单集（秒），以及所有专辑的合计"""
+        albums = []
+        for album_id, conn in self.album_databases(album_ids):
+            count, known, total, longest = conn.execute(
+                "SELECT COUNT(*), COUNT(duration_seconds), SUM(duration_seconds), MAX(duration_seconds) FROM episodes"
+            ).fetchone()
+            albums.append({"album_id": album_id, "episodes": count, "unknown_duration": count - known,
+                           "total_seconds": total or 0, "longest_seconds": longest or 0})
+        return {
+            "albums": albums,
+            "episodes": sum(album["episodes"] for album in albums),
+            "total_seconds": sum(album["total_seconds"] for album in albums),
+        }
+
+    def episodes_by_duration(self, album_ids=None, min_seconds=None, max_seconds=None,
+                             longest_first=True, limit=None):
+        """按时长筛选并排序单集，每个专辑一次走 duration_seconds 索引的查询，再合并各专辑的有序结果
+
+        返回 {"album_id", "id", "title", "duration", "duration_seconds"} 字典的列表。
+        """
+        conditions = ["duration_seconds IS NOT NULL"]
+        params = []
+        if min_seconds is not None:
+            conditions.append("duration_seconds >= ?")
+            params.append(min_seconds)
+        if max_seconds is not None:
+            conditions.append("duration_seconds < ?")
+            params.append(max_seconds)
+        sql = (f"SELECT id, title, duration, duration_seconds FROM episodes WHERE {' AND '.join(conditions)} "
+               f"ORDER BY duration_seconds {'DESC' if longest_first else 'ASC'}")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        per_album = []
+        for album_id, conn in self.album_databases(album_ids):
+            per_album.append([{"album_id": album_id, "id": row_id, "title": title, "duration": duration,
+                               "duration_seconds": seconds}
+                              for row_id, title, duration, seconds in conn.execute(sql, params)])
+
+        merged = heapq.merge(*per_album, key=lambda episode: episode["duration_seconds"], reverse=longest_first)
+        episodes = list(merged)
+        return episodes[:limit] if limit else episodes
+
+    def scan_albums(self, max_workers=ALBUM_SCAN_WORKERS):
+        """增量扫描albums目录，把各专辑的标题导入系统数据库，返回 (本次读取的专辑数, 专辑总数)
+
+        各专辑数据库的修改时间和大小与扫描清单一致、且已在系统数据库中登记的专辑不再打开；
+        有变化的专辑并行读取标题，所有更新在一个事务中写入。
+        """
+        found = {}
+        with os.scandir(self.albums_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith("album_") and entry.is_dir():
+                    album_id = entry.name[len("album_"):]
+                    db_path = os.path.join(entry.path, f"album_{album_id}.db")
+                    signature = album_db_signature(db_path)
+                    if signature:
+                        found[album_id] = (db_path, signature)
+
+        with self._system_db_lock:
+            system_conn = self.connect_system_database()
+            try:
+                manifest = dict(system_conn.execute("SELECT album_id, signature FROM album_scan_manifest"))
+                registered = {row[0] for row in system_conn.execute("SELECT id FROM albums")}
+            finally:
+                system_conn.close()
+
+        changed = [album_id for album_id, (_, signature) in found.items()
+                   if manifest.get(album_id) != signature or album_id not in registered]
+        removed = [album_id for album_id in manifest if album_id not in found]
+        if not changed and not removed:
+            return 0, len(found)
+
+        def read_album(album_id):
+            db_path = found[album_id][0]
+            title = read_album_title(db_path) or f"专辑 {album_id}"
+            # 读取可能触发WAL检查点而改变文件，变化标记在读取之后重新计算
+            return album_id, title, album_db_signature(db_path)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            rows = list(executor.map(read_album, changed))
+
+        with self._system_db_lock:
+            system_conn = self.connect_system_database()
+            try:
+                with system_conn:
+                    system_conn.executemany('''
+                    INSERT INTO albums (id, title, update_time)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(id) DO UPDATE SET title = excluded.title, update_time = excluded.update_time
+                    ''', [(album_id, title) for album_id, title, _ in rows])
+                    system_conn.executemany('''
+                    INSERT OR REPLACE INTO album_scan_manifest (album_id, signature, title)
+                    VALUES (?, ?, ?)
+                    ''', [(album_id, signature, title) for album_id, title, signature in rows])
+                    system_conn.executemany("DELETE FROM album_scan_manifest WHERE album_id = ?",
+                                            [(album_id,) for album_id in removed])
+            finally:
+                system_conn.close()
+        return len(rows), len(found)
+
+    def episodes_published(self, album_ids=None, since=None, until=None, limit=None):
+        """按发布时间从新到旧列出单集，每个专辑一次走 pub_time 索引的范围查询，再合并各专辑的结果
+
+        since / until 为Unix时间戳或datetime，分别表示发布时间的下限（含）和上限（不含）。
+        返回 {"album_id", "id", "guid", "title", "duration", "url", "pub_time"} 字典的列表。
+        """
+        conditions = ["pub_time IS NOT NULL"]
+        params = []
+        for bound, operator in ((since, ">="), (until, "<")):
+            if bound is not None:
+                conditions.append(f"pub_time {operator} ?")
+                params.append(int(bound.timestamp()) if isinstance(bound, datetime) else int(bound))
+        sql = (f"SELECT id, guid, title, duration, url, pub_time FROM episodes "
+               f"WHERE {' AND '.join(conditions)} ORDER BY pub_time DESC")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        per_album = []
+        for album_id, conn in self.album_databases(album_ids):
+            per_album.append([{"album_id": album_id, "id": row_id, "guid": guid, "title": title,
+                               "duration": duration, "url": url, "pub_time": pub_time}
+                              for row_id, guid, title, duration, url, pub_time in conn.execute(sql, params)])
+
+        episodes = list(heapq.merge(*per_album, key=lambda episode: episode["pub_time"], reverse=True))
+        return episodes[:limit] if limit else episodes
+
+    def connect_system_database(self):
+        """连接系统全局数据库，并确保专辑列表表存在"""
+        conn = sqlite3.connect(self.system_db_path, timeout=30)
+        cursor = conn.cursor()
+
+        # 创建专辑列表表
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS albums (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            description TEXT,
+            cover_url TEXT,
+            update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        # 旧版数据库没有条件请求所需的校验字段，按需补充
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(albums)")}
+        if "etag" not in columns:
+            cursor.execute("ALTER TABLE albums ADD COLUMN etag TEXT")
+        if "last_modified" not in columns:
+            cursor.execute("ALTER TABLE albums ADD COLUMN last_modified TEXT")
+
+        # 扫描清单：各专辑数据库上次导入时的变化标记，未变化的专辑不再打开
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS album_scan_manifest (
+            album_id TEXT PRIMARY KEY,
+            signature TEXT,
+            title TEXT
+        )
+        ''')
+
+        conn.commit()
+        return conn
+
+    def get_feed_validators(self, album_id):
+        """读取专辑上次获取时保存的 (ETag, Last-Modified)"""
+        with self._system_db_lock:
+            system_conn = self.connect_system_database()
+            try:
+                row = system_conn.execute(
+                    "SELECT etag, last_modified FROM albums WHERE id = ?", (album_id,)
+                ).fetchone()
+            finally:
+                system_conn.close()
+        return row if row else (None, None)
+
+    def save_feed_validators(self, album_id, etag, last_modified):
+        """保存专辑本次获取的 ETag 和 Last-Modified，供下次条件请求使用"""
+        with self._system_db_lock:
+            system_conn = self.connect_system_database()
+            try:
+                system_conn.execute('''
+                INSERT INTO albums (id, etag, last_modified)
+                VALUES (?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified
+                ''', (album_id, etag, last_modified))
+                system_conn.commit()
+            finally:
+                system_conn.close()
+
+    def init_album_database(self, db_path):
+        """初始化专辑数据库，只包含单集数据，返回数据库连接"""
+        # 连接数据库；WAL + synchronous=NORMAL，批量写入时每个事务只需一次同步
+        conn = sqlite3.connect(db_path, timeout=30)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+
+        # 创建专辑信息表（仅存储当前专辑的基本信息）
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS album_info (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        # 创建单集表
+        cursor.execute(EPISODES_TABLE_SQL.format(table="episodes"))
+
+        # 维护用的键值记录（如上次补充发布时间用的feed文件）
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS album_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        ''')
+
+        # 旧版数据库以标题为唯一键且没有guid列，需要迁移
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(episodes)")]
+        if "guid" not in columns:
+            self.migrate_episode_identity(conn)
+        else:
+            # 后来增加的列
+            for column, column_type in (("duration_seconds", "INTEGER"), ("local_path", "TEXT"),
+                                        ("pub_time", "INTEGER")):
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE episodes ADD COLUMN {column} {column_type}")
+        if "duration_seconds" not in columns:
+            self.backfill_duration_seconds(conn)
+
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_episodes_guid ON episodes(guid)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_episodes_title ON episodes(title)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_episodes_duration_seconds ON episodes(duration_seconds)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_episodes_pub_time ON episodes(pub_time)")
+        if "pub_time" not in columns or cursor.execute(
+                "SELECT 1 FROM episodes WHERE pub_time IS NULL LIMIT 1").fetchone():
+            # 还有记录缺发布时间就再试一次（feed文件没变时直接跳过），按id逐条更新，放在建索引之后
+            self.backfill_pub_times(conn, os.path.basename(db_path)[len("album_"):-len(".db")])
+
+        conn.commit()
+        return conn
+
+    def backfill_duration_seconds(self, conn):
+        """根据时长文本补上旧记录的整数秒"""
+        rows = conn.execute(
+            "SELECT id, duration FROM episodes WHERE duration_seconds IS NULL AND duration != ''").fetchall()
+        updates = [(duration_to_seconds(duration), row_id) for row_id, duration in rows]
+        conn.executemany("UPDATE episodes SET duration_seconds = ? WHERE id = ?",
+                         [update for update in updates if update[0] is not None])
+
+    def backfill_pub_times(self, conn, album_id):
+        """从已下载的原始XML（或最近一份快照）中补上旧记录的发布时间
+
+        按音频地址中的track_id匹配，匹配不上再按标题；同一个feed文件只尝试一次，
+        feed更新后再补仍缺发布时间的记录。
+        """
+        source = self.feed_source(album_id)
+        if not source:
+            return
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return
+        signature = f"{source}:{stat.st_mtime_ns}:{stat.st_size}"
+        row = conn.execute("SELECT value FROM album_meta WHERE key = 'pub_time_source'").fetchone()
+        if row and row[0] == signature:
+            return
+        try:
+            _, rows = parse_feed_file(source)
+        except (ET.ParseError, OSError) as e:
+            print(f"读取专辑 {album_id} 的原始XML失败，无法补充发布时间: {str(e)}")
+            return
+
+        fields = {field: index for index, field in enumerate(EPISODE_ROW_FIELDS)}
+        by_track = {}
+        by_title = {}
+        for row in rows:
+            pub_time = row[fields["pub_time"]]
+            if pub_time is not None:
+                by_track.setdefault(track_id_from_url(row[fields["url"]]), pub_time)
+                by_title.setdefault(row[fields["title"]], pub_time)
+        by_track.pop(None, None)
+
+        updates = []
+        for row_id, url, title in conn.execute("SELECT id, url, title FROM episodes WHERE pub_time IS NULL"):
+            pub_time = by_track.get(track_id_from_url(url))
+            if pub_time is None:
+                pub_time = by_title.get(title)
+            if pub_time is not None:
+                updates.append((pub_time, row_id))
+        conn.executemany("UPDATE episodes SET pub_time = ? WHERE id = ?", updates)
+        conn.execute("INSERT OR REPLACE INTO album_meta (key, value) VALUES ('pub_time_source', ?)", (signature,))
+
+    def migrate_episode_identity(self, conn):
+        """把旧版单集表重建为带guid列的新表（保留id和标注）
+
+        旧表的 title UNIQUE 约束无法用 ALTER TABLE 去掉，所以整表复制后改名。
+        guid留空，下次获取或重新导入时由 EpisodeBatchWriter 按track_id或标题匹配feed后填入feed中的guid
+        （feed的guid常常是CDN音频地址，不能由track_id推测）；发布时间由 backfill_pub_times 补上。
+        """
+        cursor = conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS episodes_migrating")
+        cursor.execute(EPISODES_TABLE_SQL.format(table="episodes_migrating"))
+        cursor.execute('''
+        INSERT INTO episodes_migrating (id, filename, duration, title, annotation, url, created, updated)
+        SELECT id, filename, duration, title, annotation, url, created, updated FROM episodes
+        ''')
+        cursor.execute("DROP TABLE episodes")
+        cursor.execute("ALTER TABLE episodes_migrating RENAME TO episodes")
+
+    def update_album_info(self, album_conn, album_id, title):
+        """更新专辑数据库和系统数据库中的专辑信息"""
+        # 更新专辑数据库
+        cursor = album_conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO album_info (id, title, last_updated)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+        ''', (album_id, title))
+        album_conn.commit()
+
+        # 更新系统数据库
+        with self._system_db_lock:
+            system_conn = self.connect_system_database()
+            try:
+                # 用UPSERT而不是INSERT OR REPLACE，以免清空已保存的校验值
+                system_conn.execute('''
+                INSERT INTO albums (id, title, update_time)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(id) DO UPDATE SET title = excluded.title, update_time = excluded.update_time
+                ''', (album_id, title))
+                system_conn.commit()
+            finally:
+                system_conn.close()
 
 
 class PodcastDataGetter:
-    def __init__(self, root):
+    def __init__(self, root, program_dir=None):
         self.root = root
         self.root.title("播客数据获得")
         self.root.geometry("700x500")
@@ -27,33 +1617,22 @@ class PodcastDataGetter:
         self.style.configure("Treeview", font=("SimHei", 10))
 
         # 文件路径 - 适配PyInstaller打包
-        if getattr(sys, 'frozen', False):
-            # 打包为可执行文件时
-            if hasattr(sys, '_MEIPASS'):
-                # _MEIPASS是PyInstaller创建的临时文件夹
-                # 对于onefile模式，使用可执行文件所在目录
-                self.program_dir = os.path.dirname(os.path.abspath(sys.executable))
-            else:
-                self.program_dir = os.path.dirname(os.path.abspath(sys.executable))
-        else:
-            # 脚本模式
-            self.program_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        self.albums_dir = os.path.join(self.program_dir, "albums")
-        # 确保albums目录存在
-        os.makedirs(self.albums_dir, exist_ok=True)
+        self.program_dir = program_dir or get_program_dir()
+
+        # 获取核心（负责下载、解析、入库，批量时并发执行）
+        self.fetcher = AlbumFetcher(self.program_dir)
+
+        self.albums_dir = self.fetcher.albums_dir
 
         # 日志文件路径
-        self.log_file_path = os.path.join(self.program_dir, "podcast_download_log.txt")
+        self.log_file_path = self.fetcher.log_file_path
         
         # 数据存储
-        self.current_album_id = ""  # 当前专辑ID
         self.system_db_conn = None  # 系统全局数据库连接
-        self.album_db_conn = None  # 当前专辑数据库连接
-        self.system_db_path = os.path.join(self.program_dir, "podcast_system.db")  # 全局数据库路径
+        self.system_db_path = self.fetcher.system_db_path  # 全局数据库路径
         
-        # 多专辑处理标志
-        self.batch_processing = False
+        # 正在进行的获取任务的取消标志
+        self.fetch_cancel_event = None
 
         # 初始化
         self.init_system_database()
@@ -69,51 +1648,17 @@ class PodcastDataGetter:
             return
         
         try:
-            # 获取albums目录下的所有子目录
-            imported_count = 0
-            folders = [f for f in os.listdir(self.albums_dir) if os.path.isdir(os.path.join(self.albums_dir, f))]
+            # 只读取有变化的专辑
+            imported_count, album_count = self.fetcher.scan_albums()
             
-            for folder in folders:
-                # 检查是否是专辑文件夹（以"album_"开头）
-                if folder.startswith("album_"):
-                    album_id = folder[len("album_"):]
-                    album_folder = os.path.join(self.albums_dir, folder)
-                    album_db_path = os.path.join(album_folder, f"album_{album_id}.db")
-                    
-                    # 检查专辑数据库是否存在
-                    if os.path.exists(album_db_path):
-                        # 尝试从专辑数据库中获取专辑名称
-                        album_title = f"专辑 {album_id}"
-                        
-                        # 连接专辑数据库
-                        try:
-                            album_conn = sqlite3.connect(album_db_path)
-                            album_cursor = album_conn.cursor()
-                            
-                            # 尝试从album_info表获取专辑标题
-                            album_cursor.execute("SELECT title FROM album_info LIMIT 1")
-                            result = album_cursor.fetchone()
-                            if result:
-                                album_title = result[0]
-                            
-                            album_conn.close()
-                        except Exception as e:
-                            print(f"读取专辑 {album_id} 信息错误: {str(e)}")
-                            
-                        # 更新系统数据库
-                        if self.system_db_conn:
-                            cursor = self.system_db_conn.cursor()
-                            cursor.execute('''
-                            INSERT OR REPLACE INTO albums (id, title, update_time)
-                            VALUES (?, ?, CURRENT_TIMESTAMP)
-                            ''', (album_id, album_title))
-                            self.system_db_conn.commit()
-                            imported_count += 1
+            # 同时把已有的原始XML存入快照库
+            snapshot_count = self.fetcher.import_existing_feeds()
             
             # 重新加载专辑列表
             self.load_existing_albums()
             
-            messagebox.showinfo("导入完成", f"成功导入 {imported_count} 个专辑信息到系统数据库")
+            messagebox.showinfo("导入完成", f"共 {album_count} 个专辑，更新 {imported_count} 个专辑信息到系统数据库，"
+                                           f"新存档 {snapshot_count} 份原始XML")
             
         except Exception as e:
             messagebox.showerror("导入错误", f"扫描和导入专辑信息时出错: {str(e)}")
@@ -137,6 +1682,11 @@ class PodcastDataGetter:
         ttk.Entry(input_frame, textvariable=self.album_id_var, width=40).grid(row=0, column=1, sticky=tk.W, pady=5, padx=5)
         ttk.Button(input_frame, text="获取数据", command=self.fetch_album_data).grid(row=0, column=2, padx=10)
 
+        # 增量模式：只读取feed开头的新单集
+        self.incremental_var = tk.BooleanVar(value=self.fetcher.incremental)
+        ttk.Checkbutton(input_frame, text="只获取新单集（增量更新）", variable=self.incremental_var,
+                        command=self.on_incremental_toggle).grid(row=1, column=1, sticky=tk.W, padx=5)
+
         # 已有专辑列表区域
         albums_frame = ttk.LabelFrame(main_frame, text="已有专辑", padding="10")
         albums_frame.pack(fill=tk.BOTH, expand=True, pady=10)
@@ -170,6 +1720,10 @@ class PodcastDataGetter:
         # 加载已有专辑
         self.load_existing_albums()
 
+    def on_incremental_toggle(self):
+        """切换增量更新模式"""
+        self.fetcher.incremental = self.incremental_var.get()
+
     def load_existing_albums(self):
         """加载已有的专辑列表"""
         # 清空列表
@@ -204,17 +1758,7 @@ class PodcastDataGetter:
 
     def log_result(self, album_id, success, message):
         """记录专辑处理结果到日志文件"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        status = "成功" if success else "失败"
-        log_entry = f"[{timestamp}] 专辑ID: {album_id} - {status} - {message}\n"
-        
-        try:
-            with open(self.log_file_path, "a", encoding="utf-8") as log_file:
-                log_file.write(log_entry)
-            # 同时输出到控制台
-            print(log_entry.strip())
-        except Exception as e:
-            print(f"写入日志失败: {str(e)}")
+        self.fetcher.log_result(album_id, success, message)
     
     def fetch_album_data(self, album_id=None):
         """从网络获取专辑信息和数据"""
@@ -229,82 +1773,9 @@ class PodcastDataGetter:
                 messagebox.showinfo("提示", "请输入专辑ID")
                 return
             
-            # 如果输入多个ID，逐个处理
+            # 如果输入多个ID，并发处理
             if len(album_ids) > 1:
-                # 批量处理标志设为True
-                self.batch_processing = True
-                
-                # 创建批量处理进度界面
-                for widget in self.root.winfo_children():
-                    widget.destroy()
-                
-                main_frame = ttk.Frame(self.root, padding="10")
-                main_frame.pack(fill=tk.BOTH, expand=True)
-                
-                ttk.Label(main_frame, text="播客数据获得 - 批量处理",
-                          font=("SimHei", 14, "bold")).pack(pady=10)
-                
-                # 专辑总进度
-                album_progress_frame = ttk.LabelFrame(main_frame, text="专辑处理进度")
-                album_progress_frame.pack(fill=tk.X, padx=20, pady=10)
-                
-                self.album_progress_var = tk.DoubleVar()
-                album_progress = ttk.Progressbar(album_progress_frame, variable=self.album_progress_var, maximum=len(album_ids))
-                album_progress.pack(fill=tk.X, padx=10, pady=5)
-                
-                self.album_status_var = tk.StringVar(value=f"准备处理第1个专辑 (共{len(album_ids)}个)")
-                ttk.Label(album_progress_frame, textvariable=self.album_status_var).pack(pady=5)
-                
-                # 当前专辑处理状态
-                current_album_frame = ttk.LabelFrame(main_frame, text="当前专辑处理详情")
-                current_album_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
-                
-                self.current_album_status_var = tk.StringVar(value="等待开始处理...")
-                ttk.Label(current_album_frame, textvariable=self.current_album_status_var, wraplength=600).pack(pady=5)
-                
-                self.current_item_progress_var = tk.DoubleVar()
-                self.current_item_progress = ttk.Progressbar(current_album_frame, variable=self.current_item_progress_var)
-                self.current_item_progress.pack(fill=tk.X, padx=10, pady=5)
-                
-                self.root.update()
-                
-                # 记录批量处理开始
-                self.log_result("批量处理开始", True, f"共{len(album_ids)}个专辑ID待处理")
-                
-                # 逐个处理每个专辑ID
-                for i, album_id in enumerate(album_ids):
-                    # 更新专辑进度
-                    self.album_progress_var.set(i)
-                    self.album_status_var.set(f"正在处理第{i+1}个专辑: {album_id} (共{len(album_ids)}个)")
-                    self.root.update()
-                    
-                    # 检查专辑ID是否有效
-                    if not album_id.isdigit():
-                        self.log_result(album_id, False, "专辑ID不是有效的数字")
-                        self.current_album_status_var.set(f"专辑ID {album_id} 不是有效的数字，已跳过")
-                        self.root.update()
-                        continue
-                    
-                    # 调用实际的数据获取方法
-                    self._fetch_single_album_data(album_id)
-                    
-                    # 确保UI更新
-                    self.root.update()
-                
-                # 所有专辑处理完毕
-                self.album_progress_var.set(len(album_ids))
-                self.album_status_var.set(f"已完成所有{len(album_ids)}个专辑的处理")
-                self.current_album_status_var.set("批量处理已完成！")
-                self.root.update()
-                
-                self.log_result("批量处理结束", True, f"已完成{len(album_ids)}个专辑的处理")
-                self.batch_processing = False
-                
-                # 添加完成按钮
-                btn_frame = ttk.Frame(main_frame)
-                btn_frame.pack(pady=20)
-                ttk.Button(btn_frame, text="返回主界面", command=self.show_main_interface).pack()
-                
+                self._fetch_batch_album_data(album_ids)
                 return
             else:
                 # 只有一个ID，直接使用
@@ -318,245 +1789,223 @@ class PodcastDataGetter:
         # 调用实际的数据获取方法
         self._fetch_single_album_data(album_id)
 
-    def _fetch_single_album_data(self, album_id):
-        """获取单个专辑的数据"""
-        # 创建专辑文件夹
-        self.current_album_id = album_id
-        self.album_folder = os.path.join(self.albums_dir, f"album_{album_id}")
-        os.makedirs(self.album_folder, exist_ok=True)
-
-        # 准备数据路径
-        self.input_data = {
-            "album_id": album_id,
-            "album_folder": self.album_folder,
-            "db_path": os.path.join(self.album_folder, f"album_{album_id}.db"),
-            "original_xml_path": os.path.join(self.album_folder, f"original_{album_id}.xml")
-        }
-        
-        # 非批量处理时才显示进度界面
-        if not self.batch_processing:
-            # 清空主框架，显示进度界面
-            for widget in self.root.winfo_children():
-                widget.destroy()
-
-            main_frame = ttk.Frame(self.root, padding="10")
-            main_frame.pack(fill=tk.BOTH, expand=True)
+    def _start_fetch_job(self, album_ids, on_progress, on_result, on_done):
+        """在工作线程中获取专辑数据，返回取消标志
 
-            ttk.Label(main_frame, text="播客数据获得 - 获取专辑数据",
-                      font=("SimHei", 14, "bold")).pack(pady=10)
+        工作线程只把进度和结果放入队列；Tk线程用 root.after 以固定频率取出，
+        同一专辑在一帧内的多条进度只显示最新一条。
+        """
+        events = queue.Queue()
+        cancel_event = threading.Event()
 
-            status_frame = ttk.Frame(main_frame)
-            status_frame.pack(expand=True, fill=tk.BOTH)
+        def worker():
+            try:
+                results = self.fetcher.fetch_albums(
+                    album_ids,
+                    lambda *args: events.put(("progress", args)),
+                    lambda result: events.put(("result", result)),
+                    cancel_event=cancel_event
+                )
+                events.put(("done", results))
+            except Exception as e:
+                events.put(("error", e))
+
+        def poll():
+            latest_progress = {}
+            finished = None
+            while True:
+                try:
+                    kind, payload = events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    latest_progress[payload[0]] = payload
+                elif kind == "result":
+                    on_result(payload)
+                else:
+                    finished = (kind, payload)
+
+            for args in latest_progress.values():
+                on_progress(*args)
+
+            if finished:
+                self.fetch_cancel_event = None
+                on_done(*finished)
+            else:
+                self.root.after(UI_REFRESH_MS, poll)
 
-            status_var = tk.StringVar(value="正在从网络获取专辑信息...")
-            ttk.Label(status_frame, textvariable=status_var, font=("SimHei", 12)).pack(pady=20)
+        self.fetch_cancel_event = cancel_event
+        threading.Thread(target=worker, name="fetch-job", daemon=True).start()
+        self.root.after(UI_REFRESH_MS, poll)
+        return cancel_event
 
-            progress = ttk.Progressbar(status_frame, mode="indeterminate")
-            progress.pack(fill=tk.X, padx=50, pady=20)
-            progress.start()
+    def cancel_fetch(self):
+        """取消正在进行的获取任务"""
+        if self.fetch_cancel_event:
+            self.fetch_cancel_event.set()
 
-            self.root.update()
-        else:
-            # 批量处理时更新状态变量和进度条
-            class BatchStatusVar:
-                def set(self, value):
-                    if hasattr(self, 'manager') and hasattr(self.manager, 'current_album_status_var'):
-                        self.manager.current_album_status_var.set(value)
-                        self.manager.root.update()
-            
-            class BatchProgress:
-                def start(self):
-                    if hasattr(self, 'manager'):
-                        self.manager.current_item_progress_var.set(0)
-                        self.manager.root.update()
-                def stop(self):
-                    pass
+    def _fetch_batch_album_data(self, album_ids):
+        """并发获取多个专辑的数据，Tk线程只负责定时刷新界面"""
+        # 创建批量处理进度界面
+        for widget in self.root.winfo_children():
+            widget.destroy()
+        
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(main_frame, text="播客数据获得 - 批量处理",
+                  font=("SimHei", 14, "bold")).pack(pady=10)
+        
+        # 专辑总进度
+        album_progress_frame = ttk.LabelFrame(main_frame, text="专辑处理进度")
+        album_progress_frame.pack(fill=tk.X, padx=20, pady=10)
+        
+        unique_ids = list(dict.fromkeys(album_ids))
+        self.album_progress_var = tk.DoubleVar()
+        album_progress = ttk.Progressbar(album_progress_frame, variable=self.album_progress_var, maximum=len(unique_ids))
+        album_progress.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.album_status_var = tk.StringVar(
+            value=f"正在并发处理{len(unique_ids)}个专辑 (并发数: {self.fetcher.max_workers})")
+        ttk.Label(album_progress_frame, textvariable=self.album_status_var).pack(pady=5)
+        
+        # 各专辑处理状态
+        current_album_frame = ttk.LabelFrame(main_frame, text="各专辑处理详情")
+        current_album_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        
+        status_tree = ttk.Treeview(current_album_frame, columns=("id", "status"), show="headings")
+        status_tree.heading("id", text="专辑ID")
+        status_tree.heading("status", text="处理状态")
+        status_tree.column("id", width=100, anchor=tk.CENTER)
+        status_tree.column("status", width=500, anchor=tk.W)
+        status_scrollbar = ttk.Scrollbar(current_album_frame, orient="vertical", command=status_tree.yview)
+        status_tree.configure(yscrollcommand=status_scrollbar.set)
+        status_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        status_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        rows = {}
+        for album_id in unique_ids:
+            rows[album_id] = status_tree.insert("", tk.END, values=(album_id, "等待开始处理..."))
+        
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(pady=20)
+        cancel_button = ttk.Button(btn_frame, text="取消", command=self.cancel_fetch)
+        cancel_button.pack()
+        
+        # 记录批量处理开始
+        self.log_result("批量处理开始", True, f"共{len(unique_ids)}个专辑ID待处理")
+        
+        finished_count = [0]
+        
+        def on_progress(album_id, current, total, message):
+            status_tree.set(rows[album_id], "status", message)
+        
+        def on_result(result):
+            finished_count[0] += 1
+            self.album_progress_var.set(finished_count[0])
+            status = "成功" if result["success"] else "失败"
+            status_tree.set(rows[result["album_id"]], "status", f"{status} - {result['message']}")
+        
+        def on_done(kind, payload):
+            cancel_button.destroy()
+            if kind == "error":
+                self.album_status_var.set(f"批量处理出错: {str(payload)}")
+            else:
+                # 所有专辑处理完毕
+                success_count = sum(1 for result in payload if result["success"])
+                cancelled = any(result.get("cancelled") for result in payload)
+                prefix = "已取消批量处理" if cancelled else f"已完成所有{len(unique_ids)}个专辑的处理"
+                self.album_status_var.set(f"{prefix}，成功 {success_count} 个")
             
-            status_var = BatchStatusVar()
-            status_var.manager = self
+            self.log_result("批量处理结束", kind == "done", f"已完成{finished_count[0]}个专辑的处理")
             
-            progress = BatchProgress()
-            progress.manager = self
-
-        try:
-            # 检查XML是否需要更新
-            xml_needs_update = True
-            if os.path.exists(self.input_data["original_xml_path"]):
-                # 始终更新XML以获取最新数据
-                if not self.batch_processing:
-                    status_var.set("已有XML文件，正在更新...")
-                    self.root.update()
-
-            # 构建RSS URL
-            rss_url = f"https://www.ximalaya.com/album/{album_id}.xml"
-            if not self.batch_processing:
-                status_var.set(f"正在访问: {rss_url}")
-                self.root.update()
-
-            # 发送请求获取XML
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            response = requests.get(rss_url, headers=headers, timeout=15)
-            response.raise_for_status()
-
-            if not response.content.strip():
-                raise ValueError("服务器返回空内容")
+            # 添加完成按钮
+            ttk.Button(btn_frame, text="返回主界面", command=self.show_main_interface).pack()
+        
+        self._start_fetch_job(unique_ids, on_progress, on_result, on_done)
 
-            # 保存原始XML
-            with open(self.input_data["original_xml_path"], "wb") as f:
-                f.write(response.content)
-            if not self.batch_processing:
-                ttk.Label(main_frame, text=f"原始XML已保存至: {self.input_data['original_xml_path']}",
-                          font=("SimHei", 9)).pack(pady=5)
+    def _fetch_single_album_data(self, album_id):
+        """获取单个专辑的数据"""
+        # 清空主框架，显示进度界面
+        for widget in self.root.winfo_children():
+            widget.destroy()
 
-            # 连接专辑数据库
-            self.init_album_database()
-            
-            # 连接系统数据库
-            if not hasattr(self, 'system_db_conn') or not self.system_db_conn:
-                self.init_system_database()
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
 
-            # 解析XML
-            try:
-                root = ET.fromstring(response.content)
-            except ET.ParseError as e:
-                error_line = e.position[0]
-                error_col = e.position[1]
-                raise ValueError(f"XML解析错误（行: {error_line}, 列: {error_col}）：{str(e)}")
+        ttk.Label(main_frame, text="播客数据获得 - 获取专辑数据",
+                  font=("SimHei", 14, "bold")).pack(pady=10)
 
-            # 提取专辑标题
-            album_title = "未知专辑"
-            channel = root.find(".//channel")
-            if channel:
-                album_title = channel.findtext("title", "未知专辑").strip()
+        status_frame = ttk.Frame(main_frame)
+        status_frame.pack(expand=True, fill=tk.BOTH)
 
-                # 更新专辑信息到系统数据库
-                self.update_album_info(album_id, album_title)
+        status_var = tk.StringVar(value="正在从网络获取专辑信息...")
+        ttk.Label(status_frame, textvariable=status_var, font=("SimHei", 12)).pack(pady=20)
 
-            # 查找所有item元素
-            items = root.findall(".//item")
+        progress = ttk.Progressbar(status_frame, mode="indeterminate")
+        progress.pack(fill=tk.X, padx=50, pady=20)
+        progress.start()
 
-            if not items:
-                self.log_result(album_id, False, "未找到专辑中的单集信息")
-                if not self.batch_processing:
-                    self.show_main_interface()
-                return
+        # 单集处理进度
+        progress_var = tk.DoubleVar()
+        item_progress = ttk.Progressbar(status_frame, variable=progress_var)
+        item_progress.pack(fill=tk.X, padx=50, pady=5)
 
-            # 单集处理进度
-            if not self.batch_processing:
-                progress_var = tk.DoubleVar()
-                item_progress = ttk.Progressbar(status_frame, variable=progress_var, maximum=len(items))
-                item_progress.pack(fill=tk.X, padx=50, pady=5)
+        item_status_var = tk.StringVar(value="")
+        ttk.Label(status_frame, textvariable=item_status_var).pack(pady=5)
 
-                item_status_var = tk.StringVar(value="开始处理单集...")
-                ttk.Label(status_frame, textvariable=item_status_var).pack(pady=5)
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(pady=20)
+        cancel_button = ttk.Button(btn_frame, text="取消", command=self.cancel_fetch)
+        cancel_button.pack()
+
+        def on_progress(album_id, current, total, message):
+            if total:
+                item_progress.configure(maximum=total)
+                progress_var.set(current)
+            if current:
+                item_status_var.set(message)
+            else:
+                status_var.set(message)
 
-                self.root.update()
+        def on_done(kind, payload):
+            progress.stop()
+            cancel_button.destroy()
+            if kind == "error":
+                result = {"success": False, "message": str(payload)}
             else:
-                # 批量处理时更新进度条和状态
-                progress_var = self.current_item_progress_var
-                # 设置进度条最大值
-                self.current_item_progress.configure(maximum=len(items))
-                
-                class BatchItemStatusVar:
-                    def set(self, value):
-                        if hasattr(self, 'manager') and hasattr(self.manager, 'current_album_status_var'):
-                            self.manager.current_album_status_var.set(value)
-                            self.manager.root.update()
-                
-                item_status_var = BatchItemStatusVar()
-                item_status_var.manager = self
-
-            new_items_count = 0
-            for i, item in enumerate(items):
-                title = item.findtext("title", "").strip()
-                if not title:
-                    title = f"未命名单集_{i + 1}"
-
-                # 更新进度
-                progress_var.set(i + 1)
-                item_status_var.set(f"正在处理: {title[:30]}... ({i + 1}/{len(items)})")
-                self.root.update()
-
-                # 提取时长
-                duration = self.extract_duration(item)
-
-                # 提取音频URL
-                audio_url = self.extract_enclosure_url(item)
-                if not audio_url:
-                    audio_url = item.findtext("link", "").strip()
-
-                # 生成文件名（使用标题的哈希值避免重复）
-                filename = f"episode_{hash(title)}_{i + 1}.mp3"
-
-                # 检查是否已存在该条目
-                if not self.check_episode_exists(title):
-                    # 新增条目，标注初始值为标题
-                    self.add_episode({
-                        "filename": filename,
-                        "duration": duration,
-                        "title": title,
-                        "annotation": title,  # 标注初始值等于标题
-                        "url": audio_url
-                    })
-                    new_items_count += 1
-
-                # 控制请求频率
-                if i % 5 == 0 and i > 0:
-                    time.sleep(1)
-
-            # 记录成功信息
-            success_message = f"共处理 {len(items)} 个单集，新增 {new_items_count} 个"
-            self.log_result(album_id, True, success_message)
-            
-            if not self.batch_processing:
-                status_var.set(f"成功获取专辑数据，{success_message}")
-                progress.stop()
+                result = payload[0]
+
+            if result["success"]:
+                status_var.set(f"成功获取专辑数据，{result['message']}")
+                if not result.get("not_modified"):
+                    ttk.Label(main_frame, text=f"原始XML已保存至: {result['original_xml_path']}",
+                              font=("SimHei", 9)).pack(pady=5)
 
                 # 返回按钮
-                btn_frame = ttk.Frame(main_frame)
-                btn_frame.pack(pady=20)
                 ttk.Button(btn_frame, text="返回主界面", command=self.show_main_interface).pack()
-
-        except Exception as e:
-            progress.stop()
-            
-            # 记录错误信息
-            error_msg = f"获取或解析专辑数据时出错: {str(e)}"
-            self.log_result(album_id, False, error_msg)
-            
-            if not self.batch_processing:
+            elif result["message"] == "未找到专辑中的单集信息":
+                self.show_main_interface()
+            elif result.get("cancelled"):
+                status_var.set("已取消获取专辑数据")
+                ttk.Button(btn_frame, text="重试", command=lambda: self._fetch_single_album_data(album_id)).pack(side=tk.LEFT, padx=10)
+                ttk.Button(btn_frame, text="返回", command=self.show_main_interface).pack(side=tk.LEFT, padx=10)
+            else:
                 status_var.set(f"获取专辑数据失败")
 
-                btn_frame = ttk.Frame(main_frame)
-                btn_frame.pack(pady=20)
-
                 ttk.Button(btn_frame, text="重试", command=lambda: self._fetch_single_album_data(album_id)).pack(side=tk.LEFT, padx=10)
                 ttk.Button(btn_frame, text="返回", command=self.show_main_interface).pack(side=tk.LEFT, padx=10)
 
-                # 非批量处理时仍显示错误弹窗，但批量处理时自动跳过
-                messagebox.showerror("错误", error_msg)
+                # 非批量处理时仍显示错误弹窗
+                messagebox.showerror("错误", result["message"])
+
+        self._start_fetch_job([album_id], on_progress, lambda result: None, on_done)
 
     def init_system_database(self):
         """初始化系统全局数据库，包含专辑列表"""
         try:
             # 连接数据库
-            self.system_db_conn = sqlite3.connect(self.system_db_path)
-            cursor = self.system_db_conn.cursor()
-
-            # 创建专辑列表表
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS albums (
-                id TEXT PRIMARY KEY,
-                title TEXT,
-                description TEXT,
-                cover_url TEXT,
-                update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-
-            self.system_db_conn.commit()
+            self.system_db_conn = self.fetcher.connect_system_database()
 
         except Exception as e:
             messagebox.showerror("数据库错误", f"初始化系统数据库失败: {str(e)}")
@@ -564,175 +2013,677 @@ class PodcastDataGetter:
                 self.system_db_conn.close()
                 self.system_db_conn = None
 
-    def init_album_database(self):
-        """初始化专辑数据库，只包含单集数据"""
-        try:
-            # 连接数据库
-            self.album_db_conn = sqlite3.connect(self.input_data["db_path"])
-            cursor = self.album_db_conn.cursor()
-
-            # 创建专辑信息表（仅存储当前专辑的基本信息）
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS album_info (
-                id TEXT PRIMARY KEY,
-                title TEXT,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-
-            # 创建单集表
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS episodes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT,
-                duration TEXT,
-                title TEXT UNIQUE,
-                annotation TEXT,
-                url TEXT,
-                created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-
-            self.album_db_conn.commit()
-
-        except Exception as e:
-            messagebox.showerror("数据库错误", f"初始化专辑数据库失败: {str(e)}")
-            if self.album_db_conn:
-                self.album_db_conn.close()
-                self.album_db_conn = None
-
-    def update_album_info(self, album_id, title):
-        """更新专辑数据库中的专辑信息"""
-        if not self.album_db_conn:
-            return
-
-        # 更新专辑数据库
-        cursor = self.album_db_conn.cursor()
-        cursor.execute('''
-        INSERT OR REPLACE INTO album_info (id, title, last_updated)
-        VALUES (?, ?, CURRENT_TIMESTAMP)
-        ''', (album_id, title))
-        self.album_db_conn.commit()
-
-        # 更新系统数据库
+    def __del__(self):
+        """析构函数，关闭数据库连接"""
         if self.system_db_conn:
-            cursor = self.system_db_conn.cursor()
-            cursor.execute('''
-            INSERT OR REPLACE INTO albums (id, title, update_time)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-            ''', (album_id, title))
-            self.system_db_conn.commit()
-
-    def check_episode_exists(self, title):
-        """检查单集是否已存在"""
-        if not self.album_db_conn:
-            return False
-
-        cursor = self.album_db_conn.cursor()
-        cursor.execute('SELECT id FROM episodes WHERE title = ?', (title,))
-        return cursor.fetchone() is not None
-
-    def add_episode(self, episode_data):
-        """添加新单集"""
-        if not self.album_db_conn:
-            return
+            self.system_db_conn.close()
 
-        cursor = self.album_db_conn.cursor()
-        cursor.execute('''
-        INSERT INTO episodes (filename, duration, title, annotation, url)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (
-            episode_data["filename"],
-            episode_data["duration"],
-            episode_data["title"],
-            episode_data["annotation"],
-            episode_data["url"]
-        ))
-        self.album_db_conn.commit()
-
-    def extract_duration(self, item):
-        """从XML元素中提取时长信息"""
-        # 尝试1: 直接查找duration标签
-        duration = item.findtext("duration", "").strip()
-        if duration:
-            return self.format_duration(duration)
-
-        # 尝试2: 查找itunes:duration标签
-        itunes_duration = item.findtext("{http://www.itunes.com/dtds/podcast-1.0.dtd}duration", "").strip()
-        if itunes_duration:
-            return self.format_duration(itunes_duration)
-
-        # 尝试3: 从描述中提取时长
-        description = item.findtext("description", "").strip()
-        if description:
-            match = re.search(r'时长[:：]\s*(\d+[:：]\d+(:\d+)?|\d+)', description)
-            if match:
-                return self.format_duration(match.group(1))
-
-        # 尝试4: 从标题中提取时长
-        title = item.findtext("title", "").strip()
-        if title:
-            match = re.search(r'\[(\d+[:：]\d+(:\d+)?|\d+)\]', title)
-            if match:
-                return self.format_duration(match.group(1))
 
-        return ""
+class RefreshScheduler:
+    """自适应刷新调度器
 
-    def format_duration(self, duration_str):
-        """标准化时长格式"""
-        if not duration_str or duration_str.strip() == "":
-            return ""
+    根据每个专辑观察到的发布周期决定下次检查时间：更新频繁的专辑检查得勤，
+    长期没有新单集的专辑逐步退避；每次的间隔加随机抖动，避免同时到期；
+    所有专辑共用一个每小时请求预算。调度状态保存在系统数据库的 album_schedule 表中，
+    每次获取实际发出的请求数（包括重试）记在 schedule_requests 表中，预算按它计算。
+    """
 
-        duration_str = duration_str.strip()
+    def __init__(self, fetcher, requests_per_hour=DEFAULT_REQUESTS_PER_HOUR,
+                 min_interval=SCHEDULE_MIN_INTERVAL, max_interval=SCHEDULE_MAX_INTERVAL,
+                 jitter=SCHEDULE_JITTER):
+        self.fetcher = fetcher
+        self.requests_per_hour = max(1, requests_per_hour)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
 
-        if duration_str.isdigit():
-            seconds = int(duration_str)
-            return str(timedelta(seconds=seconds))
-
-        parts = duration_str.split(':')
+        with self.fetcher._system_db_lock:
+            conn = self.fetcher.connect_system_database()
+            try:
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS album_schedule (
+                    album_id TEXT PRIMARY KEY,
+                    cadence_seconds INTEGER,
+                    interval_seconds INTEGER,
+                    last_check INTEGER,
+                    next_check INTEGER,
+                    last_new INTEGER,
+                    unchanged_checks INTEGER DEFAULT 0,
+                    failures INTEGER DEFAULT 0
+                )
+                ''')
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_album_schedule_next ON album_schedule (next_check)")
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS schedule_requests (
+                    time INTEGER NOT NULL,
+                    album_id TEXT,
+                    requests INTEGER NOT NULL
+                )
+                ''')
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_schedule_requests_time ON schedule_requests (time)")
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _execute(self, sql, params=(), fetch=False):
+        with self.fetcher._system_db_lock:
+            conn = self.fetcher.connect_system_database()
+            try:
+                rows = conn.execute(sql, params).fetchall()
+                conn.commit()
+                return rows if fetch else None
+            finally:
+                conn.close()
+
+    def sync_albums(self, now=None):
+        """把系统数据库中新登记的专辑加入调度，新专辑立即到期"""
+        now = int(now or time.time())
+        self._execute('''
+        INSERT OR IGNORE INTO album_schedule (album_id, next_check)
+        SELECT id, ? FROM albums
+        ''', (now,))
+
+    def remaining_budget(self, now=None):
+        """最近一小时内还能发出的请求数（按实际发出的请求计，包括重试）"""
+        now = int(now or time.time())
+        used = self._execute("SELECT COALESCE(SUM(requests), 0) FROM schedule_requests WHERE time > ?",
+                             (now - 3600,), fetch=True)[0][0]
+        return max(0, self.requests_per_hour - used)
+
+    def due_albums(self, now=None):
+        """返回已到期的专辑ID，最早到期的在前，数量不超过剩余预算"""
+        now = int(now or time.time())
+        budget = self.remaining_budget(now)
+        if not budget:
+            return []
+        rows = self._execute(
+            "SELECT album_id FROM album_schedule WHERE next_check <= ? ORDER BY next_check LIMIT ?",
+            (now, budget), fetch=True
+        )
+        return [row[0] for row in rows]
+
+    def next_wakeup(self):
+        """最早的下次检查时间，没有专辑时返回None"""
+        return self._execute("SELECT MIN(next_check) FROM album_schedule", fetch=True)[0][0]
+
+    def run_once(self, progress_callback=None, result_callback=None, now=None):
+        """获取所有已到期的专辑并更新调度，返回处理结果列表"""
+        self.sync_albums(now)
+        album_ids = self.due_albums(now)
+        if not album_ids:
+            return []
+
+        def on_result(result):
+            self.record_result(result, now)
+            if result_callback:
+                result_callback(result)
+
+        return self.fetcher.fetch_albums(album_ids, progress_callback, on_result)
+
+    def run_forever(self, stop_event=None, progress_callback=None, result_callback=None, idle_poll=60):
+        """持续运行：处理到期专辑后休眠到下一个专辑到期（最长 idle_poll 秒）"""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.run_once(progress_callback, result_callback)
+            wakeup = self.next_wakeup()
+            delay = idle_poll if wakeup is None else min(idle_poll, max(1, wakeup - time.time()))
+            stop_event.wait(delay)
+
+    def record_result(self, result, now=None):
+        """根据一次获取的结果更新该专辑的周期估计和下次检查时间，并记下这次发出的请求数"""
+        now = int(now or time.time())
+        album_id = result["album_id"]
+        requests_sent = result.get("metrics", {}).get("attempts", 0)
+        if requests_sent:
+            self._execute("INSERT INTO schedule_requests (time, album_id, requests) VALUES (?, ?, ?)",
+                          (now, album_id, requests_sent))
+        self._execute("DELETE FROM schedule_requests WHERE time <= ?", (now - 3600,))
+        rows = self._execute(
+            "SELECT cadence_seconds, interval_seconds, last_new, unchanged_checks, failures "
+            "FROM album_schedule WHERE album_id = ?", (album_id,), fetch=True
+        )
+        cadence, interval, last_new, unchanged_checks, failures = rows[0] if rows else (None, None, None, 0, 0)
+        unchanged_checks = unchanged_checks or 0
+        failures = failures or 0
+
+        if result["success"]:
+            failures = 0
+            pub_times = sorted(result.get("recent_pub_times") or [], reverse=True)
+            if not pub_times and cadence is None:
+                # 还没有周期信息（例如返回304），从最近一份存档的feed中估计
+                pub_times = self._recent_pub_times_from_snapshot(album_id)
+                last_new = last_new or (pub_times[0] if pub_times else None)
+            # 发布周期取最近几期之间间隔的中位数
+            gaps = [newer - older for newer, older in zip(pub_times, pub_times[1:]) if newer > older]
+            if gaps:
+                cadence = int(statistics.median(gaps))
+
+            if result.get("new"):
+                last_new = pub_times[0] if pub_times else now
+                unchanged_checks = 0
+            else:
+                unchanged_checks += 1
+            interval = self.compute_interval(cadence, last_new, unchanged_checks, now)
+        else:
+            # 失败时指数退避，避免对出错的专辑反复请求
+            failures += 1
+            interval = min(self.max_interval, max(self.min_interval, (interval or self.min_interval) * 2))
+
+        delay = int(interval * (1 + random.uniform(-self.jitter, self.jitter)))
+        self._execute('''
+        INSERT INTO album_schedule (album_id, cadence_seconds, interval_seconds, last_check, next_check,
+                                    last_new, unchanged_checks, failures)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(album_id) DO UPDATE SET
+            cadence_seconds = excluded.cadence_seconds,
+            interval_seconds = excluded.interval_seconds,
+            last_check = excluded.last_check,
+            next_check = excluded.next_check,
+            last_new = excluded.last_new,
+            unchanged_checks = excluded.unchanged_checks,
+            failures = excluded.failures
+        ''', (album_id, cadence, interval, now, now + delay, last_new, unchanged_checks, failures))
+
+    def _recent_pub_times_from_snapshot(self, album_id):
+        """读取专辑最近一份快照开头几个单集的发布时间（从新到旧）"""
+        sha256 = self.fetcher.snapshot_store.latest(album_id)
+        if not sha256:
+            return []
+        pub_times = []
+        try:
+            for item in iter_feed_items(self.fetcher.snapshot_store.iter_chunks(sha256)):
+                pub_time = parse_pub_date(item.findtext("pubDate", ""))
+                if pub_time:
+                    pub_times.append(pub_time)
+                if len(pub_times) >= RECENT_PUB_TIMES:
+                    break
+        except (OSError, ET.ParseError):
+            return []
+        return sorted(pub_times, reverse=True)
+
+    def compute_interval(self, cadence, last_new, unchanged_checks, now):
+        """计算检查间隔：每个发布周期检查约4次，长期无更新的专辑按未变化次数加倍退避"""
+        interval = cadence / 4 if cadence else SCHEDULE_DEFAULT_INTERVAL
+
+        dormant = (not cadence or not last_new or now - last_new > 3 * cadence)
+        if dormant and unchanged_checks:
+            interval *= 2 ** min(unchanged_checks, 10)
+
+        return int(min(self.max_interval, max(self.min_interval, interval)))
+
+
+class AudioDownloader:
+    """并发下载单集音频到专辑文件夹的 audio 子目录，并把相对路径记录到单集的 local_path
+
+    中断的下载保留为 .part 文件，下次用HTTP Range续传；所有下载线程共享一个带宽上限；
+    音频总大小超过磁盘配额时，按最近使用时间（文件修改时间，标注程序播放本地文件时会更新）
+    删除最久未用的音频，并清除对应的 local_path。
+    """
+
+    def __init__(self, fetcher, max_workers=DEFAULT_DOWNLOAD_WORKERS, bandwidth=0,
+                 quota_bytes=DEFAULT_AUDIO_QUOTA_MB * 1024 * 1024):
+        self.fetcher = fetcher
+        self.max_workers = max(1, max_workers)
+        self.bandwidth = BandwidthLimiter(bandwidth)
+        self.quota_bytes = quota_bytes
+        self.http = HttpClient(HostRateLimiter(fetcher.rate_limiter.min_interval), pool_size=self.max_workers)
+
+        # 所有线程的数据库写入串行执行；清理配额时跳过正在下载的文件
+        self._db_lock = threading.Lock()
+        self._quota_lock = threading.Lock()
+        self._active = set()
+
+    def pending_episodes(self, album_ids=None, limit=None):
+        """返回尚未下载的单集 (album_id, 单集id, url)，album_ids 为空时包括所有专辑"""
+        pending = []
+        for album_id, conn in self.fetcher.album_databases(album_ids):
+            rows = conn.execute(
+                "SELECT id, url FROM episodes WHERE local_path IS NULL AND url LIKE 'http%' ORDER BY id")
+            pending.extend((album_id, episode_id, url) for episode_id, url in rows)
+            if limit and len(pending) >= limit:
+                return pending[:limit]
+        return pending
+
+    def download_albums(self, album_ids=None, limit=None, progress_callback=None, cancel_event=None):
+        """并发下载专辑中尚未下载的音频，返回每个单集的结果字典列表
+
+        progress_callback(已完成数, 总数, result) 在调用线程中被调用。
+        """
+        jobs = self.pending_episodes(album_ids, limit)
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.download_episode, album_id, episode_id, url, cancel_event)
+                       for album_id, episode_id, url in jobs]
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.append(future.result())
+                    if progress_callback:
+                        progress_callback(len(results), len(jobs), results[-1])
+        return results
+
+    def download_episode(self, album_id, episode_id, url, cancel_event=None):
+        """下载一个单集的音频（有 .part 文件时续传），返回结果字典"""
+        result = {"album_id": album_id, "episode_id": episode_id, "success": False, "message": "",
+                  "bytes": 0, "resumed": False}
+
+        # 文件名按单集id生成，扩展名取自音频地址
+        extension = os.path.splitext(urlparse(url).path)[1].lower()
+        if not re.fullmatch(r"\.\w{1,5}", extension):
+            extension = ".mp3"
+        relative_path = f"{AUDIO_DIR_NAME}/episode_{episode_id}{extension}"
+        target_path = os.path.join(self.fetcher.albums_dir, f"album_{album_id}", *relative_path.split("/"))
+        partial_path = target_path + ".part"
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+        with self._quota_lock:
+            self._active.add(target_path)
+        response = None
         try:
-            if len(parts) == 2:  # MM:SS
-                minutes, seconds = map(int, parts)
-                return f"00:{minutes:02d}:{seconds:02d}"
-            elif len(parts) == 3:  # HH:MM:SS
-                hours, minutes, seconds = map(int, parts)
-                return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        except ValueError:
+            if cancel_event is not None and cancel_event.is_set():
+                raise FetchCancelled()
+
+            if not os.path.exists(target_path):
+                offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+                # 不要压缩传输：压缩后 Range 的字节位置对应的是压缩流，续传位置就错了
+                headers = {"Accept-Encoding": "identity"}
+                if offset:
+                    headers["Range"] = f"bytes={offset}-"
+                response = self.http.get(url, headers=headers, stream=True)
+
+                expected = None
+                if response.status_code == 416 and offset:
+                    # 续传位置已在文件末尾：.part 已经完整
+                    expected = self._content_range_total(response)
+                    if expected != offset:
+                        raise ValueError(f"服务器拒绝续传（HTTP 416），已下载 {offset} 字节")
+                else:
+                    response.raise_for_status()
+                    if response.status_code == 206:
+                        result["resumed"] = True
+                        expected = self._content_range_total(response)
+                    else:
+                        # 服务器不支持Range时从头下载
+                        offset = 0
+                        if response.headers.get("Content-Length", "").isdigit():
+                            expected = int(response.headers["Content-Length"])
+
+                    with open(partial_path, "ab" if offset else "wb") as audio_file:
+                        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                            if cancel_event is not None and cancel_event.is_set():
+                                raise FetchCancelled()
+                            self.bandwidth.consume(len(chunk))
+                            audio_file.write(chunk)
+                            result["bytes"] += len(chunk)
+
+                size = os.path.getsize(partial_path)
+                if expected is not None and size != expected:
+                    raise ValueError(f"下载不完整（{size}/{expected} 字节），下次将续传")
+                os.replace(partial_path, target_path)
+
+            self._set_local_path(album_id, [(relative_path, episode_id)])
+            result["success"] = True
+            result["path"] = target_path
+            result["message"] = f"已下载 {result['bytes'] / 1024 / 1024:.1f} MB" + ("（续传）" if result["resumed"] else "")
+        except FetchCancelled:
+            result["cancelled"] = True
+            result["message"] = "已取消，下次将续传"
+        except Exception as e:
+            result["message"] = f"下载音频失败: {str(e)}"
+        finally:
+            if response is not None:
+                response.close()
+            with self._quota_lock:
+                self._active.discard(target_path)
+
+        if result["success"]:
+            self.enforce_quota()
+        return result
+
+    @staticmethod
+    def _content_range_total(response):
+        """从 Content-Range（bytes 0-99/1234 或 bytes */1234）中取出文件总大小"""
+        match = re.search(r"/(\d+)\s*$", response.headers.get("Content-Range", ""))
+        return int(match.group(1)) if match else None
+
+    def _set_local_path(self, album_id, updates):
+        """写入 (local_path, 单集id) 列表；local_path 为None表示本地文件已删除"""
+        db_path = os.path.join(self.fetcher.albums_dir, f"album_{album_id}", f"album_{album_id}.db")
+        with self._db_lock:
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                conn.executemany("UPDATE episodes SET local_path = ? WHERE id = ?", updates)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def enforce_quota(self):
+        """音频总大小超过配额时删除最久未使用的文件，返回删除的文件数"""
+        if not self.quota_bytes:
+            return 0
+        with self._quota_lock:
+            files = []
+            for folder in os.listdir(self.fetcher.albums_dir):
+                audio_dir = os.path.join(self.fetcher.albums_dir, folder, AUDIO_DIR_NAME)
+                if not folder.startswith("album_") or not os.path.isdir(audio_dir):
+                    continue
+                for name in os.listdir(audio_dir):
+                    path = os.path.join(audio_dir, name)
+                    match = re.fullmatch(r"episode_(\d+)\.\w+", name)
+                    if match and path not in self._active:
+                        stat = os.stat(path)
+                        files.append((stat.st_mtime, stat.st_size, path, folder[len("album_"):], int(match.group(1))))
+
+            total = sum(size for _, size, _, _, _ in files)
+            evicted = {}
+            # 最新的文件（通常是刚下载的）总是保留，即使它单独就超过了配额
+            for _, size, path, album_id, episode_id in sorted(files)[:-1]:
+                if total <= self.quota_bytes:
+                    break
+                os.remove(path)
+                total -= size
+                evicted.setdefault(album_id, []).append((None, episode_id))
+
+        for album_id, updates in evicted.items():
+            self._set_local_path(album_id, updates)
+        return sum(len(updates) for updates in evicted.values())
+
+    def close(self):
+        self.http.close()
+
+
+def build_arg_parser():
+    """命令行参数：不带子命令时打开图形界面"""
+    parser = argparse.ArgumentParser(description="播客数据获得（不带子命令运行时打开图形界面）")
+    parser.add_argument("--dir", help="数据目录，默认为程序所在目录")
+    subparsers = parser.add_subparsers(dest="command")
+
+    fetch_parser = subparsers.add_parser("fetch", help="无界面获取专辑数据，适合cron等定时任务")
+    fetch_parser.add_argument("album_ids", nargs="*", help="专辑ID，可以有多个")
+    fetch_parser.add_argument("--all", action="store_true", help="获取系统数据库中登记的所有专辑")
+    fetch_parser.add_argument("--jobs", "-j", type=int, default=DEFAULT_MAX_WORKERS, help="并发数")
+    fetch_parser.add_argument("--interval", type=float, default=DEFAULT_MIN_REQUEST_INTERVAL,
+                              help="同一主机相邻两次请求的最小间隔（秒）")
+    fetch_parser.add_argument("--incremental", action="store_true", help="增量模式，遇到连续的已有单集后停止")
+    fetch_parser.add_argument("--threshold", type=int, default=DEFAULT_KNOWN_RUN_THRESHOLD,
+                              help="增量模式下连续多少个已有单集后停止")
+    fetch_parser.add_argument("--json", action="store_true", help="以JSON输出处理结果")
+    fetch_parser.add_argument("--progress", action="store_true", help="把进度逐行输出到标准错误")
+
+    schedule_parser = subparsers.add_parser("schedule", help="按各专辑的更新周期自动刷新所有专辑")
+    schedule_parser.add_argument("--once", action="store_true", help="只处理当前到期的专辑后退出（适合cron）")
+    schedule_parser.add_argument("--budget", type=int, default=DEFAULT_REQUESTS_PER_HOUR,
+                                 help="每小时最多发出的请求数")
+    schedule_parser.add_argument("--jobs", "-j", type=int, default=DEFAULT_MAX_WORKERS, help="并发数")
+    schedule_parser.add_argument("--full", action="store_true", help="完整读取feed，不使用增量模式")
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="用已下载的原始XML或快照重新导入专辑数据库（多进程解析，只插入和更新，不删除单集）")
+    rebuild_parser.add_argument("album_ids", nargs="*", help="专辑ID，可以有多个")
+    rebuild_parser.add_argument("--all", action="store_true", help="重新导入系统数据库中登记的所有专辑")
+    rebuild_parser.add_argument("--processes", "-p", type=int, help="解析进程数，默认为CPU核数")
+    rebuild_parser.add_argument("--json", action="store_true", help="以JSON输出处理结果")
+
+    download_parser = subparsers.add_parser("download", help="下载单集音频到本地，标注时直接播放本地文件")
+    download_parser.add_argument("album_ids", nargs="*", help="专辑ID，不填时下载所有已获取的专辑")
+    download_parser.add_argument("--jobs", "-j", type=int, default=DEFAULT_DOWNLOAD_WORKERS, help="并发数")
+    download_parser.add_argument("--limit", type=int, help="本次最多下载多少个单集")
+    download_parser.add_argument("--bandwidth", type=int, default=0, help="总带宽上限（KB/秒），0表示不限")
+    download_parser.add_argument("--quota", type=int, default=DEFAULT_AUDIO_QUOTA_MB,
+                                 help="音频占用磁盘的上限（MB），超出时删除最久未播放的音频，0表示不限")
+    download_parser.add_argument("--json", action="store_true", help="以JSON输出处理结果")
+
+    recent_parser = subparsers.add_parser("recent", help="按发布时间从新到旧列出单集")
+    recent_parser.add_argument("album_ids", nargs="*", help="专辑ID，不填时包括所有已下载的专辑")
+    recent_parser.add_argument("--days", type=float, help="只列出最近多少天内发布的单集")
+    recent_parser.add_argument("--since", help="只列出该时间之后发布的单集，如 2024-01-01 或 \"2024-01-01 08:00\"")
+    recent_parser.add_argument("--until", help="只列出该时间之前发布的单集")
+    recent_parser.add_argument("--limit", type=int, default=50, help="最多列出多少个单集，0表示不限")
+    recent_parser.add_argument("--json", action="store_true", help="以JSON输出")
+
+    durations_parser = subparsers.add_parser("durations", help="统计专辑总时长，或按时长筛选单集")
+    durations_parser.add_argument("album_ids", nargs="*", help="专辑ID，不填时统计所有已下载的专辑")
+    durations_parser.add_argument("--list", action="store_true", help="列出单集而不是统计总时长")
+    durations_parser.add_argument("--under", type=float, help="只列出短于多少分钟的单集")
+    durations_parser.add_argument("--over", type=float, help="只列出不短于多少分钟的单集")
+    durations_parser.add_argument("--shortest", action="store_true", help="按时长从短到长排列")
+    durations_parser.add_argument("--limit", type=int, default=20, help="最多列出多少个单集，0表示不限")
+    durations_parser.add_argument("--json", action="store_true", help="以JSON输出")
+
+    metrics_parser = subparsers.add_parser("metrics", help="汇总运行日志中各阶段用时的百分位数")
+    metrics_parser.add_argument("--hours", type=float, help="只统计最近多少小时的记录")
+    metrics_parser.add_argument("--slowest", type=int, default=10, help="列出总用时最长的多少次获取")
+    metrics_parser.add_argument("--json", action="store_true", help="以JSON输出汇总结果")
+
+    subparsers.add_parser("import-feeds", help="把已有的原始XML导入快照库")
+    subparsers.add_parser("scan", help="扫描albums目录，把有变化的专辑信息导入系统数据库")
+    return parser
+
+
+def run_fetch_command(args, program_dir):
+    """fetch 子命令：并发获取专辑，返回进程退出码"""
+    fetcher = AlbumFetcher(program_dir, max_workers=args.jobs, min_request_interval=args.interval,
+                           incremental=args.incremental, known_run_threshold=args.threshold,
+                           echo_log=not args.json)
+
+    album_ids = list(args.album_ids)
+    if args.all:
+        album_ids += fetcher.list_album_ids()
+    if not album_ids:
+        print("请输入专辑ID或使用 --all", file=sys.stderr)
+        return 2
+
+    def on_progress(album_id, current, total, message):
+        if args.json:
+            event = {"event": "progress", "album_id": album_id, "current": current,
+                     "total": total, "message": message}
+            print(json.dumps(event, ensure_ascii=False), file=sys.stderr, flush=True)
+        else:
+            print(f"[{album_id}] {message}", file=sys.stderr, flush=True)
+
+    results = fetcher.fetch_albums(album_ids, on_progress if args.progress else None)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        success_count = sum(1 for result in results if result["success"])
+        print(f"已完成{len(results)}个专辑的处理，成功 {success_count} 个")
+    return 0 if all(result["success"] for result in results) else 1
+
+
+def run_rebuild_command(args, program_dir):
+    """rebuild 子命令：多进程解析已下载的feed并重新导入专辑数据库（只插入和更新），返回进程退出码"""
+    fetcher = AlbumFetcher(program_dir, echo_log=not args.json)
+
+    album_ids = list(args.album_ids)
+    if args.all:
+        album_ids += fetcher.list_album_ids()
+    if not album_ids:
+        print("请输入专辑ID或使用 --all", file=sys.stderr)
+        return 2
+
+    start = time.time()
+    results = fetcher.rebuild_albums(album_ids, processes=args.processes)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        success_count = sum(1 for result in results if result["success"])
+        episode_count = sum(result["total"] for result in results)
+        print(f"已重新导入{len(results)}个专辑，成功 {success_count} 个，"
+              f"共 {episode_count} 个单集，用时 {time.time() - start:.1f} 秒")
+    return 0 if all(result["success"] for result in results) else 1
+
+
+def run_download_command(args, program_dir):
+    """download 子命令：并发下载尚未下载的单集音频，返回进程退出码"""
+    fetcher = AlbumFetcher(program_dir, echo_log=False)
+    downloader = AudioDownloader(fetcher, max_workers=args.jobs, bandwidth=args.bandwidth * 1024,
+                                 quota_bytes=args.quota * 1024 * 1024)
+
+    def on_progress(done, total, result):
+        if not args.json:
+            status = "成功" if result["success"] else "失败"
+            print(f"[{done}/{total}] 专辑 {result['album_id']} 单集 {result['episode_id']}: "
+                  f"{status} - {result['message']}", file=sys.stderr, flush=True)
+
+    try:
+        results = downloader.download_albums(args.album_ids or None, args.limit, on_progress)
+    except KeyboardInterrupt:
+        print("已中断，未完成的音频下次将续传", file=sys.stderr)
+        return 1
+    finally:
+        downloader.close()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        success_count = sum(1 for result in results if result["success"])
+        total_bytes = sum(result["bytes"] for result in results)
+        print(f"已处理{len(results)}个单集，成功 {success_count} 个，共下载 {total_bytes / 1024 / 1024:.1f} MB")
+    return 0 if all(result["success"] for result in results) else 1
+
+
+def run_recent_command(args, program_dir):
+    """recent 子命令：列出某段时间内发布的单集，返回进程退出码"""
+    since = until = None
+    try:
+        if args.since:
+            since = datetime.fromisoformat(args.since)
+        if args.until:
+            until = datetime.fromisoformat(args.until)
+    except ValueError as e:
+        print(f"时间格式错误: {str(e)}", file=sys.stderr)
+        return 2
+    if args.days is not None:
+        since = datetime.now() - timedelta(days=args.days)
+
+    episodes = AlbumFetcher(program_dir, echo_log=False).episodes_published(
+        args.album_ids or None, since=since, until=until, limit=args.limit)
+    if args.json:
+        print(json.dumps(episodes, ensure_ascii=False, indent=2))
+    else:
+        for episode in episodes:
+            published = datetime.fromtimestamp(episode["pub_time"]).strftime("%Y-%m-%d %H:%M")
+            print(f"{published}  [{episode['album_id']}] {episode['title']}")
+    return 0
+
+
+def run_durations_command(args, program_dir):
+    """durations 子命令：打印各专辑的总时长，或按时长筛选出的单集，返回进程退出码"""
+    fetcher = AlbumFetcher(program_dir, echo_log=False)
+    album_ids = args.album_ids or None
+
+    if args.list or args.under is not None or args.over is not None:
+        episodes = fetcher.episodes_by_duration(
+            album_ids,
+            min_seconds=int(args.over * 60) if args.over is not None else None,
+            max_seconds=int(args.under * 60) if args.under is not None else None,
+            longest_first=not args.shortest,
+            limit=args.limit
+        )
+        if args.json:
+            print(json.dumps(episodes, ensure_ascii=False, indent=2))
+        else:
+            for episode in episodes:
+                print(f"{format_duration(str(episode['duration_seconds'])):>10}  "
+                      f"[{episode['album_id']}] {episode['title']}")
+        return 0
+
+    totals = fetcher.duration_totals(album_ids)
+    if args.json:
+        print(json.dumps(totals, ensure_ascii=False, indent=2))
+        return 0
+    for album in totals["albums"]:
+        unknown = f"（{album['unknown_duration']} 个时长未知）" if album["unknown_duration"] else ""
+        print(f"专辑 {album['album_id']}: {album['episodes']} 个单集，共 {album['total_seconds'] / 3600:.1f} 小时，"
+              f"最长 {format_duration(str(album['longest_seconds']))}{unknown}")
+    print(f"合计: {len(totals['albums'])} 个专辑，{totals['episodes']} 个单集，"
+          f"共 {totals['total_seconds'] / 3600:.1f} 小时")
+    return 0
+
+
+def run_metrics_command(args, program_dir):
+    """metrics 子命令：打印运行日志的分阶段百分位数，返回进程退出码"""
+    since = None
+    if args.hours:
+        since = (datetime.now() - timedelta(hours=args.hours)).strftime("%Y-%m-%d %H:%M:%S")
+    records = load_metrics(os.path.join(program_dir, METRICS_LOG_NAME), since)
+    if not records:
+        print("运行日志中没有记录", file=sys.stderr)
+        return 1
+
+    summary = summarize_metrics(records, args.slowest)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"共 {summary['runs']} 次获取，失败 {summary['failed']} 次，未变化(304) {summary['not_modified']} 次")
+    # 中文字符占两列宽，表头的对齐宽度相应减小
+    print(f"{'阶段(秒)':<9}{'次数':>6}{'p50':>10}{'p90':>10}{'p99':>10}{'最大':>8}")
+    rows = list(summary["stages"].items())
+    if summary["bytes"]:
+        rows.append(("KB", {key: value / 1024 if key != "count" else value
+                            for key, value in summary["bytes"].items()}))
+    for stage, row in rows:
+        print(f"{stage:<12}{row['count']:>8}{row['p50']:>10.3f}{row['p90']:>10.3f}"
+              f"{row['p99']:>10.3f}{row['max']:>10.3f}")
+
+    print("\n总用时最长的获取：")
+    for record in summary["slowest"]:
+        timings = record.get("timings", {})
+        print(f"  [{record['time']}] 专辑 {record['album_id']}: {timings.get('total', 0):.2f} 秒，"
+              f"{record.get('bytes', 0) / 1024:.0f} KB，{record.get('items', 0)} 个单集"
+              + ("" if record.get("success") else f"，失败: {record.get('message', '')}"))
+    return 0
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    program_dir = os.path.abspath(args.dir) if args.dir else get_program_dir()
+
+    if args.command == "fetch":
+        return run_fetch_command(args, program_dir)
+    if args.command == "schedule":
+        fetcher = AlbumFetcher(program_dir, max_workers=args.jobs, incremental=not args.full)
+        scheduler = RefreshScheduler(fetcher, requests_per_hour=args.budget)
+        if args.once:
+            results = scheduler.run_once()
+            return 0 if all(result["success"] for result in results) else 1
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
             pass
-
-        return duration_str
-
-    def extract_enclosure_url(self, item):
-        """专门提取<enclosure>标签中的URL"""
-        # 查找所有enclosure标签
-        enclosures = item.findall("enclosure")
-        for enclosure in enclosures:
-            # 检查是否包含url属性且type是音频类型
-            if ('url' in enclosure.attrib and
-                    'type' in enclosure.attrib and
-                    enclosure.attrib['type'].startswith('audio/')):
-
-                # 清理URL中的可能的双斜杠问题
-                url = enclosure.attrib['url']
-                parsed = urlparse(url)
-                if parsed.scheme and parsed.netloc:  # 确保是完整URL
-                    # 修复可能的双斜杠问题
-                    if url.startswith('//') and not url.startswith('http'):
-                        return f"https:{url}"
-                    return url
-
-        return ""
-
-    def __del__(self):
-        """析构函数，关闭数据库连接"""
-        if self.system_db_conn:
-            self.system_db_conn.close()
-        if self.album_db_conn:
-            self.album_db_conn.close()
+        return 0
+    if args.command == "rebuild":
+        return run_rebuild_command(args, program_dir)
+    if args.command == "download":
+        return run_download_command(args, program_dir)
+    if args.command == "recent":
+        return run_recent_command(args, program_dir)
+    if args.command == "durations":
+        return run_durations_command(args, program_dir)
+    if args.command == "metrics":
+        return run_metrics_command(args, program_dir)
+    if args.command == "scan":
+        imported, total = AlbumFetcher(program_dir, echo_log=False).scan_albums()
+        print(f"共 {total} 个专辑，更新 {imported} 个")
+        return 0
+    if args.command == "import-feeds":
+        count = AlbumFetcher(program_dir).import_existing_feeds()
+        print(f"新存档 {count} 份原始XML")
+        return 0
+
+    if tk is None:
+        print("未安装Tk，无法打开图形界面，请使用 fetch 子命令", file=sys.stderr)
+        return 2
+    root = tk.Tk()
+    app = PodcastDataGetter(root, program_dir)
+    root.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = PodcastDataGetter(root)
-    root.mainloop()
\ No newline at end of file
+    # 打包为exe后，进程池的子进程也从这里启动
+    multiprocessing.freeze_support()
+    sys.exit(main())
\ No newline at end of file
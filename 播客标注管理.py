@@ -1,11 +1,642 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
+import tkinter.font as tkfont
 import os
 import sys
 import sqlite3
 import subprocess
 import json
+import hashlib
 import webbrowser
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from 播客数据库工具 import album_db_signature
+
+# 关键词搜索框停止输入多久后开始搜索（毫秒）
+SEARCH_DEBOUNCE_MS = 150
+# 检查后台搜索是否完成的间隔（毫秒）
+SEARCH_POLL_MS = 20
+# 同时打开的专辑数据库数（读取专辑名称、全部专辑搜索）
+ALBUM_WORKERS = 8
+
+def fold_case(text):
+    """转为小写用于不区分大小写的匹配，保持每个字符的位置不变（小写后变长的字符保留原样）"""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def annotation_index_ready(cursor):
+    """专辑数据库的标注全文索引及其三个同步触发器是否都在"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'episodes_fts_%'")
+    return len(cursor.fetchall()) == 3
+
+
+def query_annotation_matches(conn, keyword, use_fts, limit=-1, offset=0):
+    """查找标注中包含keyword的单集（不区分大小写），返回 (id, filename, duration, title, annotation, url)
+
+    三个字及以上的搜索词使用全文索引，按相关度（bm25）排序；
+    trigram索引无法匹配更短的词，这时在SQL中逐条查找，按标注内容倒序排列。limit为-1时不限条数。
+    """
+    cursor = conn.cursor()
+    if use_fts and len(keyword) >= 3:
+        cursor.execute(
+            """SELECT e.id, e.filename, e.duration, e.title, e.annotation, e.url
+            FROM episodes_fts JOIN episodes e ON e.id = episodes_fts.rowid
+            WHERE episodes_fts MATCH ? ORDER BY episodes_fts.rank, e.id LIMIT ? OFFSET ?""",
+            ('"' + keyword.replace('"', '""') + '"', limit, offset)
+        )
+    else:
+        cursor.execute(
+            """SELECT id, filename, duration, title, annotation, url FROM episodes
+            WHERE instr(lower(annotation), ?) > 0 ORDER BY lower(annotation) DESC LIMIT ? OFFSET ?""",
+            (keyword.lower(), limit, offset)
+        )
+    return cursor.fetchall()
+
+
+def search_album_episodes(album_id, album_name, album_path, keyword):
+    """在一个专辑数据库中搜索标注，只读打开，可以在后台线程调用
+
+    返回 [(排序键, album_id, album_name, album_path, 单集id, title, annotation)]。
+    各专辑的bm25分数不能直接比较，所以按搜索词在标注中出现的次数（多的在前）和标注长度（短的在前）统一排序。
+    """
+    db_path = os.path.join(album_path, f"album_{album_id}.db")
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=10)
+    try:
+        rows = query_annotation_matches(conn, keyword, annotation_index_ready(conn.cursor()))
+    finally:
+        conn.close()
+
+    term = keyword.lower()
+    results = []
+    for id, filename, duration, title, annotation, url in rows:
+        rank = (-annotation.lower().count(term), len(annotation), album_id, id)
+        results.append((rank, album_id, album_name, album_path, id, title, annotation))
+    return results
+
+
+class KeywordMatcher:
+    """关键词多模式匹配（Aho-Corasick自动机），不区分大小写，一次扫描找出文本中的所有关键词
+
+    关键词增删只记录在集合中并标记需要重建，下次匹配时才重新编译，
+    连续修改多个关键词只重建一次。
+    """
+
+    def __init__(self, keywords=()):
+        self._keywords = {}  # {小写关键词: [原关键词, ...]}
+        self._dirty = True
+        self.reset(keywords)
+
+    def reset(self, keywords):
+        self._keywords = {}
+        for keyword in keywords:
+            self.add(keyword)
+        self._dirty = True
+
+    def add(self, keyword):
+        if not keyword:
+            return
+        names = self._keywords.setdefault(fold_case(keyword), [])
+        if keyword not in names:
+            names.append(keyword)
+            self._dirty = True
+
+    def remove(self, keyword):
+        key = fold_case(keyword or "")
+        names = self._keywords.get(key)
+        if names and keyword in names:
+            names.remove(keyword)
+            if not names:
+                del self._keywords[key]
+            self._dirty = True
+
+    def _build(self):
+        # 每个状态：转移表、失败链接、状态深度、以该状态结尾的关键词、失败链上最近的关键词状态
+        goto = [{}]
+        depth = [0]
+        word = [None]
+        for key in self._keywords:
+            state = 0
+            for char in key:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    depth.append(depth[state] + 1)
+                    word.append(None)
+                state = next_state
+            word[state] = key
+
+        fail = [0] * len(goto)
+        output = [0] * len(goto)  # 0表示失败链上没有关键词
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                f = goto[f].get(char, 0)
+                fail[next_state] = f
+                output[next_state] = f if word[f] else output[f]
+
+        self._goto, self._fail, self._depth, self._word, self._output = goto, fail, depth, word, output
+        self._dirty = False
+
+    def _scan(self, text):
+        """逐字符推进自动机，产生 (结束位置, 状态)"""
+        if self._dirty:
+            self._build()
+        goto, fail = self._goto, self._fail
+        state = 0
+        for end, char in enumerate(fold_case(text), 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            yield end, state
+
+    def _matches_at(self, state):
+        """以当前位置结尾的所有关键词状态，从长到短"""
+        if not self._word[state]:
+            state = self._output[state]
+        while state:
+            yield state
+            state = self._output[state]
+
+    def find_all(self, text):
+        """文本中出现的所有关键词（允许重叠、互相包含），按首次出现的顺序返回原关键词"""
+        if not text or not self._keywords:
+            return []
+        found = {}
+        for end, state in self._scan(text):
+            for match in self._matches_at(state):
+                key = self._word[match]
+                if key not in found:
+                    found[key] = end - self._depth[match]
+        keywords = []
+        for key in sorted(found, key=found.get):
+            keywords.extend(self._keywords[key])
+        return keywords
+
+    def find_leftmost_longest(self, text, match_case=False):
+        """最左最长、互不重叠的匹配，返回 [(起始位置, 结束位置), ...]
+
+        match_case 为True时只接受与关键词大小写完全一致的匹配。
+        """
+        if not text or not self._keywords:
+            return []
+        # 自动机扫描一遍，记录每个起始位置上最长的关键词
+        longest = {}
+        for end, state in self._scan(text):
+            for match in self._matches_at(state):
+                start = end - self._depth[match]
+                if match_case and text[start:end] not in self._keywords[self._word[match]]:
+                    continue
+                if end - start > longest.get(start, 0):
+                    longest[start] = end - start
+        # 从左到右取匹配，跳过与已取匹配重叠的部分
+        spans = []
+        last_end = 0
+        for start in sorted(longest):
+            if start >= last_end:
+                last_end = start + longest[start]
+                spans.append((start, last_end))
+        return spans
+
+
+class KeywordSearchIndex:
+    """关键词名称和描述的n-gram倒排索引（单字和二字组），用于边输入边搜索
+
+    查询时先用搜索词的二字组求候选关键词的交集，再逐个确认是否真的包含搜索词。
+    可以在后台线程查询，同时在界面线程增删关键词。
+    """
+
+    def __init__(self, nodes=None):
+        self._lock = threading.Lock()
+        self._docs = {}  # {关键词: (添加顺序, 小写的名称和描述)}
+        self._names = {}  # {小写名称: [关键词, ...]}
+        self._grams = {}  # {单字或二字组: {关键词, ...}}
+        self._sequence = 0
+        self.reset(nodes or {})
+
+    def reset(self, nodes):
+        """nodes 为 {关键词: {'name': ..., 'description': ...}}"""
+        with self._lock:
+            self._docs = {}
+            self._names = {}
+            self._grams = {}
+            for name, data in nodes.items():
+                self._add(name, data['description'])
+
+    def add(self, name, description):
+        """添加关键词；已存在时更新描述，保持原来的顺序"""
+        with self._lock:
+            doc = self._docs.get(name)
+            self._remove(name)
+            self._add(name, description, doc[0] if doc else None)
+
+    def remove(self, name):
+        with self._lock:
+            self._remove(name)
+
+    @staticmethod
+    def _ngrams(text):
+        grams = set(text)
+        grams.update(text[i:i + 2] for i in range(len(text) - 1))
+        return grams
+
+    def _add(self, name, description, sequence=None):
+        # 名称和描述之间用不会被输入的字符分隔，避免跨越两者匹配
+        text = fold_case(name) + "\0" + fold_case(description or "")
+        if sequence is None:
+            self._sequence += 1
+            sequence = self._sequence
+        self._docs[name] = (sequence, text)
+        self._names.setdefault(fold_case(name), []).append(name)
+        for gram in self._ngrams(text):
+            self._grams.setdefault(gram, set()).add(name)
+
+    def _remove(self, name):
+        doc = self._docs.pop(name, None)
+        if doc is None:
+            return
+        names = self._names[fold_case(name)]
+        names.remove(name)
+        if not names:
+            del self._names[fold_case(name)]
+        for gram in self._ngrams(doc[1]):
+            postings = self._grams[gram]
+            postings.discard(name)
+            if not postings:
+                del self._grams[gram]
+
+    def search(self, term, is_cancelled=None):
+        """返回 (名称与term相同的关键词或None, 名称或描述包含term的所有关键词)，按添加顺序排列
+
+        is_cancelled 返回True时放弃查询并返回None。
+        """
+        term = fold_case(term)
+        with self._lock:
+            if not term:
+                return None, sorted(self._docs, key=lambda name: self._docs[name][0])
+
+            exact = self._names.get(term)
+            if exact:
+                exact = min(exact, key=lambda name: self._docs[name][0])
+
+            grams = [term] if len(term) == 1 else {term[i:i + 2] for i in range(len(term) - 1)}
+            postings = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+
+            # 一两个字的搜索词就是单字或二字组本身，候选无需再确认
+            verify = len(term) > 2
+            matches = []
+            for count, name in enumerate(candidates):
+                if is_cancelled and count % 256 == 0 and is_cancelled():
+                    return None
+                sequence, text = self._docs[name]
+                if not verify or term in text:
+                    matches.append((sequence, name))
+        matches.sort()
+        return exact, [name for sequence, name in matches]
+
+
+class KeywordGraph:
+    """关键词上下级关系图，分别按上级和下级建立邻接索引
+
+    每个关键词的上级、下级用dict保存（值为None），既能O(1)判断和删除，又保持添加顺序。
+    """
+
+    def __init__(self, edges=()):
+        self.children = {}  # {上级: {下级: None}}
+        self.parents = {}  # {下级: {上级: None}}
+        self.edge_count = 0
+        self.reset(edges)
+
+    def reset(self, edges):
+        self.children = {}
+        self.parents = {}
+        self.edge_count = 0
+        for parent, child in edges:
+            self.add_edge(parent, child)
+
+    def __len__(self):
+        return self.edge_count
+
+    def has_edge(self, parent, child):
+        return child in self.children.get(parent, ())
+
+    def add_edge(self, parent, child):
+        if self.has_edge(parent, child):
+            return False
+        self.children.setdefault(parent, {})[child] = None
+        self.parents.setdefault(child, {})[parent] = None
+        self.edge_count += 1
+        return True
+
+    def remove_edge(self, parent, child):
+        if not self.has_edge(parent, child):
+            return False
+        self._discard(self.children, parent, child)
+        self._discard(self.parents, child, parent)
+        self.edge_count -= 1
+        return True
+
+    @staticmethod
+    def _discard(index, key, value):
+        neighbors = index[key]
+        del neighbors[value]
+        if not neighbors:
+            del index[key]
+
+    def remove_node(self, node):
+        for child in list(self.children.get(node, ())):
+            self.remove_edge(node, child)
+        for parent in list(self.parents.get(node, ())):
+            self.remove_edge(parent, node)
+
+    def rename_node(self, old, new):
+        children = list(self.children.get(old, ()))
+        parents = list(self.parents.get(old, ()))
+        self.remove_node(old)
+        for child in children:
+            self.add_edge(new, child)
+        for parent in parents:
+            self.add_edge(parent, new)
+
+    def parents_of(self, node):
+        return list(self.parents.get(node, ()))
+
+    def children_of(self, node):
+        return list(self.children.get(node, ()))
+
+    def siblings_of(self, node):
+        """同级关键词：与node有相同上级或相同下级的关键词（不含node自己）"""
+        siblings = {}
+        for parent in self.parents.get(node, ()):
+            siblings.update(self.children[parent])
+        for child in self.children.get(node, ()):
+            siblings.update(self.parents[child])
+        siblings.pop(node, None)
+        return list(siblings)
+
+
+class LazyEpisodeRows:
+    """按显示顺序保存单集id，行数据 (id, filename, duration, title, annotation, url) 在第一次访问时按页从数据库读取"""
+
+    PAGE_SIZE = 100
+
+    def __init__(self, conn, ids):
+        self.conn = conn
+        self.ids = list(ids)
+        self._rows = {}  # {id: 行数据}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        episode_id = self.ids[index]
+        row = self._rows.get(episode_id)
+        if row is None:
+            self._load_page(index)
+            row = self._rows[episode_id]
+        return row
+
+    def __setitem__(self, index, row):
+        self._rows[self.ids[index]] = row
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield self[index]
+
+    def _load_page(self, index):
+        start = index - index % self.PAGE_SIZE
+        page = [episode_id for episode_id in self.ids[start:start + self.PAGE_SIZE] if episode_id not in self._rows]
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"SELECT id, filename, duration, title, annotation, url FROM episodes "
+            f"WHERE id IN ({','.join('?' * len(page))})",
+            page
+        )
+        for row in cursor.fetchall():
+            self._rows[row[0]] = row
+        # 读取id之后被删除的单集显示为空行
+        for episode_id in page:
+            self._rows.setdefault(episode_id, (episode_id, "", "", "", "", ""))
+
+
+class VirtualListbox(ttk.Frame):
+    """只渲染可见行的列表框，用于成千上万条的音频列表
+
+    内部的tk.Listbox只保存当前可见的几十行（再多几行余量），滚动时按全局行号重新取数据并格式化；
+    选择状态也按全局行号保存，所以不使用Listbox自带的鼠标绑定，单击、Ctrl/Shift多选和拖动选择在这里实现。
+    对外提供与Listbox相同的 curselection / selection_set / selection_clear / see / bind 接口。
+    """
+
+    OVERSCAN = 5  # 可见行之外额外渲染的行数
+
+    def __init__(self, master, font=None, width=30, height=15):
+        super().__init__(master)
+        self.rows = []
+        self.formatter = str
+        self.top = 0  # 第一个可见行的全局行号
+        self.visible_rows = height
+        self.selected = set()  # 选中行的全局行号
+        self.anchor = None  # Shift多选和拖动选择的起点
+
+        xscrollbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL)
+        xscrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.yscrollbar = ttk.Scrollbar(self, command=self.yview)
+        self.yscrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.listbox = tk.Listbox(
+            self,
+            font=font,
+            width=width,
+            height=height,
+            activestyle='none',
+            exportselection=False,
+            xscrollcommand=xscrollbar.set
+        )
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        xscrollbar.config(command=self.listbox.xview)
+
+        line_space = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace")
+        self.row_height = line_space + 1 + 2 * int(self.listbox.cget("selectborderwidth"))
+
+        # 去掉Listbox类绑定，选择和滚动都由下面的绑定处理
+        self.listbox.bindtags((str(self.listbox), str(self.winfo_toplevel()), "all"))
+        self.listbox.bind('<Button-1>', self._on_click)
+        self.listbox.bind('<Control-Button-1>', self._on_control_click)
+        self.listbox.bind('<Shift-Button-1>', self._on_shift_click)
+        self.listbox.bind('<B1-Motion>', self._on_drag)
+        self.listbox.bind('<MouseWheel>', self._on_mousewheel)
+        self.listbox.bind('<Button-4>', lambda e: self.scroll_to(self.top - 3))
+        self.listbox.bind('<Button-5>', lambda e: self.scroll_to(self.top + 3))
+        self.listbox.bind('<Up>', lambda e: self._move_selection(-1))
+        self.listbox.bind('<Down>', lambda e: self._move_selection(1))
+        self.listbox.bind('<Prior>', lambda e: self.yview('scroll', -1, 'pages'))
+        self.listbox.bind('<Next>', lambda e: self.yview('scroll', 1, 'pages'))
+        self.listbox.bind('<Home>', lambda e: self.scroll_to(0))
+        self.listbox.bind('<End>', lambda e: self.scroll_to(len(self.rows)))
+        self.listbox.bind('<Configure>', self._on_configure)
+
+    def bind(self, sequence=None, func=None, add=None):
+        """事件绑定到内部的Listbox（双击、右键、<<ListboxSelect>>）"""
+        return self.listbox.bind(sequence, func, add)
+
+    def set_rows(self, rows, formatter=str):
+        """设置数据，rows 支持 len() 和按下标取值，formatter 把一行数据转为显示文本"""
+        self.rows = rows
+        self.formatter = formatter
+        self.top = 0
+        self.selected = set()
+        self.anchor = None
+        self.refresh()
+
+    def clear(self):
+        self.set_rows([])
+
+    def size(self):
+        return len(self.rows)
+
+    def refresh(self):
+        """重新格式化并渲染可见行（数据被修改后调用）"""
+        end = min(len(self.rows), self.top + self.visible_rows + self.OVERSCAN)
+        texts = [self.formatter(self.rows[index]) for index in range(self.top, end)]
+        self.listbox.delete(0, tk.END)
+        if texts:
+            self.listbox.insert(tk.END, *texts)
+        self._show_selection()
+
+        if self.rows:
+            total = len(self.rows)
+            self.yscrollbar.set(self.top / total, min(1.0, (self.top + self.visible_rows) / total))
+        else:
+            self.yscrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, top):
+        top = max(0, min(top, len(self.rows) - self.visible_rows))
+        if top != self.top:
+            self.top = top
+            self.refresh()
+
+    def see(self, index):
+        if index < self.top:
+            self.scroll_to(index)
+        elif index >= self.top + self.visible_rows:
+            self.scroll_to(index - self.visible_rows + 1)
+
+    def yview(self, *args):
+        """纵向滚动条的回调：('moveto', 比例) 或 ('scroll', 数量, 'units'/'pages')"""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == 'scroll':
+            step = self.visible_rows if args[2] == 'pages' else 1
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def curselection(self):
+        return tuple(sorted(self.selected))
+
+    def _index_range(self, first, last):
+        first = self._resolve_index(first)
+        last = first if last is None else self._resolve_index(last)
+        return range(max(0, min(first, last)), min(len(self.rows), max(first, last) + 1))
+
+    def _resolve_index(self, index):
+        return len(self.rows) - 1 if index == tk.END else int(index)
+
+    def selection_set(self, first, last=None):
+        self.selected.update(self._index_range(first, last))
+        self._show_selection()
+
+    def selection_clear(self, first, last=None):
+        self.selected.difference_update(self._index_range(first, last))
+        self._show_selection()
+
+    def _show_selection(self):
+        self.listbox.selection_clear(0, tk.END)
+        for offset in range(self.listbox.size()):
+            if self.top + offset in self.selected:
+                self.listbox.selection_set(offset)
+
+    def _row_at(self, y):
+        if not self.rows:
+            return None
+        return min(self.top + self.listbox.nearest(y), len(self.rows) - 1)
+
+    def _select_only(self, index):
+        self.selected = {index}
+        self.anchor = index
+        self._show_selection()
+        self.listbox.event_generate('<<ListboxSelect>>')
+
+    def _on_click(self, event):
+        self.listbox.focus_set()
+        index = self._row_at(event.y)
+        if index is not None:
+            self._select_only(index)
+        return "break"
+
+    def _on_control_click(self, event):
+        index = self._row_at(event.y)
+        if index is not None:
+            self.selected ^= {index}
+            self.anchor = index
+            self._show_selection()
+            self.listbox.event_generate('<<ListboxSelect>>')
+        return "break"
+
+    def _on_shift_click(self, event):
+        index = self._row_at(event.y)
+        if index is not None:
+            if self.anchor is None:
+                self.anchor = index
+            self.selected = set(self._index_range(self.anchor, index))
+            self._show_selection()
+            self.listbox.event_generate('<<ListboxSelect>>')
+        return "break"
+
+    def _on_drag(self, event):
+        if self.anchor is None or not self.rows:
+            return "break"
+        # 拖出列表上下边缘时自动滚动
+        if event.y < 0:
+            self.scroll_to(self.top - 1)
+        elif event.y > self.listbox.winfo_height():
+            self.scroll_to(self.top + 1)
+        selected = set(self._index_range(self.anchor, self._row_at(event.y)))
+        if selected != self.selected:
+            self.selected = selected
+            self._show_selection()
+            self.listbox.event_generate('<<ListboxSelect>>')
+        return "break"
+
+    def _on_mousewheel(self, event):
+        self.scroll_to(self.top + (-3 if event.delta > 0 else 3))
+        return "break"
+
+    def _move_selection(self, delta):
+        if not self.rows:
+            return "break"
+        current = self.anchor if self.anchor is not None else self.top - delta
+        index = max(0, min(current + delta, len(self.rows) - 1))
+        self.see(index)
+        self._select_only(index)
+        return "break"
+
+    def _on_configure(self, event):
+        self.visible_rows = max(1, event.height // self.row_height)
+        top = self.top
+        self.top = -1  # 强制重新渲染
+        self.scroll_to(top)
+
 
 class PodcastAnnotationManager:
     def __init__(self, root):
@@ -46,11 +677,21 @@ class PodcastAnnotationManager:
 
         # 数据存储
         self.nodes = {}  # {node_name: {'name': name, 'description': description}}
-        self.edges = []  # [{'source': source_name, 'target': target_name}]
+        self.graph = KeywordGraph()  # 关键词上下级关系
+        self.keyword_matcher = KeywordMatcher()  # 关键词匹配自动机，随self.nodes一起更新
+        self.keyword_index = KeywordSearchIndex()  # 关键词搜索索引，随self.nodes一起更新
+        self.search_executor = ThreadPoolExecutor(max_workers=1)  # 后台执行关键词搜索
+        self.search_generation = 0  # 每次输入加一，用于丢弃过期的搜索结果
+        self.search_after_id = None  # 等待执行的延迟搜索
+        self.album_search_executor = ThreadPoolExecutor(max_workers=ALBUM_WORKERS)  # 全部专辑搜索
+        self.album_search_generation = 0  # 每次全部专辑搜索加一，用于停止过期的搜索
+        self.global_results = None  # 全部专辑搜索的结果，音频列表显示本专辑内容时为None
         self.audio_info = []  # 存储音频信息 (id, filename, duration, title, annotation)
         self.current_node_name = None  # 当前选中的节点名称
         self.system_db_conn = None  # 系统数据库连接
         self.album_db_conn = None  # 专辑数据库连接
+        self.annotation_fts = False  # 专辑数据库是否有标注全文索引
+        self.episode_keywords_ready = False  # 专辑数据库的关键词与单集对应表是否可用
 
         # 创建状态栏变量
         self.status_var = tk.StringVar()
@@ -130,34 +771,9 @@ class PodcastAnnotationManager:
                 
             # 如果系统数据库中没有专辑，尝试从albums目录扫描作为后备方案
             if not self.albums:
-                # 检查albums目录是否存在
-                if os.path.exists(self.albums_dir):
-                    # 获取albums目录下的所有子目录
-                    for dir_name in os.listdir(self.albums_dir):
-                        dir_path = os.path.join(self.albums_dir, dir_name)
-                        # 检查是否是目录，并且目录名以"album_"开头
-                        if os.path.isdir(dir_path) and dir_name.startswith("album_"):
-                            # 提取专辑ID
-                            album_id = dir_name[len("album_"):]
-                            # 检查专辑数据库文件是否存在
-                            album_db_path = os.path.join(dir_path, f"album_{album_id}.db")
-                            if os.path.exists(album_db_path):
-                                # 尝试从数据库中获取专辑名称
-                                album_name = f"专辑 {album_id}"
-                                try:
-                                    temp_conn = sqlite3.connect(album_db_path)
-                                    cursor = temp_conn.cursor()
-                                    cursor.execute("SELECT title FROM album_info LIMIT 1")
-                                    result = cursor.fetchone()
-                                    if result and result[0]:
-                                        album_name = result[0]
-                                    temp_conn.close()
-                                except Exception as e:
-                                    print(f"获取专辑名称失败: {str(e)}")
-
-                                # 添加到列表
-                                self.albums.append((album_id, album_name, dir_path))
-                                self.album_listbox.insert(tk.END, f"{album_name} (ID: {album_id})")
+                for album_id, album_name, dir_path in self.scan_album_folders():
+                    self.albums.append((album_id, album_name, dir_path))
+                    self.album_listbox.insert(tk.END, f"{album_name} (ID: {album_id})")
                         
             if not self.albums:
                 self.album_listbox.insert(tk.END, "没有找到任何专辑数据")
@@ -167,6 +783,56 @@ class PodcastAnnotationManager:
         except Exception as e:
             messagebox.showerror("错误", f"加载专辑列表失败: {str(e)}")
 
+    def scan_album_folders(self):
+        """扫描albums目录，返回 [(album_id, album_name, album_path)]
+
+        数据获得程序的扫描清单中记录了各专辑数据库的变化标记和标题，标记一致时直接使用记录的标题；
+        其余专辑并行打开数据库读取标题。
+        """
+        if not os.path.exists(self.albums_dir):
+            return []
+
+        folders = []
+        with os.scandir(self.albums_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith("album_") and entry.is_dir():
+                    album_id = entry.name[len("album_"):]
+                    album_db_path = os.path.join(entry.path, f"album_{album_id}.db")
+                    if os.path.exists(album_db_path):
+                        folders.append((album_id, entry.path, album_db_path))
+
+        manifest = {}
+        try:
+            if self.system_db_conn:
+                cursor = self.system_db_conn.cursor()
+                cursor.execute("SELECT album_id, signature, title FROM album_scan_manifest")
+                manifest = {album_id: (signature, title) for album_id, signature, title in cursor.fetchall()}
+        except sqlite3.OperationalError:
+            pass  # 还没有运行过数据获得程序的扫描
+
+        def read_album_name(folder):
+            album_id, dir_path, album_db_path = folder
+            signature, title = manifest.get(album_id, (None, None))
+            if title and signature == album_db_signature(album_db_path):
+                return album_id, title, dir_path
+
+            # 尝试从数据库中获取专辑名称
+            album_name = f"专辑 {album_id}"
+            try:
+                temp_conn = sqlite3.connect(album_db_path)
+                cursor = temp_conn.cursor()
+                cursor.execute("SELECT title FROM album_info LIMIT 1")
+                result = cursor.fetchone()
+                if result and result[0]:
+                    album_name = result[0]
+                temp_conn.close()
+            except Exception as e:
+                print(f"获取专辑名称失败: {str(e)}")
+            return album_id, album_name, dir_path
+
+        with ThreadPoolExecutor(max_workers=ALBUM_WORKERS) as executor:
+            return sorted(executor.map(read_album_name, folders))
+
     def on_album_select(self, event):
         selection = self.album_listbox.curselection()
         if selection:
@@ -295,11 +961,14 @@ class PodcastAnnotationManager:
             messagebox.showerror("数据库错误", f"连接专辑数据库失败: {str(e)}")
             return
 
+        self.init_annotation_index()
+
         # 显示主界面
         self.show_main_interface()
 
         # 加载数据
         self.load_data()
+        self.init_episode_keywords()
         self.load_audio_data()
         self.update_status(f"已加载专辑: {album_id}")
 
@@ -429,11 +1098,14 @@ class PodcastAnnotationManager:
             messagebox.showerror("数据库错误", f"连接专辑数据库失败: {str(e)}")
             return
 
+        self.init_annotation_index()
+
         # 显示主界面
         self.show_main_interface()
 
         # 加载数据
         self.load_data()
+        self.init_episode_keywords()
         self.load_audio_data()
         self.update_status(f"已加载专辑ID: {album_id}")
 
@@ -485,6 +1157,8 @@ class PodcastAnnotationManager:
         self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
         self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         self.search_entry.bind('<Return>', self.on_search_enter)  # 回车触发增强搜索
+        self.global_search_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="全部专辑", variable=self.global_search_var).pack(side=tk.LEFT)  # 回车时搜索所有专辑的音频
 
         ttk.Label(left_frame, text="关键词列表", font=("微软雅黑", 14, "bold")).pack(pady=5)
 
@@ -677,37 +1351,18 @@ class PodcastAnnotationManager:
         audio_frame = ttk.LabelFrame(right_frame, text="相关音频", padding="10")
         audio_frame.pack(fill=tk.BOTH, expand=True, pady=5)
 
-        # 音频列表
-        audio_list_frame = ttk.Frame(audio_frame)
-        audio_list_frame.pack(fill=tk.BOTH, expand=True)
-
-        # 横向滚动条
-        xscrollbar = ttk.Scrollbar(audio_list_frame, orient=tk.HORIZONTAL)
-        xscrollbar.pack(side=tk.BOTTOM, fill=tk.X)
-
-        # 纵向滚动条
-        yscrollbar = ttk.Scrollbar(audio_list_frame)
-        yscrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        # 音频列表框
-        self.audio_listbox = tk.Listbox(
-            audio_list_frame,
-            yscrollcommand=yscrollbar.set,
-            xscrollcommand=xscrollbar.set,
+        # 音频列表（只渲染可见行，支持多选）
+        self.audio_listbox = VirtualListbox(
+            audio_frame,
             font=('微软雅黑', 12),
             height=15,
-            width=30,
-            selectmode=tk.EXTENDED  # 启用多选模式
+            width=30
         )
-        self.audio_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.audio_listbox.pack(fill=tk.BOTH, expand=True)
         self.audio_listbox.bind('<Double-1>', self.play_audio_and_edit)  # 双击播放并编辑标注
         self.audio_listbox.bind('<<ListboxSelect>>', self.on_audio_select)  # 选中音频时提取关键词
         self.audio_listbox.bind('<Button-3>', self.show_audio_context_menu)  # 绑定右键菜单事件
 
-        # 配置滚动条
-        yscrollbar.config(command=self.audio_listbox.yview)
-        xscrollbar.config(command=self.audio_listbox.xview)
-
         # 状态栏
         status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
@@ -757,11 +1412,178 @@ class PodcastAnnotationManager:
                 self.system_db_conn.close()
                 self.system_db_conn = None
 
+    def init_annotation_index(self):
+        """为专辑的标注建立FTS5全文索引（trigram分词，支持中文子串），由触发器与episodes.annotation保持同步
+
+        数据获得程序迁移表结构时会重建episodes表，旧表上的触发器随之删除，
+        所以触发器不存在时重建一次索引。SQLite不支持FTS5或trigram时回退到逐行查找。
+        """
+        self.annotation_fts = False
+        if not self.album_db_conn:
+            return
+        try:
+            cursor = self.album_db_conn.cursor()
+            if annotation_index_ready(cursor):
+                self.annotation_fts = True
+                return
+
+            self.update_status("正在建立标注全文索引...")
+            cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS episodes_fts USING fts5(
+                annotation, content='episodes', content_rowid='id', tokenize='trigram'
+            )
+            """)
+            cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS episodes_fts_insert AFTER INSERT ON episodes BEGIN
+                INSERT INTO episodes_fts(rowid, annotation) VALUES (new.id, new.annotation);
+            END
+            """)
+            cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS episodes_fts_delete AFTER DELETE ON episodes BEGIN
+                INSERT INTO episodes_fts(episodes_fts, rowid, annotation) VALUES ('delete', old.id, old.annotation);
+            END
+            """)
+            cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS episodes_fts_update AFTER UPDATE OF annotation ON episodes BEGIN
+                INSERT INTO episodes_fts(episodes_fts, rowid, annotation) VALUES ('delete', old.id, old.annotation);
+                INSERT INTO episodes_fts(rowid, annotation) VALUES (new.id, new.annotation);
+            END
+            """)
+            cursor.execute("INSERT INTO episodes_fts(episodes_fts) VALUES ('rebuild')")
+            self.album_db_conn.commit()
+            self.annotation_fts = True
+        except sqlite3.OperationalError as e:
+            self.album_db_conn.rollback()
+            self.update_status(f"无法建立标注全文索引，搜索将逐条查找: {str(e)}")
+
+    def init_episode_keywords(self):
+        """关键词与单集的对应表 episode_keywords(episode_id, node)，按单集和按关键词两个方向都有索引
+
+        保存标注、增删关键词时增量更新。表中记录了建立时的关键词表摘要和单集数、最大id，
+        在其他专辑中修改了关键词表、或数据获得程序增删了单集时，打开专辑时重建。
+        """
+        self.episode_keywords_ready = False
+        if not self.album_db_conn:
+            return
+        try:
+            cursor = self.album_db_conn.cursor()
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS episode_keywords (
+                episode_id INTEGER NOT NULL,
+                node TEXT NOT NULL,
+                PRIMARY KEY (episode_id, node)
+            ) WITHOUT ROWID
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_episode_keywords_node ON episode_keywords(node, episode_id)")
+            cursor.execute("CREATE TABLE IF NOT EXISTS episode_keywords_meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.album_db_conn.commit()
+
+            cursor.execute("SELECT value FROM episode_keywords_meta WHERE key = 'signature'")
+            row = cursor.fetchone()
+            if row and row[0] == self.episode_keywords_signature(cursor):
+                self.episode_keywords_ready = True
+            else:
+                self.update_status("正在建立关键词与音频的对应表...")
+                self.rebuild_episode_keywords()
+        except sqlite3.Error as e:
+            self.album_db_conn.rollback()
+            self.update_status(f"无法建立关键词对应表，将逐条查找: {str(e)}")
+
+    def episode_keywords_signature(self, cursor):
+        vocabulary = hashlib.sha1("\n".join(sorted(self.nodes)).encode("utf-8")).hexdigest()
+        cursor.execute("SELECT count(*), max(id) FROM episodes")
+        count, max_id = cursor.fetchone()
+        return f"{vocabulary}:{count}:{max_id}"
+
+    def save_episode_keywords_signature(self, cursor):
+        cursor.execute(
+            "INSERT OR REPLACE INTO episode_keywords_meta (key, value) VALUES ('signature', ?)",
+            (self.episode_keywords_signature(cursor),)
+        )
+
+    def rebuild_episode_keywords(self):
+        """按当前关键词表重建本专辑的关键词与单集对应表，返回对应关系数"""
+        cursor = self.album_db_conn.cursor()
+        cursor.execute("SELECT id, annotation FROM episodes WHERE annotation IS NOT NULL")
+        pairs = [(id, node) for id, annotation in cursor.fetchall() for node in self.extract_keywords(annotation)]
+        cursor.execute("DELETE FROM episode_keywords")
+        cursor.executemany("INSERT OR IGNORE INTO episode_keywords (episode_id, node) VALUES (?, ?)", pairs)
+        self.save_episode_keywords_signature(cursor)
+        self.album_db_conn.commit()
+        self.episode_keywords_ready = True
+        return len(pairs)
+
+    def update_episode_keywords(self, cursor, episode_id, annotation):
+        """保存标注时更新该单集的关键词，和标注的UPDATE在同一个事务中提交"""
+        if not self.episode_keywords_ready:
+            return
+        cursor.execute("DELETE FROM episode_keywords WHERE episode_id = ?", (episode_id,))
+        cursor.executemany(
+            "INSERT OR IGNORE INTO episode_keywords (episode_id, node) VALUES (?, ?)",
+            [(episode_id, node) for node in self.extract_keywords(annotation)]
+        )
+
+    def update_keyword_episodes(self, added=(), removed=()):
+        """关键词新增、删除或改名后更新本专辑的对应表"""
+        if not self.episode_keywords_ready:
+            return
+        try:
+            cursor = self.album_db_conn.cursor()
+            for node in removed:
+                cursor.execute("DELETE FROM episode_keywords WHERE node = ?", (node,))
+            for node in added:
+                # 先用全文索引找出候选，再按提取关键词的规则确认
+                folded = fold_case(node)
+                rows = query_annotation_matches(self.album_db_conn, node, self.annotation_fts)
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO episode_keywords (episode_id, node) VALUES (?, ?)",
+                    [(row[0], node) for row in rows if folded in fold_case(row[4])]
+                )
+            self.save_episode_keywords_signature(cursor)
+            self.album_db_conn.commit()
+        except sqlite3.Error as e:
+            self.album_db_conn.rollback()
+            self.episode_keywords_ready = False
+            self.update_status(f"更新关键词对应表失败: {str(e)}")
+
+    def episodes_for_keyword(self, node, limit=-1, offset=0):
+        """标注中包含关键词node的单集，按标注内容倒序排列"""
+        cursor = self.album_db_conn.cursor()
+        cursor.execute(
+            """SELECT e.id, e.filename, e.duration, e.title, e.annotation, e.url
+            FROM episode_keywords k JOIN episodes e ON e.id = k.episode_id
+            WHERE k.node = ? ORDER BY lower(e.annotation) DESC LIMIT ? OFFSET ?""",
+            (node, limit, offset)
+        )
+        return cursor.fetchall()
+
+    def keywords_for_episodes(self, episode_ids):
+        """这些单集的标注中包含的所有关键词，按关键词表的顺序排列"""
+        found = set()
+        cursor = self.album_db_conn.cursor()
+        episode_ids = list(episode_ids)
+        for start in range(0, len(episode_ids), 500):
+            chunk = episode_ids[start:start + 500]
+            cursor.execute(
+                f"SELECT DISTINCT node FROM episode_keywords WHERE episode_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            found.update(row[0] for row in cursor.fetchall())
+        return [node for node in self.nodes if node in found]
+
+    def keyword_usage_count(self, node):
+        """本专辑中标注包含该关键词的单集数"""
+        if not self.episode_keywords_ready:
+            return len(self.query_related_audio(node))
+        cursor = self.album_db_conn.cursor()
+        cursor.execute("SELECT count(*) FROM episode_keywords WHERE node = ?", (node,))
+        return cursor.fetchone()[0]
+
     def reload_data(self):
         try:
             # 重置数据
             self.nodes = {}
-            self.edges = []
+            self.graph = KeywordGraph()
             self.audio_info = []
 
             # 清空界面
@@ -769,14 +1591,16 @@ class PodcastAnnotationManager:
             self.parent_listbox.delete(0, tk.END)
             self.child_listbox.delete(0, tk.END)
             self.sibling_listbox.delete(0, tk.END)  # 清空同级节点列表
-            self.audio_listbox.delete(0, tk.END)
+            self.audio_listbox.clear()
             self.name_var.set("")
             self.desc_text.delete(1.0, tk.END)
             self.current_node_label.config(text="")
             self.current_node_name = None
 
-            # 重新加载数据
+            # 重新加载数据，并按关键词表重建关键词与单集的对应表
             self.load_data()
+            if self.album_db_conn:
+                self.rebuild_episode_keywords()
             self.load_audio_data()
             self.update_status("重新载入完成 - 所有数据已更新")
         except Exception as e:
@@ -801,98 +1625,53 @@ class PodcastAnnotationManager:
 
                 # 加载边
                 cursor.execute("SELECT parent_node, child_node FROM edges")
-                rows = cursor.fetchall()
-                for row in rows:
-                    parent_node, child_node = row
-                    self.edges.append({
-                        'source': parent_node,
-                        'target': child_node
-                    })
+                self.graph.reset(cursor.fetchall())
 
-                self.update_status(f"加载完成 - 关键词: {len(self.nodes)}, 关系: {len(self.edges)}")
+                self.keyword_matcher.reset(self.nodes)
+                self.keyword_index.reset(self.nodes)
+                self.update_status(f"加载完成 - 关键词: {len(self.nodes)}, 关系: {len(self.graph)}")
 
         except Exception as e:
             messagebox.showerror("错误", f"加载数据失败: {str(e)}")
             self.update_status(f"加载失败: {str(e)}")
 
     def load_audio_data(self):
+        self.stop_album_search()
         try:
             if self.album_db_conn:
                 cursor = self.album_db_conn.cursor()
-                # 修改SQL查询，添加获取url字段
-                cursor.execute("SELECT id, filename, duration, title, annotation, url FROM episodes ORDER BY id")
-                rows = cursor.fetchall()
-                
-                self.audio_info = []
-                for row in rows:
-                    id, filename, duration, title, annotation, url = row
-                    self.audio_info.append((id, filename, duration, title, annotation, url))
-                
-                # 调整排序：未标注的内容（标注内容和文件名完全相同）排在前面
-                # 未标注定义为标注内容和文件名完全相同的情况
-                self.audio_info.sort(key=lambda x: 0 if (x[4] and x[4] == x[1]) else 1)
-                
-                # 清空列表并重新插入排序后的数据
-                self.audio_listbox.delete(0, tk.END)
-                
-                for item in self.audio_info:
-                    id, filename, duration, title, annotation, url = item
-                    # 使用标注内容而不是标题显示在列表中
-                    display_text = annotation if annotation else title
-                    
-                    # 如果有标注内容，处理关键词突出显示
-                    if annotation:
-                        display_text = self.format_annotated_text(annotation)
-                    
-                    self.audio_listbox.insert(tk.END, display_text)
+                # 只读取单集id，行数据在列表滚动到时再按页读取
+                # 未标注的内容（标注内容和文件名完全相同）排在前面
+                cursor.execute("""SELECT id FROM episodes
+                ORDER BY CASE WHEN annotation <> '' AND annotation = filename THEN 0 ELSE 1 END, id""")
+                self.audio_info = LazyEpisodeRows(self.album_db_conn, [row[0] for row in cursor.fetchall()])
+
+                # 使用标注内容而不是标题显示在列表中，并突出显示关键词
+                self.audio_listbox.set_rows(self.audio_info, self.audio_display_text)
 
                 self.update_status(f"音频数据加载完成 - 共 {len(self.audio_info)} 条记录")
         except Exception as e:
             messagebox.showerror("错误", f"加载音频数据失败: {str(e)}")
             self.update_status(f"音频加载失败: {str(e)}")
 
+    def audio_display_text(self, row):
+        id, filename, duration, title, annotation, url = row
+        return self.format_annotated_text(annotation) if annotation else title
+
     def format_annotated_text(self, annotation):
-        """格式化标注文本，突出显示关键词"""
+        """格式化标注文本，突出显示关键词（最左最长匹配，互不重叠）"""
         if not annotation or not self.nodes:
             return annotation
-        
-        formatted_text = annotation
-        marked_positions = []  # 记录已经被标记的位置范围
-        
-        # 将节点名称按长度排序，优先匹配较长的关键词
-        sorted_nodes = sorted(self.nodes.keys(), key=len, reverse=True)
-        
-        # 检查每个关键词是否在标注中出现
-        for node_name in sorted_nodes:
-            start_pos = 0
-            while True:
-                start_pos = formatted_text.find(node_name, start_pos)
-                if start_pos == -1:
-                    break
-                
-                end_pos = start_pos + len(node_name)
-                
-                # 检查该位置是否已经被标记过
-                overlap = False
-                for (marked_start, marked_end) in marked_positions:
-                    if not (end_pos <= marked_start or start_pos >= marked_end):
-                        overlap = True
-                        break
-                
-                if not overlap:
-                    # 在关键词前后添加特殊标记来表示加粗
-                    # 使用【】包围关键词以突出显示
-                    formatted_text = formatted_text[:start_pos] + f"【{node_name}】" + formatted_text[end_pos:]
-                    # 更新标记位置（注意替换后文本长度变化）
-                    new_end_pos = start_pos + len(f"【{node_name}】")
-                    marked_positions.append((start_pos, new_end_pos))
-                    # 跳过已标记的部分继续查找
-                    start_pos = new_end_pos
-                else:
-                    # 如果位置已被标记，跳过这个位置
-                    start_pos += 1
-        
-        return formatted_text
+
+        # 使用【】包围关键词以突出显示
+        parts = []
+        last_end = 0
+        for start, end in self.keyword_matcher.find_leftmost_longest(annotation, match_case=True):
+            parts.append(annotation[last_end:start])
+            parts.append(f"【{annotation[start:end]}】")
+            last_end = end
+        parts.append(annotation[last_end:])
+        return "".join(parts)
 
     def save_node(self):
         if not self.current_node_name:
@@ -929,6 +1708,9 @@ class PodcastAnnotationManager:
                     cursor.execute("DELETE FROM nodes WHERE node = ?", (old_data['name'],))
                     # 从本地数据中删除旧节点
                     del self.nodes[old_data['name']]
+                    self.keyword_matcher.remove(old_data['name'])
+                    self.keyword_index.remove(old_data['name'])
+                    self.graph.rename_node(old_data['name'], new_name)
                 
                 # 插入或更新新节点
                 cursor.execute(
@@ -943,6 +1725,10 @@ class PodcastAnnotationManager:
                     'name': new_name,
                     'description': new_description
                 }
+                self.keyword_matcher.add(new_name)
+                self.keyword_index.add(new_name, new_description)
+                if old_data['name'] != new_name:
+                    self.update_keyword_episodes(added=[new_name], removed=[old_data['name']])
                 
                 # 更新界面
                 for i in range(self.node_listbox.size()):
@@ -986,6 +1772,9 @@ class PodcastAnnotationManager:
                         'name': name,
                         'description': description
                     }
+                    self.keyword_matcher.add(name)
+                    self.keyword_index.add(name, description)
+                    self.update_keyword_episodes(added=[name])
                     self.node_listbox.insert(tk.END, name)
                     
                     self.update_status(f"添加关键词: {name}")
@@ -1040,7 +1829,9 @@ class PodcastAnnotationManager:
             index = selection[0]
             node_name = self.node_listbox.get(index)
 
-            if node_name and messagebox.askyesno("确认", f"确定要删除关键词 '{node_name}' 吗？"):
+            usage = self.keyword_usage_count(node_name) if node_name in self.nodes and self.album_db_conn else 0
+            usage_text = f"\n本专辑有 {usage} 个音频的标注包含该关键词" if usage else ""
+            if node_name and messagebox.askyesno("确认", f"确定要删除关键词 '{node_name}' 吗？{usage_text}"):
                 try:
                     if self.system_db_conn:
                         cursor = self.system_db_conn.cursor()
@@ -1054,9 +1845,12 @@ class PodcastAnnotationManager:
                         self.system_db_conn.commit()
                         
                         # 更新本地数据
-                        self.edges = [e for e in self.edges if e['source'] != node_name and e['target'] != node_name]
+                        self.graph.remove_node(node_name)
                         if node_name in self.nodes:
                             del self.nodes[node_name]
+                        self.keyword_matcher.remove(node_name)
+                        self.keyword_index.remove(node_name)
+                        self.update_keyword_episodes(removed=[node_name])
                         self.node_listbox.delete(index)
                         
                         # 清空相关界面
@@ -1102,6 +1896,9 @@ class PodcastAnnotationManager:
                                 'name': parent_name,
                                 'description': description
                             }
+                            self.keyword_matcher.add(parent_name)
+                            self.keyword_index.add(parent_name, description)
+                            self.update_keyword_episodes(added=[parent_name])
                             self.node_listbox.insert(tk.END, parent_name)
                             self.update_status(f"新建关键词: {parent_name}")
                     except Exception as e:
@@ -1118,10 +1915,9 @@ class PodcastAnnotationManager:
                 return
 
             # 检查关系是否已存在
-            for edge in self.edges:
-                if edge['source'] == parent_name and edge['target'] == self.current_node_name:
-                    messagebox.showwarning("警告", "该上级关系已存在")
-                    return
+            if self.graph.has_edge(parent_name, self.current_node_name):
+                messagebox.showwarning("警告", "该上级关系已存在")
+                return
 
             try:
                 if self.system_db_conn:
@@ -1133,7 +1929,7 @@ class PodcastAnnotationManager:
                     self.system_db_conn.commit()
                     
                     # 更新本地数据
-                    self.edges.append({'source': parent_name, 'target': self.current_node_name})
+                    self.graph.add_edge(parent_name, self.current_node_name)
                     self.parent_listbox.insert(tk.END, parent_name)
                     self.update_edge_lists(self.current_node_name)  # 更新同级节点
                     
@@ -1170,6 +1966,9 @@ class PodcastAnnotationManager:
                                 'name': child_name,
                                 'description': description
                             }
+                            self.keyword_matcher.add(child_name)
+                            self.keyword_index.add(child_name, description)
+                            self.update_keyword_episodes(added=[child_name])
                             self.node_listbox.insert(tk.END, child_name)
                             self.update_status(f"新建关键词: {child_name}")
                     except Exception as e:
@@ -1186,10 +1985,9 @@ class PodcastAnnotationManager:
                 return
 
             # 检查关系是否已存在
-            for edge in self.edges:
-                if edge['source'] == self.current_node_name and edge['target'] == child_name:
-                    messagebox.showwarning("警告", "该下级关系已存在")
-                    return
+            if self.graph.has_edge(self.current_node_name, child_name):
+                messagebox.showwarning("警告", "该下级关系已存在")
+                return
 
             try:
                 if self.system_db_conn:
@@ -1201,7 +1999,7 @@ class PodcastAnnotationManager:
                     self.system_db_conn.commit()
                     
                     # 更新本地数据
-                    self.edges.append({'source': self.current_node_name, 'target': child_name})
+                    self.graph.add_edge(self.current_node_name, child_name)
                     self.child_listbox.insert(tk.END, child_name)
                     self.update_edge_lists(self.current_node_name)  # 更新同级节点
                     
@@ -1233,8 +2031,7 @@ class PodcastAnnotationManager:
                         self.system_db_conn.commit()
                         
                         # 更新本地数据
-                        self.edges = [e for e in self.edges if
-                                      not (e['source'] == parent_name and e['target'] == self.current_node_name)]
+                        self.graph.remove_edge(parent_name, self.current_node_name)
                         self.parent_listbox.delete(index)
                         self.update_edge_lists(self.current_node_name)  # 更新同级节点
                         
@@ -1266,8 +2063,7 @@ class PodcastAnnotationManager:
                         self.system_db_conn.commit()
                         
                         # 更新本地数据
-                        self.edges = [e for e in self.edges if
-                                      not (e['source'] == self.current_node_name and e['target'] == child_name)]
+                        self.graph.remove_edge(self.current_node_name, child_name)
                         self.child_listbox.delete(index)
                         self.update_edge_lists(self.current_node_name)  # 更新同级节点
                         
@@ -1279,48 +2075,75 @@ class PodcastAnnotationManager:
                         self.system_db_conn.rollback()
 
     def on_search_type(self, *args):
-        search_term = self.search_var.get().strip().lower()
-        self.node_listbox.delete(0, tk.END)
-        count = 0
+        """输入时实时搜索关键词：停止输入 SEARCH_DEBOUNCE_MS 毫秒后在后台线程查询，过期的查询被丢弃"""
+        self.search_generation += 1
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.start_keyword_search)
+
+    def start_keyword_search(self):
+        self.search_after_id = None
+        generation = self.search_generation
+        future = self.search_executor.submit(
+            self.keyword_index.search,
+            self.search_var.get().strip(),
+            lambda: generation != self.search_generation
+        )
+        self.root.after(SEARCH_POLL_MS, self.poll_keyword_search, future, generation)
 
-        if not search_term:
-            for node_name in self.nodes:
-                self.node_listbox.insert(tk.END, node_name)
-                count += 1
-        else:
-            exact_match = False
-            for node_name, data in self.nodes.items():
-                if node_name.lower() == search_term:
-                    self.node_listbox.insert(tk.END, node_name)
-                    exact_match = True
-                    count += 1
-                    self.node_listbox.selection_set(0)
-                    self.on_node_select(None)
-                    break
+    def poll_keyword_search(self, future, generation):
+        """在界面线程检查后台搜索，完成后更新关键词列表"""
+        if generation != self.search_generation:
+            future.cancel()
+            return
+        if not future.done():
+            self.root.after(SEARCH_POLL_MS, self.poll_keyword_search, future, generation)
+            return
 
-            if not exact_match:
-                for node_name, data in self.nodes.items():
-                    if search_term in node_name.lower() or search_term in data['description'].lower():
-                        self.node_listbox.insert(tk.END, node_name)
-                        count += 1
+        try:
+            result = future.result()
+        except Exception as e:
+            self.update_status(f"搜索失败: {str(e)}")
+            return
+        if result is None:
+            return
+        exact, matches = result
+
+        self.node_listbox.delete(0, tk.END)
+        if exact:
+            self.node_listbox.insert(tk.END, exact)
+            self.node_listbox.selection_set(0)
+            self.on_node_select(None)
+            count = 1
+        else:
+            if matches:
+                self.node_listbox.insert(tk.END, *matches)
+            count = len(matches)
 
         self.update_status(f"搜索完成 - 找到 {count} 个匹配关键词")
 
     def on_search_enter(self, event):
         search_term = self.search_var.get().strip().lower()
 
+        # 回车立即搜索，取消还没有显示的实时搜索
+        self.search_generation += 1
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
+
         self.node_listbox.delete(0, tk.END)
         node_count = 0
 
         if search_term:
-            for node_name, data in self.nodes.items():
-                if (node_name.lower() == search_term or
-                        search_term in node_name.lower() or
-                        search_term in data['description'].lower()):
-                    self.node_listbox.insert(tk.END, node_name)
-                    node_count += 1
+            exact, matches = self.keyword_index.search(search_term)
+            if matches:
+                self.node_listbox.insert(tk.END, *matches)
+            node_count = len(matches)
 
-            self.search_related_audio(search_term)
+            if self.global_search_var.get():
+                self.search_all_albums(search_term)
+            else:
+                self.search_related_audio(search_term)
 
             if node_count == 0:
                 self.current_node_name = None
@@ -1404,81 +2227,125 @@ class PodcastAnnotationManager:
         self.child_listbox.delete(0, tk.END)
         self.sibling_listbox.delete(0, tk.END)
 
-        # 获取上级节点
-        parents = []
-        for edge in self.edges:
-            if edge['target'] == node_name:
-                parent_name = edge['source']
-                parents.append(parent_name)
-                self.parent_listbox.insert(tk.END, parent_name)
-
-        # 获取下级节点
-        for edge in self.edges:
-            if edge['source'] == node_name:
-                self.child_listbox.insert(tk.END, edge['target'])
-
-        # 获取同级节点
-        siblings = set()  # 使用集合去重
-
-        # 1. 拥有相同父节点的节点（除了自己）
-        for parent_name in parents:
-            for edge in self.edges:
-                if edge['source'] == parent_name and edge['target'] != node_name:
-                    sibling_name = edge['target']
-                    siblings.add(sibling_name)
-
-        # 2. 拥有相同子节点的节点
-        # 先获取当前节点的所有子节点
-        current_children = [edge['target'] for edge in self.edges if edge['source'] == node_name]
-
-        # 查找所有也拥有这些子节点的其他节点
-        for child_name in current_children:
-            for edge in self.edges:
-                if edge['target'] == child_name and edge['source'] != node_name:
-                    sibling_name = edge['source']
-                    siblings.add(sibling_name)
-
-        # 转换为列表并添加到界面
-        for sibling_name in siblings:
+        for parent_name in self.graph.parents_of(node_name):
+            self.parent_listbox.insert(tk.END, parent_name)
+
+        for child_name in self.graph.children_of(node_name):
+            self.child_listbox.insert(tk.END, child_name)
+
+        # 同级节点：拥有相同上级或相同下级的节点
+        for sibling_name in self.graph.siblings_of(node_name):
             self.sibling_listbox.insert(tk.END, sibling_name)
 
-    def search_related_audio(self, keyword):
-        self.audio_listbox.delete(0, tk.END)
+    def query_related_audio(self, keyword, limit=-1, offset=0):
+        """在当前专辑中查找标注包含keyword的音频"""
+        return query_annotation_matches(self.album_db_conn, keyword, self.annotation_fts, limit, offset)
+
+    def search_related_audio(self, keyword, limit=-1, offset=0):
+        self.stop_album_search()
+        self.audio_listbox.clear()
         self.audio_info = []
 
         if not keyword:
             self.update_status("请输入搜索词或选择一个关键词查看相关音频")
             return
 
-        keyword_lower = keyword.lower()
         try:
             if self.album_db_conn:
-                cursor = self.album_db_conn.cursor()
-                cursor.execute("SELECT id, filename, duration, title, annotation, url FROM episodes ORDER BY id")
-                rows = cursor.fetchall()
-                
-                for row in rows:
-                    id, filename, duration, title, annotation, url = row
-                    if annotation and keyword_lower in annotation.lower():
-                        # 存储url信息
-                        self.audio_info.append((id, filename, duration, title, annotation, url))
+                if self.episode_keywords_ready and keyword in self.nodes:
+                    self.audio_info = self.episodes_for_keyword(keyword, limit, offset)
+                else:
+                    self.audio_info = self.query_related_audio(keyword, limit, offset)
         except Exception as e:
             messagebox.showerror("错误", f"搜索音频失败: {str(e)}")
             self.update_status(f"搜索失败: {str(e)}")
             return
 
-        # 按标注内容（字符串）倒序排列
-        self.audio_info.sort(key=lambda x: x[4].lower(), reverse=True)
-
-        for item in self.audio_info:
-            # 使用标注内容而不是标题显示在列表中
-            display_text = item[4] if item[4] else item[3]
-            self.audio_listbox.insert(tk.END, display_text)
+        # 使用标注内容而不是标题显示在列表中
+        self.audio_listbox.set_rows(self.audio_info, lambda item: item[4] if item[4] else item[3])
 
         node_count = len(self.nodes)
-        edge_count = len(self.edges)
+        edge_count = len(self.graph)
         self.status_var.set(f"关键词: {node_count}, 关系: {edge_count} - 找到 {len(self.audio_info)} 个相关音频")
 
+    def search_all_albums(self, keyword):
+        """在所有专辑中搜索标注，各专辑在后台线程并行查询，查完一个就合并排序显示一次"""
+        self.stop_album_search()
+        generation = self.album_search_generation
+        albums = self.scan_album_folders()
+        futures = [
+            self.album_search_executor.submit(search_album_episodes, album_id, album_name, album_path, keyword)
+            for album_id, album_name, album_path in albums
+        ]
+
+        self.audio_info = []
+        self.global_results = []
+        self.audio_listbox.set_rows(self.global_results, self.global_result_text)
+        self.update_status(f"正在搜索 {len(albums)} 个专辑...")
+        self.root.after(SEARCH_POLL_MS, self.poll_album_search, futures, generation, len(albums), 0)
+
+    def poll_album_search(self, futures, generation, total, failed):
+        if generation != self.album_search_generation:
+            for future in futures:
+                future.cancel()
+            return
+
+        pending = []
+        new_results = []
+        for future in futures:
+            if not future.done():
+                pending.append(future)
+                continue
+            try:
+                new_results.extend(future.result())
+            except Exception as e:
+                failed += 1
+                print(f"搜索专辑失败: {str(e)}")
+
+        if new_results:
+            self.global_results = sorted(self.global_results + new_results)
+            self.audio_listbox.set_rows(self.global_results, self.global_result_text)
+
+        message = f"全部专辑搜索 - 已搜索 {total - len(pending)}/{total} 个专辑，找到 {len(self.global_results)} 个音频"
+        if failed:
+            message += f"，{failed} 个专辑读取失败"
+        self.update_status(message + ("" if pending else "，双击打开所在专辑"))
+        if pending:
+            self.root.after(SEARCH_POLL_MS, self.poll_album_search, pending, generation, total, failed)
+
+    def stop_album_search(self):
+        """停止正在进行的全部专辑搜索，音频列表回到当前专辑"""
+        self.album_search_generation += 1
+        self.global_results = None
+
+    def global_result_text(self, row):
+        rank, album_id, album_name, album_path, episode_id, title, annotation = row
+        return f"[{album_name}] " + (self.format_annotated_text(annotation) if annotation else title)
+
+    def open_global_result(self):
+        """打开全部专辑搜索结果所在的专辑，并选中该音频"""
+        selection = self.audio_listbox.curselection()
+        if not selection or self.global_results is None:
+            return
+        rank, album_id, album_name, album_path, episode_id, title, annotation = self.global_results[selection[0]]
+
+        if self.album_db_conn:
+            self.album_db_conn.close()
+            self.album_db_conn = None
+        self.select_album(album_id, album_path)
+        if not self.album_db_conn or not isinstance(self.audio_info, LazyEpisodeRows):
+            return
+
+        try:
+            index = self.audio_info.ids.index(episode_id)
+        except ValueError:
+            self.update_status(f"专辑 {album_name} 中找不到该音频，可能已被删除")
+            return
+        self.audio_listbox.see(index)
+        self.audio_listbox.selection_set(index)
+        self.on_audio_select(None)
+        self.update_status(f"已打开专辑 {album_name}，选中音频: {title}")
+
     def play_audio(self, event):
         selection = self.audio_listbox.curselection()
         if selection:
@@ -1487,7 +2354,16 @@ class PodcastAnnotationManager:
                 if 0 <= index < len(self.audio_info):
                     # 获取包括url在内的音频信息
                     id, filename, duration, title, annotation, url = self.audio_info[index]
-                    if url:
+                    local_file = self.get_local_audio_path(id)
+                    if local_file:
+                        try:
+                            # 已下载到本地的音频直接播放，不再访问网络
+                            os.utime(local_file)  # 更新最近使用时间，下载器清理磁盘配额时按此保留常听的音频
+                            subprocess.run(['start', '', local_file], shell=True, check=True)
+                            self.update_status(f"正在播放本地音频: {title}")
+                        except Exception as e:
+                            messagebox.showerror("错误", f"播放音频失败: {str(e)}")
+                    elif url:
                         try:
                             # 使用url而不是本地文件
                             webbrowser.open(url)
@@ -1513,8 +2389,29 @@ class PodcastAnnotationManager:
             except Exception as e:
                 messagebox.showerror("错误", f"获取音频信息失败: {str(e)}")
 
+    def get_local_audio_path(self, episode_id):
+        """返回已下载到本地的音频文件路径，没有下载或文件已被清理时返回None"""
+        if not self.album_db_conn:
+            return None
+        try:
+            cursor = self.album_db_conn.cursor()
+            cursor.execute("SELECT local_path FROM episodes WHERE id = ?", (episode_id,))
+            row = cursor.fetchone()
+        except sqlite3.OperationalError:
+            # 旧版数据库没有 local_path 列
+            return None
+        if row and row[0]:
+            audio_file = os.path.join(self.current_album_path, *row[0].split("/"))
+            if os.path.exists(audio_file):
+                return audio_file
+        return None
+
     def play_audio_and_edit(self, event):
-        """双击音频时，同时播放和打开编辑窗口"""
+        """双击音频时，同时播放和打开编辑窗口；全部专辑搜索的结果则打开所在专辑"""
+        if self.global_results is not None:
+            self.open_global_result()
+            return
+
         # 先播放音频
         self.play_audio(event)
         
@@ -1541,13 +2438,13 @@ class PodcastAnnotationManager:
                                 "UPDATE episodes SET annotation = ?, updated = CURRENT_TIMESTAMP WHERE id = ?",
                                 (new_annotation, id)
                             )
+                            self.update_episode_keywords(cursor, id, new_annotation)
                             self.album_db_conn.commit()
                               
                             # 更新本地数据，保持url信息
                             self.audio_info[index] = (id, filename, duration, title, new_annotation, url)
-                            self.audio_listbox.delete(index)
                             # 更新列表显示为新的标注内容
-                            self.audio_listbox.insert(index, new_annotation)
+                            self.audio_listbox.refresh()
                               
                             self.update_status(f"已更新音频标注: {title}")
                     except Exception as e:
@@ -1563,12 +2460,20 @@ class PodcastAnnotationManager:
             try:
                 # 合并所有选中标注的关键词
                 all_keywords = set()
-                
-                for index in selection:
-                    if 0 <= index < len(self.audio_info):
+                indexes = [index for index in selection if 0 <= index < len(self.audio_info)]
+
+                if self.episode_keywords_ready and indexes:
+                    # 从关键词对应表中按单集id查找，全选时也不需要读取每条标注
+                    if isinstance(self.audio_info, LazyEpisodeRows):
+                        episode_ids = [self.audio_info.ids[index] for index in indexes]
+                    else:
+                        episode_ids = [self.audio_info[index][0] for index in indexes]
+                    all_keywords.update(self.keywords_for_episodes(episode_ids))
+                else:
+                    for index in indexes:
                         # 获取包括url在内的音频信息
                         id, filename, duration, title, annotation, url = self.audio_info[index]
-                        
+
                         if annotation:
                             # 提取关键词并添加到集合中（自动去重）
                             keywords = self.extract_keywords(annotation)
@@ -1586,22 +2491,11 @@ class PodcastAnnotationManager:
                 self.update_status(f"提取关键词失败: {str(e)}")
 
     def extract_keywords(self, text):
-        """从文本中提取关键词"""
-        keywords = []
+        """从文本中提取关键词（不区分大小写，互相包含的关键词都算匹配），按关键词表的顺序排列"""
         if not text or not self.nodes:
-            return keywords
-            
-        # 转换为小写以便不区分大小写匹配
-        text_lower = text.lower()
-        
-        # 遍历所有现有关键词，检查是否在文本中出现
-        for node_name in self.nodes:
-            # 宽松匹配：只要关键词在文本中出现（包含）就算匹配成功
-            node_lower = node_name.lower()
-            if node_lower in text_lower:
-                keywords.append(node_name)
-        
-        return keywords
+            return []
+        found = set(self.keyword_matcher.find_all(text))
+        return [node for node in self.nodes if node in found]
 
     def update_keyword_list_for_audio(self, keywords):
         """更新关键词列表，只显示当前音频标注中包含的关键词"""
@@ -1640,6 +2534,12 @@ class PodcastAnnotationManager:
             
         # 创建右键菜单
         context_menu = tk.Menu(self.root, tearoff=0)
+
+        # 全部专辑搜索的结果只能打开所在专辑
+        if self.global_results is not None:
+            context_menu.add_command(label="打开所在专辑", command=self.open_global_result)
+            context_menu.post(event.x_root, event.y_root)
+            return
         
         # 添加编辑单个标注的菜单项
         if len(selection) == 1:
@@ -1693,13 +2593,13 @@ class PodcastAnnotationManager:
                             "UPDATE episodes SET annotation = ?, updated = CURRENT_TIMESTAMP WHERE id = ?",
                             (new_annotation, id)
                         )
+                        self.update_episode_keywords(cursor, id, new_annotation)
                         self.album_db_conn.commit()
                           
                         # 更新本地数据，保持url信息
                         self.audio_info[index] = (id, filename, duration, title, new_annotation, url)
-                        self.audio_listbox.delete(index)
                         # 更新列表显示为新的标注内容
-                        self.audio_listbox.insert(index, new_annotation)
+                        self.audio_listbox.refresh()
                           
                         self.update_status(f"已更新音频标注: {title}")
                 except Exception as e:
@@ -1743,16 +2643,15 @@ class PodcastAnnotationManager:
                             "UPDATE episodes SET annotation = ?, updated = CURRENT_TIMESTAMP WHERE id = ?",
                             (new_annotation, id)
                         )
+                        self.update_episode_keywords(cursor, id, new_annotation)
                         
                         # 更新本地数据，保持url信息
                         self.audio_info[index] = (id, filename, duration, title, new_annotation, url)
-                        self.audio_listbox.delete(index)
-                        # 更新列表显示为新的标注内容
-                        self.audio_listbox.insert(index, new_annotation)
-                        
                         updated_count += 1
                 
                 self.album_db_conn.commit()
+                # 更新列表显示为新的标注内容
+                self.audio_listbox.refresh()
                 self.update_status(f"已批量更新 {updated_count} 个音频标注")
         except Exception as e:
             messagebox.showerror("错误", f"批量保存标注失败: {str(e)}")
@@ -1801,6 +2700,10 @@ class PodcastAnnotationManager:
         return result[0]
 
     def __del__(self):
+        if hasattr(self, 'search_executor'):
+            self.search_executor.shutdown(wait=False)
+        if hasattr(self, 'album_search_executor'):
+            self.album_search_executor.shutdown(wait=False)
         if hasattr(self, 'system_db_conn') and self.system_db_conn:
             self.system_db_conn.close()
         if hasattr(self, 'album_db_conn') and self.album_db_conn: